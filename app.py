@@ -11,6 +11,11 @@ from werkzeug.exceptions import HTTPException
 from config.Database import build_sqlalchemy_uri
 from models import db
 from extensions import limiter
+from services.blockchain_integration import install_reload_signal
+from services.owner_tx_monitor import ensure_owner_tx_monitor
+from services.results_stream import ensure_results_stream_worker
+from services.session_reaper import ensure_session_reaper
+from services.vote_outbox import ensure_vote_outbox_worker
 
 # Importações de rotas existentes
 from routes.auth import auth_bp
@@ -71,6 +76,9 @@ def create_app() -> Flask:
     if app.config.get("TESTING"):
         limiter.enabled = False
     Swagger(app, template=SWAGGER_TEMPLATE, config=SWAGGER_CONFIG)
+    if not app.config.get("TESTING"):
+        # kill -HUP <pid do worker> rele CONTRACT_ADDRESS, chave e ABI sem reiniciar.
+        install_reload_signal()
 
     with app.app_context():
         try:
@@ -101,6 +109,13 @@ def create_app() -> Flask:
     def swagger_alias():
         return redirect("/apidocs/", code=302)
 
+    @app.before_request
+    def start_background_jobs() -> None:
+        ensure_session_reaper(app)
+        ensure_vote_outbox_worker(app)
+        ensure_owner_tx_monitor(app)
+        ensure_results_stream_worker(app)
+
     @app.teardown_appcontext
     def shutdown_session(exception: Exception | None = None) -> None:
         db.session.remove()
@@ -1,12 +1,56 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from dataclasses import dataclass
 from functools import lru_cache
+from typing import Any, Optional
+from urllib.parse import urlsplit
 import os
+import threading
+import time
 
+import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from web3 import Web3
+from web3._utils.batching import sort_batch_response_by_response_ids
+from web3.providers.base import JSONBaseProvider
 
 
 load_dotenv()
 
+_PROVIDER_URIS_ENV = "WEB3_PROVIDER_URIS"
+_TIMEOUT_ENV = "WEB3_REQUEST_TIMEOUT_SECONDS"
+_POOL_SIZE_ENV = "WEB3_POOL_SIZE"
+_HEDGE_ENV = "WEB3_HEDGE_READS"
+_HEDGE_AFTER_ENV = "WEB3_HEDGE_AFTER_MS"
+_COOLDOWN_ENV = "WEB3_PROVIDER_COOLDOWN_SECONDS"
+_DEFAULT_TIMEOUT_SECONDS = 10.0
+_DEFAULT_POOL_SIZE = 10
+_DEFAULT_HEDGE_AFTER_MS = 150.0
+_DEFAULT_COOLDOWN_SECONDS = 30.0
+_LATENCY_ALPHA = 0.2
+
+# Leituras que podem ir a dois provedores ao mesmo tempo sem efeito colateral.
+HEDGEABLE_METHODS = frozenset(
+    {
+        "eth_blockNumber",
+        "eth_call",
+        "eth_chainId",
+        "eth_estimateGas",
+        "eth_feeHistory",
+        "eth_gasPrice",
+        "eth_getBalance",
+        "eth_getBlockByNumber",
+        "eth_getCode",
+        "eth_getLogs",
+        "eth_getTransactionByHash",
+        "eth_getTransactionCount",
+        "eth_getTransactionReceipt",
+        "eth_maxPriorityFeePerGas",
+        "net_version",
+        "web3_clientVersion",
+    }
+)
+
 
 def _normalize(value: str | None) -> str | None:
     if not value:
@@ -15,9 +59,193 @@ def _normalize(value: str | None) -> str | None:
     return stripped or None
 
 
-def connect_blockchain(provider_url: str) -> Web3:
-    """Create a Web3 instance for the given provider URL."""
-    return Web3(Web3.HTTPProvider(provider_url))
+def _redact(url: str) -> str:
+    """Esquema e host do provedor; caminho e query costumam levar a chave da API."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.rsplit('@', 1)[-1]}"
+
+
+@dataclass
+class _Endpoint:
+    url: str
+    requests: int = 0
+    errors: int = 0
+    latency_ms: Optional[float] = None
+    last_error: Optional[str] = None
+    cooldown_until: float = 0.0
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Provider JSON-RPC com varios endpoints, failover e leituras com hedge.
+
+    Cada thread tem uma sessao keep-alive por endpoint. Os endpoints sao
+    ordenados pela latencia observada (media movel); um endpoint que falha
+    (transporte, timeout, HTTP 4xx/5xx) fica em cooldown e vai para o fim da
+    fila. Com ``hedge_reads``, uma leitura de ``HEDGEABLE_METHODS`` sem
+    resposta em ``hedge_after_ms`` tambem vai ao segundo endpoint e vale a
+    primeira resposta. Erros JSON-RPC (revert, nonce...) voltam ao chamador
+    sem failover.
+    """
+
+    def __init__(
+        self,
+        endpoint_uris: list[str],
+        timeout: float | None = None,
+        pool_size: int | None = None,
+        hedge_reads: bool | None = None,
+        hedge_after_ms: float | None = None,
+        cooldown_seconds: float | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        if not endpoint_uris:
+            raise ValueError("At least one RPC endpoint is required")
+        self.timeout = timeout if timeout is not None else float(os.getenv(_TIMEOUT_ENV, _DEFAULT_TIMEOUT_SECONDS))
+        self.pool_size = pool_size if pool_size is not None else int(os.getenv(_POOL_SIZE_ENV, _DEFAULT_POOL_SIZE))
+        self.hedge_reads = (
+            hedge_reads if hedge_reads is not None else os.getenv(_HEDGE_ENV, "0").lower() in {"1", "true", "yes"}
+        )
+        self.hedge_after = (
+            hedge_after_ms if hedge_after_ms is not None else float(os.getenv(_HEDGE_AFTER_ENV, _DEFAULT_HEDGE_AFTER_MS))
+        ) / 1000
+        self.cooldown_seconds = (
+            cooldown_seconds if cooldown_seconds is not None else float(os.getenv(_COOLDOWN_ENV, _DEFAULT_COOLDOWN_SECONDS))
+        )
+        self.endpoints = [_Endpoint(url) for url in dict.fromkeys(endpoint_uris)]
+        self.hedged = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __str__(self) -> str:
+        return f"RPC pool {', '.join(_redact(endpoint.url) for endpoint in self.endpoints)}"
+
+    def make_request(self, method, params: Any):
+        data = self.encode_rpc_request(method, params)
+        ranked = self._ranked()
+        if self.hedge_reads and method in HEDGEABLE_METHODS and len(ranked) > 1:
+            return self._hedged(data, ranked)
+        return self._failover(data, ranked)
+
+    def make_batch_request(self, batch_requests: list[tuple[Any, Any]]):
+        response = self._failover(self.encode_batch_rpc_request(batch_requests), self._ranked())
+        if not isinstance(response, list):
+            # Erro unico: o no recusou o lote inteiro.
+            return response
+        return sort_batch_response_by_response_ids(response)
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "url": _redact(endpoint.url),
+                    "requests": endpoint.requests,
+                    "errors": endpoint.errors,
+                    "latency_ms": round(endpoint.latency_ms, 1) if endpoint.latency_ms is not None else None,
+                    "healthy": endpoint.cooldown_until <= now,
+                    "last_error": endpoint.last_error,
+                }
+                for endpoint in self.endpoints
+            ]
+
+    def _ranked(self) -> list[_Endpoint]:
+        now = time.monotonic()
+        with self._lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.cooldown_until <= now]
+            cooling = [endpoint for endpoint in self.endpoints if endpoint.cooldown_until > now]
+        # Sem medida ainda conta como 0: cada endpoint novo e experimentado logo.
+        healthy.sort(key=lambda endpoint: endpoint.latency_ms or 0.0)
+        cooling.sort(key=lambda endpoint: endpoint.cooldown_until)
+        return healthy + cooling
+
+    def _session(self, endpoint: _Endpoint) -> requests.Session:
+        sessions = getattr(self._local, "sessions", None)
+        if sessions is None:
+            sessions = self._local.sessions = {}
+        session = sessions.get(endpoint.url)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.pool_size, 1))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Content-Type": "application/json"})
+            sessions[endpoint.url] = session
+        return session
+
+    def _post(self, endpoint: _Endpoint, data: bytes) -> bytes:
+        response = self._session(endpoint).post(endpoint.url, data=data, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def _send(self, endpoint: _Endpoint, data: bytes):
+        started = time.monotonic()
+        try:
+            response = self.decode_rpc_response(self._post(endpoint, data))
+        except (requests.RequestException, ValueError) as exc:
+            with self._lock:
+                endpoint.requests += 1
+                endpoint.errors += 1
+                # So o tipo: a mensagem do requests traz a URL, com a chave da API.
+                endpoint.last_error = type(exc).__name__
+                endpoint.cooldown_until = time.monotonic() + self.cooldown_seconds
+            raise
+        elapsed_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            endpoint.requests += 1
+            endpoint.cooldown_until = 0.0
+            if endpoint.latency_ms is None:
+                endpoint.latency_ms = elapsed_ms
+            else:
+                endpoint.latency_ms += _LATENCY_ALPHA * (elapsed_ms - endpoint.latency_ms)
+        return response
+
+    def _failover(self, data: bytes, ranked: list[_Endpoint]):
+        error: Optional[Exception] = None
+        for endpoint in ranked:
+            try:
+                return self._send(endpoint, data)
+            except (requests.RequestException, ValueError) as exc:
+                error = exc
+        raise error
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=max(self.pool_size, 2), thread_name_prefix="web3-hedge"
+                    )
+        return self._executor
+
+    def _hedged(self, data: bytes, ranked: list[_Endpoint]):
+        executor = self._pool()
+        first = executor.submit(self._send, ranked[0], data)
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FuturesTimeout:
+            pass
+        except (requests.RequestException, ValueError):
+            return self._failover(data, ranked[1:])
+        with self._lock:
+            self.hedged += 1
+        pending = {first, executor.submit(self._send, ranked[1], data)}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if len(ranked) > 2:
+            return self._failover(data, ranked[2:])
+        raise error
+
+
+def connect_blockchain(provider_url: str | list[str]) -> Web3:
+    """Create a Web3 instance for the given provider URL(s)."""
+    urls = [provider_url] if isinstance(provider_url, str) else list(provider_url)
+    return Web3(PooledHTTPProvider(urls))
 
 
 def is_blockchain_connected(web3: Web3) -> bool:
@@ -28,6 +256,11 @@ def get_latest_block(web3: Web3) -> int:
     return web3.eth.block_number
 
 
+def get_provider_stats(web3: Web3) -> list[dict] | None:
+    stats = getattr(getattr(web3, "provider", None), "stats", None)
+    return stats() if callable(stats) else None
+
+
 def resolve_provider_url(provider_url: str | None = None) -> str | None:
     direct = _normalize(provider_url)
     if direct:
@@ -44,9 +277,21 @@ def resolve_provider_url(provider_url: str | None = None) -> str | None:
     return env_provider or infura_url
 
 
+def resolve_provider_urls(provider_url: str | None = None) -> list[str]:
+    """WEB3_PROVIDER_URIS (separadas por virgula) seguidas do provedor unico, sem repeticao."""
+    direct = _normalize(provider_url)
+    if direct:
+        return [direct]
+    urls = [url for url in (_normalize(item) for item in os.getenv(_PROVIDER_URIS_ENV, "").split(",")) if url]
+    single = resolve_provider_url()
+    if single:
+        urls.append(single)
+    return list(dict.fromkeys(urls))
+
+
 @lru_cache(maxsize=1)
 def get_web3(provider_url: str | None = None) -> Web3:
-    resolved_url = resolve_provider_url(provider_url)
-    if not resolved_url:
+    resolved_urls = resolve_provider_urls(provider_url)
+    if not resolved_urls:
         raise RuntimeError("No blockchain provider configured. Set INFURA_URL or WEB3_PROVIDER_URI.")
-    return connect_blockchain(resolved_url)
+    return connect_blockchain(resolved_urls)
@@ -22,6 +22,7 @@ contract AthenaElection {
     event ElectionClosed(uint256 indexed electionId, string name);
     event CandidateAdded(uint256 indexed candidateId, string name);
     event VoteCast(uint256 indexed electionId, address indexed voter, uint256 indexed candidateId);
+    event BatchVoteCast(uint256 indexed electionId, uint256 voteCount);
 
     modifier onlyOwner() {
         require(msg.sender == owner, "Only owner");
@@ -77,6 +78,24 @@ contract AthenaElection {
         emit VoteCast(electionId, msg.sender, candidateId);
     }
 
+    /// @notice Registra em uma única transação votos já validados pela API (somente owner)
+    /// @dev O owner retransmite votos de vários eleitores, por isso não há checagem por remetente
+    /// @param candidateIds Índices dos candidatos, um por voto, na ordem do lote
+    function batchVote(uint256[] calldata candidateIds) external onlyOwner {
+        require(electionOpen, "Election closed");
+        require(candidateIds.length > 0, "Empty batch");
+
+        uint256 total = _candidates.length;
+        for (uint256 i = 0; i < candidateIds.length; i++) {
+            uint256 candidateId = candidateIds[i];
+            require(candidateId < total, "Invalid candidate");
+            _candidates[candidateId].voteCount += 1;
+            emit VoteCast(electionId, msg.sender, candidateId);
+        }
+
+        emit BatchVoteCast(electionId, candidateIds.length);
+    }
+
     /// @notice Retorna o total de candidatos configurados
     function candidateCount() external view returns (uint256) {
         return _candidates.length;
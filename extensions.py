@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import os
+
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
+# Registra o esquema mmap:// no limits antes de o Limiter resolver storage_uri.
+import services.rate_limit_storage
+
 
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["100 per minute"],
-    storage_uri="memory://",
+    storage_uri=os.getenv("RATELIMIT_STORAGE_URI", "memory://"),
 )
 
 __all__ = ["limiter"]
@@ -8,6 +8,14 @@ from .candidato import Candidato
 from .voto import Voto
 from .audit_log import AuditLog
 from .session_token import SessionToken
+from .revoked_token import RevokedToken
+from .vote_outbox import VoteOutbox
+from .owner_nonce import OwnerNonce
+from .owner_transaction import OwnerTransaction
+from .owner_transaction_hash import OwnerTransactionHash
+from .candidate_vote_counter import CandidateVoteCounter
+from .idempotency_key import IdempotencyKey
+from .transaction_receipt import TransactionReceipt
 
 __all__ = [
     "db",
@@ -17,4 +25,12 @@ __all__ = [
     "Voto",
     "AuditLog",
     "SessionToken",
+    "RevokedToken",
+    "VoteOutbox",
+    "OwnerNonce",
+    "OwnerTransaction",
+    "OwnerTransactionHash",
+    "CandidateVoteCounter",
+    "IdempotencyKey",
+    "TransactionReceipt",
 ]
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from . import db
+
+
+class CandidateVoteCounter(db.Model):
+    """Total de votos de um candidato dividido em shards para reduzir disputa de lock."""
+
+    __tablename__ = "candidate_vote_counters"
+
+    candidato_id = db.Column(
+        db.Integer,
+        db.ForeignKey("candidatos.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    eleicao_id = db.Column(db.Integer, nullable=False, index=True)
+    votes = db.Column(db.Integer, nullable=False, default=0)
+
+    candidato = db.relationship("Candidato", back_populates="vote_counters")
+
+
+__all__ = ["CandidateVoteCounter"]
@@ -16,3 +16,8 @@ class Candidato(db.Model):
         back_populates="candidato",
         cascade="all, delete-orphan",
     )
+    vote_counters = db.relationship(
+        "CandidateVoteCounter",
+        back_populates="candidato",
+        cascade="all, delete-orphan",
+    )
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from . import db
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class IdempotencyKey(db.Model):
+    """Resposta guardada de uma requisicao com ``Idempotency-Key``, ate ``expires_at``."""
+
+    __tablename__ = "idempotency_keys"
+
+    id = db.Column(db.Integer, primary_key=True)
+    # sha256 de usuario + metodo + rota + chave enviada pelo cliente.
+    key_hash = db.Column(db.String(64), unique=True, nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default="processing")
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    locked_until = db.Column(db.DateTime(timezone=True), nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), default=_utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+
+__all__ = ["IdempotencyKey"]
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from . import db
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class OwnerNonce(db.Model):
+    __tablename__ = "owner_nonces"
+
+    address = db.Column(db.String(42), primary_key=True)
+    next_nonce = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), default=_utcnow, onupdate=_utcnow, nullable=False)
+
+
+__all__ = ["OwnerNonce"]
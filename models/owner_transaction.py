@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from . import db
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class OwnerTransaction(db.Model):
+    __tablename__ = "owner_transactions"
+    __table_args__ = (
+        db.UniqueConstraint("address", "nonce", name="uq_owner_transactions_address_nonce"),
+        db.Index("ix_owner_transactions_status_sent_at", "status", "sent_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    address = db.Column(db.String(42), nullable=False)
+    nonce = db.Column(db.Integer, nullable=False)
+    tx_hash = db.Column(db.String(80), nullable=False, index=True)
+    # Quem pediu o envio (ex.: submission_ref do outbox), para reconciliar apos falhas.
+    reference = db.Column(db.String(32), nullable=True, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    max_fee_per_gas = db.Column(db.BigInteger, nullable=False)
+    max_priority_fee_per_gas = db.Column(db.BigInteger, nullable=False)
+    replacements = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(16), nullable=False, default="pending")
+    sent_at = db.Column(db.DateTime(timezone=True), default=_utcnow, nullable=False)
+
+
+__all__ = ["OwnerTransaction"]
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from . import db
+
+
+class OwnerTransactionHash(db.Model):
+    """Hash substituido por taxa maior, apontando para a transacao vigente do mesmo nonce."""
+
+    __tablename__ = "owner_transaction_hashes"
+
+    tx_hash = db.Column(db.String(80), primary_key=True)
+    owner_transaction_id = db.Column(
+        db.Integer,
+        db.ForeignKey("owner_transactions.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+
+__all__ = ["OwnerTransactionHash"]
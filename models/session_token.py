@@ -15,12 +15,17 @@ def _utcnow() -> datetime:
 
 class SessionToken(db.Model):
     __tablename__ = "session_store"
+    __table_args__ = (
+        # Sessoes tem address NULL, entao a unicidade so restringe um nonce por endereco.
+        db.UniqueConstraint("kind", "address", name="uq_session_store_kind_address"),
+        db.Index("ix_session_store_kind_session_id", "kind", "session_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    kind = db.Column(db.String(20), nullable=False, default="session", index=True)
+    kind = db.Column(db.String(20), nullable=False, default="session")
     session_id = db.Column(db.String(128), unique=True, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), nullable=True, index=True)
-    address = db.Column(db.String(255), nullable=True, index=True)
+    address = db.Column(db.String(255), nullable=True)
     nonce = db.Column(db.String(255), nullable=True)
     csrf_token = db.Column(db.String(128), nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), default=_utcnow, nullable=False)
@@ -32,6 +37,10 @@ class SessionToken(db.Model):
     def default_session_expiry(cls) -> datetime:
         return _utcnow() + _SESSION_DEFAULT_TTL
 
+    @classmethod
+    def session_ttl(cls) -> timedelta:
+        return _SESSION_DEFAULT_TTL
+
     @classmethod
     def default_nonce_expiry(cls) -> datetime:
         return _utcnow() + _NONCE_DEFAULT_TTL
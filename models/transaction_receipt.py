@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from . import db
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class TransactionReceipt(db.Model):
+    """Recibo de transacao com confirmacoes suficientes; nao muda mais."""
+
+    __tablename__ = "transaction_receipts"
+
+    tx_hash = db.Column(db.String(80), primary_key=True)
+    # Hash minerado; difere de ``tx_hash`` quando a transacao foi substituida por taxa.
+    transaction_hash = db.Column(db.String(80), nullable=False)
+    status = db.Column(db.Integer, nullable=False)
+    block_number = db.Column(db.BigInteger, nullable=False)
+    gas_used = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), default=_utcnow, nullable=False)
+
+
+__all__ = ["TransactionReceipt"]
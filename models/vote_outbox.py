@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from . import db
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class VoteOutbox(db.Model):
+    __tablename__ = "vote_outbox"
+    __table_args__ = (
+        db.Index("ix_vote_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tracking_id = db.Column(db.String(36), unique=True, nullable=False)
+    voto_id = db.Column(db.Integer, db.ForeignKey("votos.id", ondelete="CASCADE"), unique=True, nullable=False)
+    eleicao_id = db.Column(db.Integer, nullable=False)
+    candidate_index = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime(timezone=True), nullable=False, default=_utcnow)
+    locked_until = db.Column(db.DateTime(timezone=True), nullable=True)
+    submitted_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    tx_hash = db.Column(db.String(80), nullable=True)
+    # Referencia gravada em owner_transactions antes do envio; reservada com UPDATE condicional.
+    submission_ref = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=_utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), default=_utcnow, onupdate=_utcnow, nullable=False)
+
+    voto = db.relationship("Voto", back_populates="outbox")
+
+
+__all__ = ["VoteOutbox"]
@@ -15,6 +15,15 @@ class Voto(db.Model):
     candidato_id = db.Column(db.Integer, db.ForeignKey("candidatos.id", ondelete="CASCADE"), nullable=False)
     hash_blockchain = db.Column(db.String(255), unique=True, nullable=False)
     timestamp = db.Column(db.DateTime(timezone=True), default=_utcnow)
+    # Transacao batchVote que levou o voto ao contrato e a posicao dele no lote.
+    batch_tx_hash = db.Column(db.String(80), nullable=True, index=True)
+    batch_position = db.Column(db.Integer, nullable=True)
 
     eleicao = db.relationship("Eleicao", back_populates="votos")
     candidato = db.relationship("Candidato", back_populates="votos")
+    outbox = db.relationship(
+        "VoteOutbox",
+        back_populates="voto",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
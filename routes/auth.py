@@ -8,7 +8,7 @@ from dtos.auth_dto import CheckAuthDTO, RequestNonceDTO
 from routes.security import extract_bearer_token, get_session_store, require_auth
 from services.auth_service import ServiceResponse, generate_nonce_response, logout_response, verify_signature_response
 from services.session_service import ResolvedSession
-from services.user_service import get_or_create_user, serialize_user
+from services.user_service import serialize_user, upsert_user
 
 
 auth_bp = Blueprint("auth", __name__)
@@ -245,26 +245,30 @@ def login() -> tuple:
     except RuntimeError as exc:
         return jsonify({"error": str(exc)}), 503
 
-    nonce_store = get_session_store()
-    verification_response = verify_signature_response(
-        address=dto.address,
-        signature=dto.signature,
-        store=nonce_store,
-        web3=web3,
-    )
+    store = get_session_store()
+    with store.login_transaction() as transaction:
+        verification_response = verify_signature_response(
+            address=dto.address,
+            signature=dto.signature,
+            store=transaction,
+            web3=web3,
+        )
 
-    if not verification_response.payload.get("success"):
-        return jsonify(verification_response.payload), verification_response.status
+        if not verification_response.payload.get("success"):
+            return jsonify(verification_response.payload), verification_response.status
+        if transaction.nonce_conflict:
+            return jsonify({"success": False, "error": "No nonce found for this address"}), 400
 
-    normalized_address = verification_response.payload.get("address")
-    user = get_or_create_user(normalized_address)
-    session = get_session_store().create(user.id)
+        normalized_address = verification_response.payload.get("address")
+        user = upsert_user(normalized_address)
+        session = transaction.create(user.id)
+        body = {
+            "token": session.token,
+            "csrf_token": session.csrf_token,
+            "user": serialize_user(user),
+        }
+        transaction.commit()
 
-    body = {
-        "token": session.token,
-        "csrf_token": session.csrf_token,
-        "user": serialize_user(user),
-    }
     return jsonify(body), 200
 
 
@@ -3,7 +3,7 @@
 # routes/blockchain.py
 
 from flask import Blueprint, jsonify
-from services.blockchain_integration import verify_transaction_on_chain
+from services.receipt_cache import verify_transaction
 
 blockchain_bp = Blueprint('blockchain_bp', __name__, url_prefix='/api/blockchain')
 
@@ -11,7 +11,7 @@ blockchain_bp = Blueprint('blockchain_bp', __name__, url_prefix='/api/blockchain
 def verify_hash(hash: str):
     """
     Verifica um hash de transação na blockchain.
-    Consulta um nó da blockchain para obter o recibo de uma transação a partir do seu hash.
+    Consulta o recibo da transação: primeiro o cache local e os votos gravados, depois um nó da blockchain.
     ---
     tags:
       - blockchain
@@ -68,7 +68,7 @@ def verify_hash(hash: str):
             type: string
             example: "Transação não encontrada ou ainda pendente."
     """
-    result = verify_transaction_on_chain(hash)
+    result = verify_transaction(hash)
     
     if not result.get("verified"):
         status_code = 404 if result.get("status") == "not_found" else 400
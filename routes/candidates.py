@@ -10,7 +10,7 @@ from services.candidate_service import (
     list_candidates,
     update_candidate,
 )
-from routes.security import require_auth
+from routes.security import idempotent, require_auth
 
 
 candidates_bp = Blueprint("candidates", __name__)
@@ -22,6 +22,7 @@ def _format_validation_error(exc: ValidationError) -> list[str]:
 
 @candidates_bp.route("/api/eleicoes/<int:election_id>/candidatos", methods=["POST"])
 @require_auth()
+@idempotent
 def create(election_id: int) -> tuple:
     """Adiciona um candidato a uma eleição.
     ---
@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 
-from flask import Blueprint, abort, jsonify, request
+import io
+
+from flask import Blueprint, abort, current_app, jsonify, request
 from pydantic import ValidationError
 
 from dtos.election_dto import CreateElectionDTO, UpdateElectionDTO
 from dtos.vote_dto import CastVoteDTO
 from extensions import limiter
-from routes.security import require_auth
+from routes.security import authenticated_wallet_key, idempotent, require_auth
 from services.election_service import (
     create_election,
     delete_election,
@@ -18,8 +20,11 @@ from services.election_service import (
     update_election,
 )
 
+from services.results_cache import results_cache
+from services.vote_import import FORMAT_CSV, FORMAT_NDJSON, import_ballots
+from services.results_stream import RETRY, format_event, results_broadcaster
 from services.vote_service import (
-    get_election_results,
+    get_cached_election_results,
     get_election_status,
     register_vote,
 )
@@ -279,6 +284,7 @@ def delete(election_id: int) -> tuple:
 
 @elections_bp.route("/api/eleicoes/<int:election_id>/start", methods=["POST"])
 @require_auth()
+@idempotent
 def start(election_id: int) -> tuple:
     """Inicia a eleição e opcionalmente sincroniza com o contrato.
     ---
@@ -306,6 +312,7 @@ def start(election_id: int) -> tuple:
 
 @elections_bp.route("/api/eleicoes/<int:election_id>/end", methods=["POST"])
 @require_auth()
+@idempotent
 def end(election_id: int) -> tuple:
     """Encerra a eleição e opcionalmente sincroniza com o contrato.
     ---
@@ -333,7 +340,9 @@ def end(election_id: int) -> tuple:
 
 @elections_bp.route("/api/eleicoes/<int:election_id>/votar", methods=["POST"])
 @require_auth()
+@idempotent
 @limiter.limit("10 per minute")
+@limiter.limit("10 per minute", key_func=authenticated_wallet_key)
 def cast_vote(election_id: int) -> tuple:
     """Registra um voto para a eleição informada. Requer header X-CSRF-Token."""
     payload = request.get_json(silent=True) or {}
@@ -342,13 +351,75 @@ def cast_vote(election_id: int) -> tuple:
     except ValidationError as exc:
         return jsonify({"error": _format_validation_error(exc)}), 400
     vote = register_vote(election_id, dto)
-    return jsonify(vote), 201
+    # 202 quando o envio on-chain ficou no outbox; acompanhe via /api/votos/<tracking_id>/status
+    status_code = 202 if "tracking_id" in vote else 201
+    return jsonify(vote), status_code
+
+
+@elections_bp.route("/api/eleicoes/<int:election_id>/votos/importar", methods=["POST"])
+@require_auth()
+def import_election_ballots(election_id: int) -> tuple:
+    """Importa cedulas em lote (NDJSON ou CSV com candidato_id,hash_blockchain).
+
+    O corpo e lido em streaming; ``text/csv`` ou ``?formato=csv`` seleciona CSV.
+    Responde com as contagens e os erros por linha.
+    """
+    fmt = request.args.get("formato") or (FORMAT_CSV if request.mimetype == "text/csv" else FORMAT_NDJSON)
+    if fmt not in (FORMAT_CSV, FORMAT_NDJSON):
+        return jsonify({"error": ["formato must be csv or ndjson"]}), 400
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8-sig", newline="")
+    return jsonify(import_ballots(election_id, stream, fmt)), 200
 
 
 @elections_bp.route("/api/eleicoes/<int:election_id>/resultados", methods=["GET"])
-def election_results(election_id: int) -> tuple:
-    results = get_election_results(election_id)
-    return jsonify(results), 200
+def election_results(election_id: int):
+    """Resultados da eleição, servidos do cache com ETag (If-None-Match -> 304)."""
+    cached, hit = get_cached_election_results(election_id)
+    if request.if_none_match.contains(cached.etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(cached.body, mimetype="application/json")
+    response.set_etag(cached.etag)
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    response.headers["X-Results-Age"] = f"{results_cache.now() - cached.built_at:.3f}"
+    return response
+
+
+@elections_bp.route("/api/eleicoes/<int:election_id>/resultados/stream", methods=["GET"])
+def election_results_stream(election_id: int):
+    """Resultados ao vivo via Server-Sent Events.
+
+    Envia ``snapshot`` na conexao, ``delta`` a cada voto e ``totals`` quando
+    o ``Last-Event-ID`` nao pode ser retomado com deltas.
+    """
+    cached, _ = get_cached_election_results(election_id)
+    try:
+        last_id = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        last_id = None
+
+    if not results_broadcaster.subscribe(election_id):
+        abort(503, description="Too many open result streams")
+
+    def generate():
+        nonlocal last_id
+        yield RETRY
+        if last_id is None:
+            last_id = cached.payload["total_votos"]
+            yield format_event("snapshot", last_id, cached.body)
+        yield from results_broadcaster.stream(election_id, last_id)
+
+    response = current_app.response_class(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    response.call_on_close(lambda: results_broadcaster.unsubscribe(election_id))
+    return response
+
+
+@elections_bp.route("/api/eleicoes/resultados/cache", methods=["GET"])
+def election_results_cache_stats() -> tuple:
+    """Taxa de acerto e idade das entradas do cache de resultados deste worker."""
+    return jsonify(results_cache.stats()), 200
 
 
 @elections_bp.route("/api/eleicoes/<int:election_id>/status", methods=["GET"])
@@ -5,7 +5,7 @@ import time
 
 from flask import Blueprint, jsonify
 
-from config.BlockChain import get_web3, get_latest_block, is_blockchain_connected
+from config.BlockChain import get_latest_block, get_provider_stats, get_web3, is_blockchain_connected
 from config.Database import check_db_connection, get_db_config, is_db_config_complete
 from services.health_service import HealthLogEntry, build_health_response
 
@@ -49,6 +49,11 @@ def healthcheck() -> tuple:
                   type: integer
                   format: int64
                   x-nullable: true
+                providers:
+                  type: array
+                  description: Latencia e erros de cada endpoint RPC (sem a chave da URL).
+                  items:
+                    type: object
             database:
               type: object
               properties:
@@ -75,6 +80,7 @@ def healthcheck() -> tuple:
         database_connected=check_db_connection,
         config_checker=is_db_config_complete,
         now=time.time,
+        provider_stats=get_provider_stats,
     )
 
     _log_health_entries(response.logs)
@@ -98,6 +104,7 @@ def healthcheck_ready() -> tuple:
         retry_delay=0.2,
         require_blockchain=True,
         require_database=True,
+        provider_stats=get_provider_stats,
     )
 
     _log_health_entries(response.logs)
@@ -3,19 +3,34 @@ from __future__ import annotations
 from functools import wraps
 from typing import Any, Callable, TypeVar
 
-from flask import Response, current_app, g, jsonify, request
-
+from flask import Response, current_app, g, jsonify, make_response, request
+from flask_limiter.util import get_remote_address
+from werkzeug.exceptions import HTTPException
+
+from services.idempotency import (
+    BUSY,
+    MISMATCH,
+    REPLAY,
+    IdempotencyStore,
+    idempotency_key_hash,
+    request_fingerprint,
+)
+from services.session_backends import build_session_backend
 from services.session_service import SessionStore
+from services.signed_tokens import build_token_codec
 
 F = TypeVar("F", bound=Callable[..., Any])
 _MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
 _SESSION_STORE_KEY = "session_store"
+_IDEMPOTENCY_STORE_KEY = "idempotency_store"
+_IDEMPOTENCY_HEADER = "Idempotency-Key"
+_MAX_IDEMPOTENCY_KEY_LENGTH = 255
 
 
 def get_session_store() -> SessionStore:
     store = current_app.extensions.get(_SESSION_STORE_KEY)
     if store is None:
-        store = SessionStore()
+        store = SessionStore(backend=build_session_backend(), codec=build_token_codec())
         current_app.extensions[_SESSION_STORE_KEY] = store
     return store
 
@@ -30,6 +45,19 @@ def extract_bearer_token() -> str | None:
     return token or None
 
 
+def authenticated_wallet_key() -> str:
+    """Chave de rate limit pelo usuario autenticado; sem sessao valida cai para o IP.
+
+    Usa so o id, que a sessao ja traz: nenhum SELECT do usuario por requisicao.
+    """
+    token = extract_bearer_token()
+    if token:
+        resolved = get_session_store().resolve(token)
+        if resolved is not None:
+            return f"user:{resolved.user.id}"
+    return get_remote_address()
+
+
 def require_auth(*, csrf: bool = True, role: str | None = None) -> Callable[[F], F]:
     def decorator(func: F) -> F:
         @wraps(func)
@@ -45,7 +73,7 @@ def require_auth(*, csrf: bool = True, role: str | None = None) -> Callable[[F],
 
             if csrf and request.method in _MUTATING_METHODS:
                 header_token = request.headers.get("X-CSRF-Token")
-                if not header_token or header_token != resolved.csrf_token:
+                if not header_token or not resolved.csrf_matches(header_token):
                     return jsonify({"error": "Invalid CSRF token"}), 403
 
             if role is not None:
@@ -62,4 +90,68 @@ def require_auth(*, csrf: bool = True, role: str | None = None) -> Callable[[F],
     return decorator
 
 
-__all__ = ["extract_bearer_token", "get_session_store", "require_auth"]
+def get_idempotency_store() -> IdempotencyStore:
+    store = current_app.extensions.get(_IDEMPOTENCY_STORE_KEY)
+    if store is None:
+        store = IdempotencyStore()
+        current_app.extensions[_IDEMPOTENCY_STORE_KEY] = store
+    return store
+
+
+def idempotent(func: F) -> F:
+    """Suporte a ``Idempotency-Key``: a repeticao devolve a resposta guardada.
+
+    Aplicar abaixo de ``require_auth``: a chave vale por usuario, metodo e rota.
+    Respostas 2xx/4xx sao guardadas; 5xx e excecoes liberam a chave para nova
+    tentativa. A mesma chave com outro corpo responde 422.
+    """
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Response:
+        key = request.headers.get(_IDEMPOTENCY_HEADER)
+        if not key:
+            return func(*args, **kwargs)
+        if len(key) > _MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({"error": f"{_IDEMPOTENCY_HEADER} is too long"}), 400
+
+        user = getattr(g, "current_user", None)
+        scope = f"{user.id if user is not None else '-'}:{request.method}:{request.path}"
+        key_hash = idempotency_key_hash(scope, key)
+        store = get_idempotency_store()
+        claim = store.claim(key_hash, request_fingerprint(request.get_data(cache=True)))
+        if claim.outcome == REPLAY:
+            response = current_app.response_class(claim.body, status=claim.status, mimetype="application/json")
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+        if claim.outcome == MISMATCH:
+            return jsonify({"error": f"{_IDEMPOTENCY_HEADER} was already used with a different request"}), 422
+        if claim.outcome == BUSY:
+            return jsonify({"error": f"A request with this {_IDEMPOTENCY_HEADER} is still in progress"}), 409
+
+        try:
+            try:
+                response = make_response(func(*args, **kwargs))
+            except HTTPException as exc:
+                if exc.code is None or exc.code >= 500:
+                    raise
+                response = make_response(current_app.handle_user_exception(exc))
+        except BaseException:
+            store.release(key_hash)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            store.release(key_hash)
+        else:
+            store.complete(key_hash, response.status_code, response.get_data(as_text=True))
+        return response
+
+    return wrapper  # type: ignore[return-value]
+
+
+__all__ = [
+    "authenticated_wallet_key",
+    "extract_bearer_token",
+    "get_idempotency_store",
+    "get_session_store",
+    "idempotent",
+    "require_auth",
+]
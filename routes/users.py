@@ -3,7 +3,7 @@ from __future__ import annotations
 from flask import Blueprint, g, jsonify, request
 
 from dtos.user_dto import UpdateUserProfileDTO
-from routes.security import require_auth
+from routes.security import get_session_store, require_auth
 from services.user_service import update_user_profile
 
 
@@ -34,4 +34,5 @@ def update_profile() -> tuple:
         return jsonify({"error": str(exc)}), 400
 
     updated = update_user_profile(g.current_user, dto)
+    get_session_store().invalidate_user(g.current_user.id)
     return jsonify(updated), 200
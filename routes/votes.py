@@ -3,6 +3,7 @@ from __future__ import annotations
 from flask import Blueprint, jsonify
 
 from services import vote_service
+from services.vote_outbox import get_vote_status
 
 
 votes_bp = Blueprint("votes", __name__, url_prefix="/api/votos")
@@ -16,3 +17,8 @@ def verify_vote(tx_hash: str) -> tuple:
         status_code = 404 if status == "not_found" else 400
         return jsonify(result), status_code
     return jsonify(result), 200
+
+
+@votes_bp.route("/<string:tracking_id>/status", methods=["GET"])
+def vote_status(tracking_id: str) -> tuple:
+    return jsonify(get_vote_status(tracking_id)), 200
@@ -0,0 +1,79 @@
+"""Benchmark of login signature recovery: inline vs. process pool.
+
+Simulates a login burst by recovering N signed nonces from T concurrent
+threads (as a threaded gunicorn worker would) and prints logins/sec for the
+inline path and for SignaturePool with the requested size.
+
+Usage:
+    python scripts/bench_signature_recovery.py --logins 400 --threads 8 --pool-size 4
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from services.auth_service import default_nonce_factory
+from services.signature_pool import SignaturePool, recover_message_signer
+
+
+def _build_requests(count: int) -> list[tuple[str, str, str]]:
+    account = Account.create()
+    requests = []
+    for _ in range(count):
+        nonce = default_nonce_factory()
+        signature = account.sign_message(encode_defunct(text=nonce)).signature.hex()
+        requests.append((account.address, nonce, signature))
+    return requests
+
+
+def _run(label: str, recover, requests: list[tuple[str, str, str]], threads: int) -> float:
+    def _login(item: tuple[str, str, str]) -> None:
+        address, nonce, signature = item
+        if recover(nonce, signature) != address:
+            raise RuntimeError("signature mismatch")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(_login, requests))
+    elapsed = time.perf_counter() - started
+    rate = len(requests) / elapsed
+    print(f"{label:<22} {len(requests)} logins in {elapsed:.2f}s -> {rate:.1f} logins/sec")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    requests = _build_requests(args.logins)
+    inline_rate = _run("inline", recover_message_signer, requests, args.threads)
+
+    pool = SignaturePool(size=args.pool_size)
+    try:
+        pool.recover(requests[0][1], requests[0][2])  # aquece os processos do pool
+        pool_rate = _run(f"pool (size={args.pool_size})", pool.recover, requests, args.threads)
+
+        started = time.perf_counter()
+        pool.batch_recover((nonce, signature) for _, nonce, signature in requests)
+        elapsed = time.perf_counter() - started
+        print(f"{'batch_recover':<22} {len(requests)} logins in {elapsed:.2f}s -> {len(requests) / elapsed:.1f} logins/sec")
+    finally:
+        pool.shutdown()
+    print(f"speedup: {pool_rate / inline_rate:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
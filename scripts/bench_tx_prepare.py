@@ -0,0 +1,131 @@
+"""Benchmark of transaction preparation: one RPC per read vs. one JSON-RPC batch.
+
+Starts a local fake JSON-RPC node that answers eth_estimateGas, eth_gasPrice,
+eth_feeHistory and eth_chainId after a fixed delay per HTTP request (the round
+trip to the provider), then prepares N vote transactions with single calls and
+with prepare_transaction_inputs, printing the per-transaction latency of each.
+
+Usage:
+    python scripts/bench_tx_prepare.py --transactions 50 --latency-ms 30
+    python scripts/bench_tx_prepare.py --reject-batch   # provedor sem suporte a lotes
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from web3 import Web3
+
+from config.BlockChain import connect_blockchain
+from services.blockchain_integration import blockchain_client, prepare_transaction_inputs
+from services.fee_oracle import fee_oracle
+
+_RESULTS = {
+    "eth_estimateGas": hex(52_000),
+    "eth_gasPrice": hex(3 * 10**9),
+    "eth_chainId": hex(11155111),
+    "eth_feeHistory": {
+        "oldestBlock": hex(100),
+        "baseFeePerGas": [hex(2 * 10**9), hex(2 * 10**9)],
+        "gasUsedRatio": [0.5],
+        "reward": [[hex(10**8)]],
+    },
+}
+_CONTRACT = Web3.to_checksum_address("0x" + "ab" * 20)
+_SENDER = Web3.to_checksum_address("0x" + "cd" * 20)
+
+
+def _start_fake_node(latency: float, reject_batch: bool) -> tuple[ThreadingHTTPServer, dict]:
+    counters = {"http_requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802 - nome exigido pelo http.server
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            counters["http_requests"] += 1
+            time.sleep(latency)
+            if isinstance(payload, list):
+                if reject_batch:
+                    body = {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch not supported"}}
+                else:
+                    body = [self._answer(item) for item in payload]
+            else:
+                body = self._answer(payload)
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        @staticmethod
+        def _answer(item: dict) -> dict:
+            return {"jsonrpc": "2.0", "id": item["id"], "result": _RESULTS[item["method"]]}
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counters
+
+
+def _vote_function(web3: Web3):
+    artifact = json.loads((PROJECT_ROOT / "contracts" / "AthenaElection.json").read_text(encoding="utf-8"))
+    return web3.eth.contract(address=_CONTRACT, abi=artifact["abi"]).functions.vote(0)
+
+
+def _single_calls(web3: Web3, function) -> None:
+    # Caminho antigo: cada leitura e uma ida ao no, inclusive o chain id.
+    function.estimate_gas({"from": _SENDER})
+    web3.eth.gas_price
+    web3.eth.chain_id
+
+
+def _run(label: str, prepare, transactions: int, counters: dict) -> float:
+    before = counters["http_requests"]
+    started = time.perf_counter()
+    for _ in range(transactions):
+        prepare()
+    elapsed = time.perf_counter() - started
+    per_tx_ms = elapsed / transactions * 1000
+    round_trips = (counters["http_requests"] - before) / transactions
+    print(f"{label:<14} {per_tx_ms:7.2f} ms/tx  {round_trips:.2f} round trips/tx")
+    return per_tx_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--reject-batch", action="store_true")
+    args = parser.parse_args()
+
+    server, counters = _start_fake_node(args.latency_ms / 1000, args.reject_batch)
+    try:
+        web3 = connect_blockchain(f"http://127.0.0.1:{server.server_port}")
+        function = _vote_function(web3)
+        blockchain_client.invalidate()
+        fee_oracle.clear()
+        single = _run("single calls", lambda: _single_calls(web3, function), args.transactions, counters)
+        batched = _run(
+            "batched",
+            lambda: prepare_transaction_inputs(web3, function, _SENDER),
+            args.transactions,
+            counters,
+        )
+    finally:
+        server.shutdown()
+    print(f"speedup: {single / batched:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Import paper/offline ballots (NDJSON or CSV) into an election.
+
+Usage:
+    SQLALCHEMY_DATABASE_URI=mysql+mysqlconnector://... python scripts/import_ballots.py --election-id ID ballots.ndjson
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app
+from services.vote_import import FORMAT_CSV, FORMAT_NDJSON, BallotImporter
+
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path, help="NDJSON or CSV file with candidato_id,hash_blockchain")
+    parser.add_argument("--election-id", type=int, required=True)
+    parser.add_argument("--format", choices=[FORMAT_NDJSON, FORMAT_CSV], default=None, help="Defaults to the file suffix")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    fmt = args.format or (FORMAT_CSV if args.path.suffix.lower() == ".csv" else FORMAT_NDJSON)
+    logging.basicConfig(level=logging.INFO)
+    with app.app_context(), args.path.open(encoding="utf-8-sig", newline="") as stream:
+        report = BallotImporter(chunk_size=args.chunk_size).run(args.election_id, stream, fmt)
+    json.dump(report.to_dict(), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""Rebuild candidate_vote_counters from the votos table.
+
+Usage:
+    SQLALCHEMY_DATABASE_URI=mysql+mysqlconnector://... python scripts/rebuild_vote_counters.py [--election-id ID]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app
+from services.vote_counters import rebuild_vote_counters
+
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--election-id", type=int, default=None, help="Rebuild only this election")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with app.app_context():
+        rebuilt = rebuild_vote_counters(args.election_id)
+    logger.info("Rebuilt vote counters for %s candidates", rebuilt)
+
+
+if __name__ == "__main__":
+    main()
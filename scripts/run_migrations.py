@@ -9,10 +9,23 @@ import json
 import logging
 from contextlib import suppress
 
-from sqlalchemy import Index, inspect, select, text
+from sqlalchemy import Index, delete, func, inspect, select, text
 
 from app import app, db
-from models import AuditLog, SessionToken
+from models import (
+    AuditLog,
+    CandidateVoteCounter,
+    IdempotencyKey,
+    OwnerNonce,
+    OwnerTransaction,
+    OwnerTransactionHash,
+    RevokedToken,
+    SessionToken,
+    TransactionReceipt,
+    VoteOutbox,
+    Voto,
+)
+from services.vote_counters import rebuild_vote_counters
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +38,164 @@ def _ensure_session_store(inspector) -> None:
     Index("ix_session_store_expires_at", SessionToken.expires_at).create(bind=db.engine, checkfirst=True)
 
 
+def _dedupe_nonces(batch_size: int = 500) -> None:
+    """Mantem apenas o nonce mais recente por endereco antes de criar a restricao unica."""
+    duplicated = db.session.execute(
+        select(SessionToken.address, func.max(SessionToken.id))
+        .where(SessionToken.kind == "nonce")
+        .group_by(SessionToken.address)
+        .having(func.count(SessionToken.id) > 1)
+    ).all()
+    removed = 0
+    for address, keep_id in duplicated:
+        while True:
+            ids = list(
+                db.session.execute(
+                    select(SessionToken.id)
+                    .where(
+                        SessionToken.kind == "nonce",
+                        SessionToken.address == address,
+                        SessionToken.id != keep_id,
+                    )
+                    .limit(batch_size)
+                ).scalars()
+            )
+            if not ids:
+                break
+            db.session.execute(delete(SessionToken).where(SessionToken.id.in_(ids)))
+            db.session.commit()
+            removed += len(ids)
+    if removed:
+        logger.info("Removed %s duplicated nonce rows from session_store", removed)
+
+
+def _ensure_session_store_indexes(inspector) -> None:
+    existing = {index["name"] for index in inspector.get_indexes("session_store")}
+    existing |= {constraint["name"] for constraint in inspector.get_unique_constraints("session_store")}
+    is_mysql = db.engine.dialect.name.startswith("mysql")
+
+    # No MySQL o DDL roda com ALGORITHM=INPLACE, LOCK=NONE para nao bloquear leituras/escritas.
+    online = ", ALGORITHM=INPLACE, LOCK=NONE" if is_mysql else ""
+    additions = {
+        "uq_session_store_kind_address": "CREATE UNIQUE INDEX uq_session_store_kind_address ON session_store (kind, address)",
+        "ix_session_store_kind_session_id": "CREATE INDEX ix_session_store_kind_session_id ON session_store (kind, session_id)",
+    }
+    if is_mysql:
+        additions = {
+            "uq_session_store_kind_address": f"ALTER TABLE session_store ADD UNIQUE INDEX uq_session_store_kind_address (kind, address){online}",
+            "ix_session_store_kind_session_id": f"ALTER TABLE session_store ADD INDEX ix_session_store_kind_session_id (kind, session_id){online}",
+        }
+    for name, statement in additions.items():
+        if name not in existing:
+            logger.info("Creating index %s on session_store", name)
+            db.session.execute(text(statement))
+            db.session.commit()
+
+    # Indices de coluna unica cobertos pelos compostos acima.
+    for name in ("ix_session_store_kind", "ix_session_store_address"):
+        if name in existing:
+            logger.info("Dropping redundant index %s on session_store", name)
+            statement = f"ALTER TABLE session_store DROP INDEX {name}{online}" if is_mysql else f"DROP INDEX {name}"
+            db.session.execute(text(statement))
+            db.session.commit()
+
+
+def _ensure_revoked_tokens(inspector) -> None:
+    if "revoked_tokens" not in inspector.get_table_names():
+        logger.info("Creating revoked_tokens table")
+        RevokedToken.__table__.create(bind=db.engine)
+    Index("ix_revoked_tokens_revoked_at", RevokedToken.revoked_at).create(bind=db.engine, checkfirst=True)
+
+
+def _ensure_vote_outbox(inspector) -> None:
+    if "vote_outbox" not in inspector.get_table_names():
+        logger.info("Creating vote_outbox table")
+        VoteOutbox.__table__.create(bind=db.engine)
+
+
+def _ensure_owner_nonce_tables(inspector) -> None:
+    tables = inspector.get_table_names()
+    for model in (OwnerNonce, OwnerTransaction, OwnerTransactionHash):
+        if model.__tablename__ not in tables:
+            logger.info("Creating %s table", model.__tablename__)
+            model.__table__.create(bind=db.engine)
+    if "owner_transactions" in tables and "replaced_hashes" in {
+        column["name"] for column in inspector.get_columns("owner_transactions")
+    }:
+        _backfill_replaced_hashes()
+
+
+def _backfill_replaced_hashes() -> None:
+    """Copia a antiga lista de hashes substituidos (texto) para owner_transaction_hashes."""
+    rows = db.session.execute(
+        text("SELECT id, replaced_hashes FROM owner_transactions WHERE replaced_hashes IS NOT NULL")
+    ).all()
+    known = set(db.session.execute(select(OwnerTransactionHash.tx_hash)).scalars())
+    added = 0
+    for row in rows:
+        for tx_hash in row.replaced_hashes.split():
+            if tx_hash not in known:
+                db.session.add(OwnerTransactionHash(tx_hash=tx_hash, owner_transaction_id=row.id))
+                known.add(tx_hash)
+                added += 1
+    db.session.commit()
+    if added:
+        logger.info("Backfilled %s replaced owner transaction hashes", added)
+
+
+def _ensure_submission_reference_columns(inspector) -> None:
+    """Colunas que ligam o envio do outbox ao registro em owner_transactions."""
+    is_mysql = db.engine.dialect.name.startswith("mysql")
+    definition = "VARCHAR(32) NULL" if is_mysql else "VARCHAR(32)"
+    for table in ("vote_outbox", "owner_transactions"):
+        column = "submission_ref" if table == "vote_outbox" else "reference"
+        if column not in {item["name"] for item in inspector.get_columns(table)}:
+            logger.info("Adding %s column to %s", column, table)
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            db.session.commit()
+    Index("ix_owner_transactions_reference", OwnerTransaction.reference).create(bind=db.engine, checkfirst=True)
+
+
+def _ensure_vote_batch_columns(inspector) -> None:
+    column_names = {column["name"] for column in inspector.get_columns("votos")}
+    is_mysql = db.engine.dialect.name.startswith("mysql")
+    columns = {
+        "batch_tx_hash": "VARCHAR(80) NULL" if is_mysql else "VARCHAR(80)",
+        "batch_position": "INT NULL" if is_mysql else "INTEGER",
+    }
+    for name, definition in columns.items():
+        if name not in column_names:
+            logger.info("Adding %s column to votos", name)
+            db.session.execute(text(f"ALTER TABLE votos ADD COLUMN {name} {definition}"))
+            db.session.commit()
+    Index("ix_votos_batch_tx_hash", Voto.batch_tx_hash).create(bind=db.engine, checkfirst=True)
+
+
+def _ensure_idempotency_keys(inspector) -> None:
+    if "idempotency_keys" not in inspector.get_table_names():
+        logger.info("Creating idempotency_keys table")
+        IdempotencyKey.__table__.create(bind=db.engine)
+
+
+def _ensure_transaction_receipts(inspector) -> None:
+    if "transaction_receipts" not in inspector.get_table_names():
+        logger.info("Creating transaction_receipts table")
+        TransactionReceipt.__table__.create(bind=db.engine)
+
+
+def _ensure_vote_counters(inspector) -> None:
+    """Cria e preenche os contadores; o create_all da app ja cria a tabela vazia."""
+    if "candidate_vote_counters" not in inspector.get_table_names():
+        logger.info("Creating candidate_vote_counters table")
+        CandidateVoteCounter.__table__.create(bind=db.engine)
+    has_counters = db.session.execute(select(CandidateVoteCounter.candidato_id).limit(1)).first() is not None
+    has_votes = db.session.execute(select(Voto.id).limit(1)).first() is not None
+    db.session.rollback()
+    if has_votes and not has_counters:
+        rebuilt = rebuild_vote_counters()
+        logger.info("Backfilled vote counters for %s candidates", rebuilt)
+
+
 def _ensure_audit_log_column(inspector) -> None:
     column_names = {column["name"] for column in inspector.get_columns("audit_logs")}
     if "eleicao_id" not in column_names:
@@ -62,6 +233,17 @@ def main() -> None:
     with app.app_context():
         inspector = inspect(db.engine)
         _ensure_session_store(inspector)
+        _dedupe_nonces()
+        _ensure_session_store_indexes(inspect(db.engine))
+        _ensure_revoked_tokens(inspector)
+        _ensure_vote_outbox(inspector)
+        _ensure_owner_nonce_tables(inspector)
+        _ensure_submission_reference_columns(inspect(db.engine))
+        _ensure_idempotency_keys(inspector)
+        _ensure_transaction_receipts(inspector)
+        if "votos" in inspector.get_table_names():
+            _ensure_vote_batch_columns(inspector)
+            _ensure_vote_counters(inspector)
         if "audit_logs" in inspector.get_table_names():
             _ensure_audit_log_column(inspector)
             _backfill_audit_logs()
@@ -8,6 +8,9 @@ from typing import Callable
 from eth_account.messages import encode_defunct
 from web3 import Web3
 
+from services.signature_pool import get_signature_pool
+
+
 @dataclass(frozen=True)
 class ServiceResponse:
     payload: dict
@@ -29,6 +32,14 @@ def generate_nonce_response(
     return ServiceResponse(payload={"nonce": nonce})
 
 
+def recover_signer(message: str, signature: str, web3: Web3) -> str:
+    pool = get_signature_pool()
+    if pool.enabled:
+        return pool.recover(message, signature)
+    encoded_message = encode_defunct(text=message)
+    return web3.eth.account.recover_message(encoded_message, signature=signature)
+
+
 def verify_signature_response(
     address: str,
     signature: str,
@@ -43,8 +54,7 @@ def verify_signature_response(
         )
 
     try:
-        encoded_message = encode_defunct(text=message)
-        recovered_address = web3.eth.account.recover_message(encoded_message, signature=signature)
+        recovered_address = recover_signer(message, signature, web3)
     except Exception as exc:
         return ServiceResponse(
             payload={"success": False, "error": str(exc)},
@@ -3,20 +3,44 @@ from __future__ import annotations
 import json
 import logging
 import os
-from dataclasses import dataclass
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Iterable, Optional
 
 from web3 import Web3
 from web3.contract import Contract
+from web3.exceptions import TransactionNotFound
 from web3.types import TxReceipt
 
 from config.BlockChain import get_web3
+from services.fee_oracle import FeeQuote, fee_oracle
+from services.nonce_manager import (
+    STATUS_RELEASED,
+    get_nonce_manager,
+    is_already_known,
+    is_ambiguous_send_error,
+    is_nonce_conflict,
+)
 
 _CONTRACT_ADDRESS_ENV = "CONTRACT_ADDRESS"
 _PRIVATE_KEY_ENV = "CONTRACT_OWNER_PRIVATE_KEY"
 _ABI_PATH_ENV = "CONTRACT_ABI_PATH"
+_CHECK_SECONDS_ENV = "BLOCKCHAIN_CONFIG_CHECK_SECONDS"
+_DEFAULT_CHECK_SECONDS = 30.0
 _DEFAULT_ARTIFACT = Path(__file__).resolve().parents[1] / "contracts" / "AthenaElection.json"
+# batchVote(uint256[]) existe no fonte, mas o artefato so ganha a funcao quando
+# o bytecode for recompilado; ate la o ABI fica aqui e o uso depende do codigo implantado.
+BATCH_VOTE_SELECTOR = "65422a55"
+_BATCH_VOTE_ABI = {
+    "inputs": [{"internalType": "uint256[]", "name": "candidateIds", "type": "uint256[]"}],
+    "name": "batchVote",
+    "outputs": [],
+    "stateMutability": "nonpayable",
+    "type": "function",
+}
 
 
 @dataclass(frozen=True)
@@ -26,12 +50,13 @@ class BlockchainConfig:
     abi: list[dict]
 
 
-def _load_artifact() -> dict:
+def _artifact_path() -> Path:
     artifact_path = os.getenv(_ABI_PATH_ENV)
-    if artifact_path:
-        path = Path(artifact_path)
-    else:
-        path = _DEFAULT_ARTIFACT
+    return Path(artifact_path) if artifact_path else _DEFAULT_ARTIFACT
+
+
+def _load_artifact() -> dict:
+    path = _artifact_path()
     try:
         return json.loads(path.read_text(encoding="utf-8"))
     except FileNotFoundError as exc:  # pragma: no cover - defensive guard.
@@ -60,51 +85,347 @@ def _load_config() -> Optional[BlockchainConfig]:
     return BlockchainConfig(address=checksum_address, private_key=private_key, abi=abi)
 
 
+def _config_fingerprint() -> tuple:
+    """Valores que, se mudarem, exigem recarregar o cliente (env e mtime do artefato)."""
+    address = os.getenv(_CONTRACT_ADDRESS_ENV)
+    private_key = os.getenv(_PRIVATE_KEY_ENV)
+    if not address or not private_key:
+        return (address, private_key)
+    path = _artifact_path()
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    return (address, private_key, str(path), mtime)
+
+
+@dataclass
+class _ClientState:
+    config: Optional[BlockchainConfig]
+    fingerprint: tuple
+    web3: Optional[Web3] = None
+    contract: Optional[Contract] = None
+    account: object = None
+    chain_id: Optional[tuple[Web3, int]] = None
+    batch_vote: Optional[bool] = None
+    batch_rpc: bool = True
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class BlockchainClient:
+    """Config, ABI, contrato, conta e chain id carregados uma vez por processo.
+
+    ``enabled`` e so a leitura de um atributo; a configuracao e relida quando
+    ``invalidate`` e chamado (SIGHUP, ver ``install_reload_signal``) ou, a cada
+    ``check_seconds``, se o env ou o mtime do artefato mudaram.
+    """
+
+    def __init__(self, check_seconds: float | None = None) -> None:
+        self.check_seconds = (
+            check_seconds if check_seconds is not None else float(os.getenv(_CHECK_SECONDS_ENV, _DEFAULT_CHECK_SECONDS))
+        )
+        self._lock = threading.Lock()
+        self._state: Optional[_ClientState] = None
+        self._stale = True
+        self._next_check = 0.0
+        self.reloads = 0
+
+    def invalidate(self) -> None:
+        """Marca o cliente para recarga; seguro dentro de um handler de sinal."""
+        self._stale = True
+
+    def _current(self) -> _ClientState:
+        state = self._state
+        if state is not None and not self._stale and (self.check_seconds <= 0 or time.monotonic() < self._next_check):
+            return state
+        with self._lock:
+            state = self._state
+            force = self._stale
+            self._stale = False
+            self._next_check = time.monotonic() + self.check_seconds
+            fingerprint = _config_fingerprint()
+            if state is None or force or fingerprint != state.fingerprint:
+                state = self._state = _ClientState(config=_load_config(), fingerprint=fingerprint)
+                self.reloads += 1
+                logging.info("Blockchain client loaded; enabled=%s", state.config is not None)
+            return state
+
+    @property
+    def enabled(self) -> bool:
+        return self._current().config is not None
+
+    @property
+    def config(self) -> Optional[BlockchainConfig]:
+        return self._current().config
+
+    def contract_and_account(self) -> tuple[Web3, Contract, object]:
+        state = self._current()
+        if state.config is None:
+            raise RuntimeError(
+                "Blockchain contract is not configured. Set CONTRACT_ADDRESS and CONTRACT_OWNER_PRIVATE_KEY."
+            )
+        if state.contract is None:
+            with state.lock:
+                if state.contract is None:
+                    web3 = get_web3()
+                    state.account = web3.eth.account.from_key(state.config.private_key)
+                    state.web3 = web3
+                    state.contract = web3.eth.contract(address=state.config.address, abi=state.config.abi)
+        return state.web3, state.contract, state.account
+
+    def known_chain_id(self, web3: Web3) -> Optional[int]:
+        cached = self._current().chain_id
+        return cached[1] if cached is not None and cached[0] is web3 else None
+
+    def remember_chain_id(self, web3: Web3, chain_id: int) -> None:
+        self._current().chain_id = (web3, chain_id)
+
+    def chain_id(self, web3: Web3) -> int:
+        """``eth_chainId`` uma vez por conexao."""
+        chain_id = self.known_chain_id(web3)
+        if chain_id is None:
+            chain_id = int(web3.eth.chain_id)
+            self.remember_chain_id(web3, chain_id)
+        return chain_id
+
+    @property
+    def batch_rpc(self) -> bool:
+        """False depois que o provedor recusou um lote JSON-RPC (ate a proxima recarga)."""
+        return self._current().batch_rpc
+
+    def disable_batch_rpc(self) -> None:
+        self._current().batch_rpc = False
+
+    def supports_batch_vote(self) -> bool:
+        state = self._current()
+        if state.config is None:
+            return False
+        if state.batch_vote is None:
+            code = get_web3().eth.get_code(state.config.address)
+            state.batch_vote = bytes.fromhex(BATCH_VOTE_SELECTOR) in bytes(code)
+        return state.batch_vote
+
+
+blockchain_client = BlockchainClient()
+
+
+def install_reload_signal(signum: int | None = None) -> bool:
+    """Recarrega o cliente blockchain ao receber ``signum`` (SIGHUP por padrao).
+
+    So funciona na thread principal; retorna False onde nao da para instalar.
+    """
+    if signum is None:
+        signum = getattr(signal, "SIGHUP", None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, lambda *_: blockchain_client.invalidate())
+    return True
+
+
 def is_blockchain_enabled() -> bool:
-    return _load_config() is not None
+    return blockchain_client.enabled
 
 
 def _get_contract_and_account() -> tuple[Web3, Contract, str]:
-    config = _load_config()
-    if config is None:
-        raise RuntimeError("Blockchain contract is not configured. Set CONTRACT_ADDRESS and CONTRACT_OWNER_PRIVATE_KEY.")
-
-    web3 = get_web3()
-    contract = web3.eth.contract(address=config.address, abi=config.abi)
-    account = web3.eth.account.from_key(config.private_key)
-    return web3, contract, account
+    return blockchain_client.contract_and_account()
 
 
 def _send_transaction(transaction_builder) -> TxReceipt:
+    web3, tx_hash = _submit_transaction(transaction_builder)
+    receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+    logging.info("Blockchain transaction mined: %s", tx_hash)
+    return receipt
+
+
+class AmbiguousSubmissionError(RuntimeError):
+    """Falha de transporte no envio: a transacao pode ter chegado ao no.
+
+    ``tx_hash`` ja esta registrado em ``owner_transactions``; quem chamou deve
+    acompanhar o recibo em vez de reenviar.
+    """
+
+    def __init__(self, tx_hash: str, cause: Exception) -> None:
+        super().__init__(f"Transaction {tx_hash} may have been broadcast: {cause}")
+        self.tx_hash = tx_hash
+
+
+def _raw_transaction(signed_tx) -> bytes:
+    # web3>=7 renomeia rawTransaction -> raw_transaction
+    if hasattr(signed_tx, "raw_transaction"):
+        return signed_tx.raw_transaction
+    return signed_tx.rawTransaction
+
+
+def _hex(value) -> str:
+    text = value.hex() if hasattr(value, "hex") else str(value)
+    return text if text.startswith("0x") else f"0x{text}"
+
+
+@dataclass(frozen=True)
+class TransactionInputs:
+    gas: int
+    fees: FeeQuote
+    chain_id: int
+
+
+def _call_params(function, sender: str) -> dict:
+    """to/data/value da chamada, montados localmente (todos os campos informados, sem RPC)."""
+    tx = function.build_transaction(
+        {"from": sender, "gas": 0, "maxFeePerGas": 0, "maxPriorityFeePerGas": 0, "chainId": 0, "nonce": 0}
+    )
+    return {"from": sender, "to": tx["to"], "data": tx["data"], "value": hex(int(tx.get("value") or 0))}
+
+
+def _batched_inputs(web3: Web3, function, sender: str) -> Optional[TransactionInputs]:
+    """Leituras de preparo em um unico lote JSON-RPC; None para seguir uma a uma.
+
+    Taxas e chain id em cache nao entram no lote; com os dois em cache sobra so
+    a estimativa de gas.
+    """
+    make_batch_request = getattr(getattr(web3, "provider", None), "make_batch_request", None)
+    if make_batch_request is None or not blockchain_client.batch_rpc:
+        return None
+    fees = fee_oracle.cached()
+    chain_id = blockchain_client.known_chain_id(web3)
+    calls = [("eth_estimateGas", [_call_params(function, sender)])]
+    if fees is None:
+        calls.append(("eth_feeHistory", fee_oracle.history_params()))
+    if chain_id is None:
+        calls.append(("eth_chainId", []))
+    try:
+        responses = make_batch_request(calls)
+    except NotImplementedError:
+        responses = None
+    except Exception as exc:
+        logging.warning("Batched transaction preparation failed; falling back to single calls: %s", exc)
+        return None
+    if not isinstance(responses, list) or len(responses) != len(calls):
+        logging.warning("RPC provider rejected a JSON-RPC batch; preparing transactions with single calls")
+        blockchain_client.disable_batch_rpc()
+        return None
+    if any("error" in response for response in responses):
+        # Revert na estimativa, no sem feeHistory...: o caminho unitario trata cada caso.
+        return None
+    results = {method: response["result"] for (method, _), response in zip(calls, responses)}
+    if fees is None:
+        fees = fee_oracle.update(results["eth_feeHistory"])
+    if chain_id is None:
+        chain_id = int(results["eth_chainId"], 16)
+        blockchain_client.remember_chain_id(web3, chain_id)
+    return TransactionInputs(gas=int(results["eth_estimateGas"], 16), fees=fees, chain_id=chain_id)
+
+
+def prepare_transaction_inputs(web3: Web3, function, sender: str) -> TransactionInputs:
+    """Gas estimado, taxas e chain id, em uma ida ao no quando o provedor aceita lotes."""
+    inputs = _batched_inputs(web3, function, sender)
+    if inputs is not None:
+        return inputs
+    return TransactionInputs(
+        gas=function.estimate_gas({"from": sender}),
+        fees=fee_oracle.quote(web3),
+        chain_id=blockchain_client.chain_id(web3),
+    )
+
+
+def _submit_transaction(transaction_builder, reference: Optional[str] = None):
+    """Assina e envia a transacao sem aguardar a mineracao.
+
+    O hash assinado e registrado antes do envio. Erros de transporte viram
+    ``AmbiguousSubmissionError`` (nada e reenviado); rejeicoes do no devolvem
+    o nonce para o proximo envio, e conflitos de nonce tentam de novo.
+    ``reference`` fica no registro para o chamador reconciliar depois.
+    """
     web3, contract, account = _get_contract_and_account()
 
     function = transaction_builder(contract)
-    nonce = web3.eth.get_transaction_count(account.address)
 
     try:
-        estimated_gas = function.estimate_gas({"from": account.address})
+        inputs = prepare_transaction_inputs(web3, function, account.address)
     except Exception as exc:  # pragma: no cover - propagated to caller
         logging.error("Failed to estimate gas for contract transaction: %s", exc)
         raise
 
-    max_priority = web3.to_wei("1", "gwei")
-    base_fee = web3.eth.gas_price
-    tx = function.build_transaction(
-        {
-            "from": account.address,
-            "nonce": nonce,
-            "gas": int(estimated_gas * 1.2),
-            "maxFeePerGas": base_fee + max_priority,
-            "maxPriorityFeePerGas": max_priority,
-            "chainId": web3.eth.chain_id,
-        }
-    )
-
-    signed_tx = account.sign_transaction(tx)
-    tx_hash = web3.eth.send_raw_transaction(signed_tx.rawTransaction)
-    receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
-    logging.info("Blockchain transaction mined: %s", tx_hash.hex())
-    return receipt
+    manager = get_nonce_manager()
+    attempts = manager.max_retries
+    for attempt in range(1, attempts + 1):
+        # Nonce reservado localmente: envios concorrentes nao colidem no mesmo valor.
+        nonce = manager.allocate(web3, account.address)
+        tx = function.build_transaction(
+            {
+                "from": account.address,
+                "nonce": nonce,
+                "gas": int(inputs.gas * 1.2),
+                "maxFeePerGas": inputs.fees.max_fee_per_gas,
+                "maxPriorityFeePerGas": inputs.fees.max_priority_fee_per_gas,
+                "chainId": inputs.chain_id,
+            }
+        )
+        signed_tx = account.sign_transaction(tx)
+        tx_hash = _hex(signed_tx.hash)
+        if not manager.record(account.address, nonce, tx_hash, dict(tx), reference=reference):
+            manager.resync(web3, account.address)
+            continue
+        try:
+            web3.eth.send_raw_transaction(_raw_transaction(signed_tx))
+        except Exception as exc:
+            if is_already_known(exc):
+                return web3, tx_hash
+            if is_ambiguous_send_error(exc):
+                logging.error("Transport error while sending %s (nonce %s): %s", tx_hash, nonce, exc)
+                raise AmbiguousSubmissionError(tx_hash, exc) from exc
+            if is_nonce_conflict(exc):
+                # A rede ja usou o nonce em outra transacao: avanca e tenta outro.
+                manager.discard(account.address, nonce)
+                manager.resync(web3, account.address)
+                if attempt < attempts:
+                    logging.warning("Nonce %s rejected (%s); retrying with a fresh nonce", nonce, exc)
+                    continue
+                raise
+            # Rejeicao definitiva (saldo, revert...): o nonce volta para o proximo envio.
+            manager.release(account.address, nonce)
+            raise
+        return web3, tx_hash
+    raise RuntimeError("Unable to submit transaction")
+
+
+def replace_stuck_transactions(stuck_after_seconds: float) -> list[str]:
+    """Reenvia com taxas maiores as transacoes do dono pendentes ha mais de ``stuck_after_seconds``.
+
+    Nonces devolvidos que ninguem reaproveitou bloqueiam os seguintes; sao
+    preenchidos com uma transferencia de valor zero para a propria conta.
+    """
+    if not is_blockchain_enabled():
+        return []
+    web3, _, account = _get_contract_and_account()
+    manager = get_nonce_manager()
+    confirmed_nonce = int(web3.eth.get_transaction_count(account.address, "latest"))
+    manager.mark_mined_below(account.address, confirmed_nonce)
+
+    replaced: list[str] = []
+    gas_price = web3.eth.gas_price
+    for record in manager.stuck_transactions(account.address, stuck_after_seconds):
+        if record["status"] == STATUS_RELEASED:
+            tx = manager.gap_filler_transaction(record, account.address, gas_price, blockchain_client.chain_id(web3))
+        else:
+            tx = manager.bumped_transaction(record, gas_price)
+        signed_tx = account.sign_transaction(tx)
+        tx_hash = _hex(signed_tx.hash)
+        try:
+            web3.eth.send_raw_transaction(_raw_transaction(signed_tx))
+        except Exception as exc:
+            if "nonce too low" in str(exc).lower():
+                # A original foi minerada entre a consulta e o reenvio.
+                manager.mark_mined_below(account.address, int(record["nonce"]) + 1)
+                continue
+            if not (is_already_known(exc) or is_ambiguous_send_error(exc)):
+                logging.error("Failed to replace stuck transaction %s: %s", record["tx_hash"], exc)
+                continue
+        manager.mark_replaced(record, tx_hash, tx)
+        logging.warning(
+            "Replaced stuck transaction nonce=%s %s -> %s", record["nonce"], record["tx_hash"], tx_hash
+        )
+        replaced.append(tx_hash)
+    return replaced
 
 
 def configure_election_onchain(name: str, candidates: Optional[Iterable[str]] = None) -> Optional[TxReceipt]:
@@ -148,6 +469,54 @@ def record_vote_onchain(candidate_index: int) -> Optional[TxReceipt]:
     return _send_transaction(builder)
 
 
+def submit_vote_onchain(candidate_index: int, reference: Optional[str] = None) -> Optional[str]:
+    """Envia o voto ao contrato e retorna o hash da transacao, sem esperar o recibo."""
+    if not is_blockchain_enabled():
+        return None
+
+    def builder(contract: Contract):
+        return contract.functions.vote(int(candidate_index))
+
+    _, tx_hash = _submit_transaction(builder, reference=reference)
+    return tx_hash
+
+
+def supports_batch_vote() -> bool:
+    """O contrato implantado tem ``batchVote``? Consulta o codigo uma vez por carga da config."""
+    return blockchain_client.supports_batch_vote()
+
+
+def submit_batch_vote_onchain(candidate_indices: list[int], reference: Optional[str] = None) -> Optional[str]:
+    """Envia varios votos em uma unica chamada ``batchVote``; retorna o hash da transacao."""
+    if not is_blockchain_enabled():
+        return None
+    if not supports_batch_vote():
+        raise RuntimeError("Deployed contract has no batchVote; redeploy it from a recompiled artifact.")
+
+    def builder(contract: Contract):
+        if not any(item.get("name") == "batchVote" for item in contract.abi):
+            contract = contract.w3.eth.contract(address=contract.address, abi=[*contract.abi, _BATCH_VOTE_ABI])
+        return contract.functions.batchVote([int(index) for index in candidate_indices])
+
+    _, tx_hash = _submit_transaction(builder, reference=reference)
+    return tx_hash
+
+
+def fetch_transaction_receipt(tx_hash: str) -> Optional[TxReceipt]:
+    """Retorna o recibo se a transacao ja foi minerada; None enquanto pendente.
+
+    Segue substituicoes por taxa: o recibo pode ser o da transacao que
+    substituiu ``tx_hash`` com o mesmo nonce.
+    """
+    web3 = get_web3()
+    for candidate in dict.fromkeys((get_nonce_manager().current_hash(tx_hash), tx_hash)):
+        try:
+            return web3.eth.get_transaction_receipt(candidate)
+        except TransactionNotFound:
+            continue
+    return None
+
+
 def add_candidate_onchain(name: str) -> Optional[TxReceipt]:
     if not is_blockchain_enabled():
         return None
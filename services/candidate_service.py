@@ -1,14 +1,17 @@
 from __future__ import annotations
 
 import logging
+import threading
+from datetime import datetime
 
 from flask import abort
-from sqlalchemy import func, select
 from werkzeug.exceptions import HTTPException
 
 from dtos.candidate_dto import CreateCandidateDTO, UpdateCandidateDTO
-from models import Candidato, Eleicao, Voto, db
+from models import Candidato, Eleicao, db
 from services.blockchain_integration import add_candidate_onchain, is_blockchain_enabled
+from services.results_cache import results_cache
+from services.vote_counters import candidate_vote_total
 
 
 def _attach_receipt(payload: dict, receipt_hash: str | None) -> dict:
@@ -31,9 +34,40 @@ def _sync_blockchain(action: str, callback, *args) -> str | None:
     return receipt.transactionHash.hex()
 
 
-def _candidate_vote_total(candidate_id: int) -> int:
-    stmt = select(func.count(Voto.id)).where(Voto.candidato_id == candidate_id)
-    return int(db.session.execute(stmt).scalar_one() or 0)
+class CandidateIndexCache:
+    """Mapa candidato -> blockchain_index por eleicao, mantido em memoria no worker.
+
+    Cada entrada e marcada com o ``data_inicio`` da eleicao: candidatos so mudam
+    com a eleicao inativa e ``start_election`` grava um novo ``data_inicio``,
+    entao um mapa de outro periodo de votacao (inclusive de outro worker) nunca
+    e reutilizado.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[int, tuple[datetime | None, dict[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, election_id: int, epoch: datetime | None) -> dict[int, int] | None:
+        with self._lock:
+            entry = self._entries.get(election_id)
+        if entry is None or entry[0] != epoch:
+            return None
+        return entry[1]
+
+    def put(self, election_id: int, epoch: datetime | None, mapping: dict[int, int]) -> None:
+        with self._lock:
+            self._entries[election_id] = (epoch, dict(mapping))
+
+    def invalidate(self, election_id: int) -> None:
+        with self._lock:
+            self._entries.pop(election_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+candidate_index_cache = CandidateIndexCache()
 
 
 def ensure_candidate_indices(election_id: int) -> dict[int, int]:
@@ -64,6 +98,20 @@ def ensure_candidate_indices(election_id: int) -> dict[int, int]:
     return mapping
 
 
+def get_candidate_index(election: Eleicao, candidate_id: int) -> int | None:
+    """Resolve o indice on-chain do candidato em O(1) a partir do mapa em cache."""
+    return resolve_candidate_index(election.id, election.data_inicio, candidate_id)
+
+
+def resolve_candidate_index(election_id: int, epoch: datetime | None, candidate_id: int) -> int | None:
+    """Como ``get_candidate_index``, a partir do id e do ``data_inicio`` ja lidos."""
+    mapping = candidate_index_cache.get(election_id, epoch)
+    if mapping is None:
+        mapping = ensure_candidate_indices(election_id)
+        candidate_index_cache.put(election_id, epoch, mapping)
+    return mapping.get(candidate_id)
+
+
 def validate_candidate_indices(election_id: int) -> bool:
     """Verifica se os índices persistidos estão coerentes sem alterar os dados."""
     candidates = (
@@ -82,7 +130,7 @@ def serialize_candidate(candidate: Candidato) -> dict:
         "id": candidate.id,
         "nome": candidate.nome,
         "eleicao_id": candidate.eleicao_id,
-        "votos_count": _candidate_vote_total(candidate.id),
+        "votos_count": candidate_vote_total(candidate.id),
         "blockchain_index": candidate.blockchain_index,
     }
 
@@ -112,6 +160,9 @@ def create_candidate(election_id: int, dto: CreateCandidateDTO) -> dict:
     except Exception:
         db.session.rollback()
         raise
+    finally:
+        candidate_index_cache.invalidate(election_id)
+        results_cache.invalidate(election_id)
 
     return _attach_receipt(serialize_candidate(candidate), receipt_hash)
 
@@ -153,6 +204,9 @@ def update_candidate(candidate_id: int, dto: UpdateCandidateDTO) -> dict:
     except Exception:
         db.session.rollback()
         raise
+    finally:
+        candidate_index_cache.invalidate(candidate.eleicao_id)
+        results_cache.invalidate(candidate.eleicao_id)
     return serialize_candidate(candidate)
 
 
@@ -168,12 +222,18 @@ def delete_candidate(candidate_id: int) -> None:
     if election and election.ativa:
         abort(400, description="Cannot delete candidates from an active election")
 
+    election_id = candidate.eleicao_id
     try:
         db.session.delete(candidate)
+        db.session.flush()
+        ensure_candidate_indices(election_id)
         db.session.commit()
     except Exception:
         db.session.rollback()
         raise
+    finally:
+        candidate_index_cache.invalidate(election_id)
+        results_cache.invalidate(election_id)
 
 
 __all__ = [
@@ -184,5 +244,9 @@ __all__ = [
     "update_candidate",
     "delete_candidate",
     "ensure_candidate_indices",
+    "get_candidate_index",
+    "resolve_candidate_index",
     "validate_candidate_indices",
+    "candidate_index_cache",
+    "CandidateIndexCache",
 ]
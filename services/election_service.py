@@ -15,6 +15,7 @@ from services.blockchain_integration import (
     is_blockchain_enabled,
     open_election_onchain,
 )
+from services.results_cache import results_cache
 
 
 def _utcnow() -> datetime:
@@ -133,6 +134,7 @@ def update_election(election_id: int, dto: UpdateElectionDTO) -> dict:
     except Exception:
         db.session.rollback()
         raise
+    results_cache.invalidate(election_id)
     return serialize_election(election)
 
 
@@ -151,6 +153,7 @@ def delete_election(election_id: int) -> None:
     except Exception:
         db.session.rollback()
         raise
+    results_cache.invalidate(election_id)
 
 
 def start_election(election_id: int) -> dict:
@@ -178,6 +181,7 @@ def start_election(election_id: int) -> dict:
     except Exception:
         db.session.rollback()
         raise
+    results_cache.invalidate(election_id)
 
     return _attach_receipt(serialize_election(election), receipt_hash)
 
@@ -207,5 +211,6 @@ def end_election(election_id: int) -> dict:
     except Exception:
         db.session.rollback()
         raise
+    results_cache.invalidate(election_id)
 
     return _attach_receipt(serialize_election(election), receipt_hash)
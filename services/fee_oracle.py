@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import logging
+import os
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+_PERCENTILE_ENV = "FEE_PRIORITY_PERCENTILE"
+_BLOCKS_ENV = "FEE_HISTORY_BLOCKS"
+_BASE_MULTIPLIER_ENV = "FEE_BASE_FEE_MULTIPLIER"
+_MIN_PRIORITY_ENV = "FEE_MIN_PRIORITY_GWEI"
+_TTL_ENV = "FEE_ORACLE_TTL_SECONDS"
+_DEFAULT_PERCENTILE = 50.0
+_DEFAULT_BLOCKS = 10
+_DEFAULT_BASE_MULTIPLIER = 2.0
+_DEFAULT_MIN_PRIORITY_GWEI = 0.1
+_DEFAULT_TTL_SECONDS = 12.0
+_GWEI = 10**9
+
+logger = logging.getLogger(__name__)
+
+
+def _int(value) -> int:
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+@dataclass(frozen=True)
+class FeeQuote:
+    max_fee_per_gas: int
+    max_priority_fee_per_gas: int
+    base_fee_per_gas: Optional[int] = None
+    block: Optional[int] = None
+
+
+class FeeOracle:
+    """Taxas EIP-1559 a partir do ``eth_feeHistory``, uma vez por bloco.
+
+    A gorjeta e a mediana, nos ultimos ``blocks`` blocos com transacoes, do
+    percentil ``percentile`` das gorjetas pagas (nunca abaixo de
+    ``min_priority_gwei``). ``maxFeePerGas`` e o base fee do proximo bloco
+    vezes ``base_fee_multiplier`` mais a gorjeta, o que cobre altas seguidas
+    do base fee sem pagar a mais: o no cobra so base fee + gorjeta. A cotacao
+    vale por ``ttl_seconds`` (o intervalo entre blocos), entao as transacoes
+    do mesmo intervalo dividem uma unica consulta. Sem ``eth_feeHistory``
+    (rede pre-London), usa gas price + 1 gwei.
+    """
+
+    def __init__(
+        self,
+        percentile: float | None = None,
+        blocks: int | None = None,
+        base_fee_multiplier: float | None = None,
+        min_priority_gwei: float | None = None,
+        ttl_seconds: float | None = None,
+    ) -> None:
+        self.percentile = percentile if percentile is not None else float(os.getenv(_PERCENTILE_ENV, _DEFAULT_PERCENTILE))
+        self.blocks = max(blocks if blocks is not None else int(os.getenv(_BLOCKS_ENV, _DEFAULT_BLOCKS)), 1)
+        self.base_fee_multiplier = (
+            base_fee_multiplier
+            if base_fee_multiplier is not None
+            else float(os.getenv(_BASE_MULTIPLIER_ENV, _DEFAULT_BASE_MULTIPLIER))
+        )
+        self.min_priority = int(
+            (min_priority_gwei if min_priority_gwei is not None else float(os.getenv(_MIN_PRIORITY_ENV, _DEFAULT_MIN_PRIORITY_GWEI)))
+            * _GWEI
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv(_TTL_ENV, _DEFAULT_TTL_SECONDS))
+        self._lock = threading.Lock()
+        self._quote: Optional[FeeQuote] = None
+        self._expires_at = 0.0
+        self.refreshes = 0
+
+    def history_params(self) -> list:
+        """Parametros do ``eth_feeHistory``, para quem manda a consulta em lote."""
+        return [hex(self.blocks), "latest", [self.percentile]]
+
+    def cached(self) -> Optional[FeeQuote]:
+        with self._lock:
+            if self._quote is not None and time.monotonic() < self._expires_at:
+                return self._quote
+        return None
+
+    def quote(self, web3) -> FeeQuote:
+        quote = self.cached()
+        if quote is not None:
+            return quote
+        try:
+            history = web3.eth.fee_history(self.blocks, "latest", [self.percentile])
+        except Exception as exc:
+            logger.warning("eth_feeHistory unavailable; pricing from gas price: %s", exc)
+            quote = self._legacy(web3)
+            with self._lock:
+                self._quote = quote
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return quote
+        return self.update(history)
+
+    def update(self, history) -> FeeQuote:
+        """Calcula e guarda a cotacao a partir de uma resposta do ``eth_feeHistory``."""
+        base_fees = [_int(value) for value in history["baseFeePerGas"]]
+        rewards = history.get("reward") or []
+        ratios = history.get("gasUsedRatio") or [1.0] * len(rewards)
+        tips = [_int(reward[0]) for reward, ratio in zip(rewards, ratios) if reward and float(ratio) > 0]
+        priority = max(int(statistics.median(tips)) if tips else 0, self.min_priority)
+        # O ultimo item e o base fee do proximo bloco.
+        next_base_fee = base_fees[-1]
+        newest_block = _int(history["oldestBlock"]) + len(base_fees) - 2
+        quote = FeeQuote(
+            max_fee_per_gas=int(next_base_fee * self.base_fee_multiplier) + priority,
+            max_priority_fee_per_gas=priority,
+            base_fee_per_gas=next_base_fee,
+            block=newest_block,
+        )
+        with self._lock:
+            if self._quote is None or self._quote.block is None or newest_block >= self._quote.block:
+                self._quote = quote
+                self._expires_at = time.monotonic() + self.ttl_seconds
+                self.refreshes += 1
+            return self._quote
+
+    @staticmethod
+    def _legacy(web3) -> FeeQuote:
+        priority = web3.to_wei("1", "gwei")
+        return FeeQuote(max_fee_per_gas=web3.eth.gas_price + priority, max_priority_fee_per_gas=priority)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._quote = None
+            self._expires_at = 0.0
+
+
+fee_oracle = FeeOracle()
+
+
+__all__ = ["FeeOracle", "FeeQuote", "fee_oracle"]
@@ -36,6 +36,7 @@ def build_health_response(
     require_blockchain: bool = False,
     require_database: bool = True,
     sleep: Callable[[float], None] | None = None,
+    provider_stats: Callable[[Web3], list[dict] | None] | None = None,
 ) -> HealthResponse:
     logs: list[HealthLogEntry] = []
 
@@ -190,4 +191,12 @@ def build_health_response(
         },
     }
 
+    if web3 is not None and provider_stats is not None:
+        try:
+            providers = provider_stats(web3)
+        except Exception:  # pragma: no cover - defensive guard
+            providers = None
+        if providers is not None:
+            payload["blockchain"]["providers"] = providers
+
     return HealthResponse(payload=payload, status_code=status_code, logs=tuple(logs))
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import IdempotencyKey, db
+
+_TTL_ENV = "IDEMPOTENCY_TTL_SECONDS"
+_LOCK_ENV = "IDEMPOTENCY_LOCK_SECONDS"
+_WAIT_ENV = "IDEMPOTENCY_WAIT_SECONDS"
+_DEFAULT_TTL_SECONDS = 86400.0
+_DEFAULT_LOCK_SECONDS = 60.0
+_DEFAULT_WAIT_SECONDS = 10.0
+_POLL_SECONDS = 0.05
+
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+
+CLAIMED = "claimed"
+REPLAY = "replay"
+MISMATCH = "mismatch"
+BUSY = "busy"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _normalize_dt(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _sha256(*parts: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(hashlib.sha256(part).digest())
+    return digest.hexdigest()
+
+
+def idempotency_key_hash(scope: str, key: str) -> str:
+    return _sha256(scope.encode("utf-8"), key.encode("utf-8"))
+
+
+def request_fingerprint(body: bytes) -> str:
+    return _sha256(body)
+
+
+@dataclass(frozen=True)
+class ClaimResult:
+    outcome: str
+    status: Optional[int] = None
+    body: Optional[str] = None
+
+
+class IdempotencyStore:
+    """Respostas por ``Idempotency-Key`` em idempotency_keys, com TTL.
+
+    ``claim`` insere a chave como ``processing``; a unicidade de ``key_hash``
+    serializa requisicoes concorrentes com a mesma chave, que esperam a
+    primeira terminar e recebem a resposta guardada. Uma chave presa por um
+    worker que caiu e retomada depois de ``lock_seconds``. Usa conexoes
+    proprias, fora da transacao da requisicao.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float | None = None,
+        lock_seconds: float | None = None,
+        wait_seconds: float | None = None,
+    ) -> None:
+        self.ttl = timedelta(
+            seconds=ttl_seconds if ttl_seconds is not None else float(os.getenv(_TTL_ENV, _DEFAULT_TTL_SECONDS))
+        )
+        self.lock = timedelta(
+            seconds=lock_seconds if lock_seconds is not None else float(os.getenv(_LOCK_ENV, _DEFAULT_LOCK_SECONDS))
+        )
+        self.wait_seconds = wait_seconds if wait_seconds is not None else float(os.getenv(_WAIT_ENV, _DEFAULT_WAIT_SECONDS))
+
+    def claim(self, key_hash: str, request_hash: str) -> ClaimResult:
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            now = _utcnow()
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(
+                        insert(IdempotencyKey).values(
+                            key_hash=key_hash,
+                            request_hash=request_hash,
+                            status=STATUS_PROCESSING,
+                            locked_until=now + self.lock,
+                            created_at=now,
+                            expires_at=now + self.ttl,
+                        )
+                    )
+                return ClaimResult(CLAIMED)
+            except IntegrityError:
+                pass
+
+            with db.engine.begin() as conn:
+                row = conn.execute(select(IdempotencyKey).where(IdempotencyKey.key_hash == key_hash)).mappings().first()
+                if row is None:
+                    continue
+                if _normalize_dt(row["expires_at"]) <= now:
+                    conn.execute(delete(IdempotencyKey).where(IdempotencyKey.id == row["id"]))
+                    continue
+                if row["request_hash"] != request_hash:
+                    return ClaimResult(MISMATCH)
+                if row["status"] == STATUS_DONE:
+                    return ClaimResult(REPLAY, row["response_status"], row["response_body"])
+                if _normalize_dt(row["locked_until"]) <= now:
+                    # Dono anterior caiu no meio da requisicao: assume a chave.
+                    taken = conn.execute(
+                        update(IdempotencyKey)
+                        .where(IdempotencyKey.id == row["id"], IdempotencyKey.locked_until == row["locked_until"])
+                        .values(locked_until=now + self.lock)
+                    )
+                    if taken.rowcount:
+                        return ClaimResult(CLAIMED)
+            if time.monotonic() >= deadline:
+                return ClaimResult(BUSY)
+            time.sleep(_POLL_SECONDS)
+
+    def complete(self, key_hash: str, status: int, body: str) -> None:
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key_hash == key_hash)
+                .values(status=STATUS_DONE, response_status=status, response_body=body)
+            )
+
+    def release(self, key_hash: str) -> None:
+        """Descarta a chave de uma requisicao que falhou, para o cliente poder repetir."""
+        with db.engine.begin() as conn:
+            conn.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.key_hash == key_hash,
+                    IdempotencyKey.status == STATUS_PROCESSING,
+                )
+            )
+
+    def purge_expired(self, batch_size: int = 500) -> int:
+        removed = 0
+        while True:
+            with db.engine.begin() as conn:
+                ids = list(
+                    conn.execute(
+                        select(IdempotencyKey.id)
+                        .where(IdempotencyKey.expires_at < _utcnow())
+                        .order_by(IdempotencyKey.id.asc())
+                        .limit(batch_size)
+                    ).scalars()
+                )
+                if ids:
+                    conn.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)))
+            removed += len(ids)
+            if len(ids) < batch_size:
+                return removed
+
+
+__all__ = [
+    "BUSY",
+    "CLAIMED",
+    "ClaimResult",
+    "IdempotencyStore",
+    "MISMATCH",
+    "REPLAY",
+    "idempotency_key_hash",
+    "request_fingerprint",
+]
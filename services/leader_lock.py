@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import fcntl
+import os
+import tempfile
+from typing import IO, Optional
+
+
+def default_lock_path(env_name: str, filename: str) -> str:
+    return os.getenv(env_name) or os.path.join(tempfile.gettempdir(), filename)
+
+
+class FileLeaderLock:
+    """Lideranca entre os workers do host via ``flock`` nao bloqueante.
+
+    O lock cai com o processo, entao outro worker assume no ciclo seguinte
+    sem precisar de expiracao.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._handle: Optional[IO[str]] = None
+
+    @property
+    def held(self) -> bool:
+        return self._handle is not None
+
+    def try_acquire(self) -> bool:
+        if self._handle is not None:
+            return True
+        handle = open(self.path, "a+", encoding="utf-8")
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._handle = handle
+        return True
+
+    def release(self) -> None:
+        if self._handle is None:
+            return
+        try:
+            fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._handle.close()
+            self._handle = None
+
+
+__all__ = ["FileLeaderLock", "default_lock_path"]
@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+import requests
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from web3.exceptions import ProviderConnectionError
+
+from models import OwnerNonce, OwnerTransaction, OwnerTransactionHash, db
+
+_MAX_RETRIES_ENV = "OWNER_NONCE_MAX_RETRIES"
+_FEE_BUMP_PERCENT_ENV = "OWNER_TX_FEE_BUMP_PERCENT"
+_DEFAULT_MAX_RETRIES = 5
+# Os nos exigem pelo menos 10% de aumento para aceitar a substituicao.
+_DEFAULT_FEE_BUMP_PERCENT = 15.0
+_MIN_FEE_BUMP_PERCENT = 10.0
+_NONCE_CONFLICT_MARKERS = (
+    "nonce too low",
+    "replacement transaction underpriced",
+)
+_ALREADY_KNOWN_MARKER = "already known"
+# Erros de transporte: o no pode ter aceitado a transacao antes da falha.
+_AMBIGUOUS_SEND_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ProviderConnectionError,
+    ConnectionError,
+    TimeoutError,
+)
+
+STATUS_PENDING = "pending"
+STATUS_MINED = "mined"
+# Nonce reservado cujo envio foi rejeitado pelo no; volta para o proximo envio.
+STATUS_RELEASED = "released"
+STATUS_RESERVED = "reserved"
+
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def is_nonce_conflict(exc: Exception) -> bool:
+    message = str(exc).lower()
+    return any(marker in message for marker in _NONCE_CONFLICT_MARKERS)
+
+
+def is_already_known(exc: Exception) -> bool:
+    """A mesma transacao assinada ja esta no mempool do no."""
+    return _ALREADY_KNOWN_MARKER in str(exc).lower()
+
+
+def is_ambiguous_send_error(exc: Exception) -> bool:
+    return isinstance(exc, _AMBIGUOUS_SEND_ERRORS)
+
+
+def bump_fee(value: int, percent: float) -> int:
+    return max(int(math.ceil(value * (1 + percent / 100))), value + 1)
+
+
+class NonceManager:
+    """Distribui nonces sequenciais da conta dona do contrato sem consultar o no a cada envio.
+
+    O proximo nonce fica em ``owner_nonces`` e e reservado com UPDATE
+    condicional (compare-and-swap), entao workers diferentes nunca recebem o
+    mesmo valor. A rede so e consultada na primeira reserva e em ``resync``,
+    chamado quando o no rejeita o nonce, e o contador nunca volta atras:
+    nonces rejeitados sao devolvidos com ``release`` e reaproveitados pela
+    proxima reserva. As operacoes usam uma conexao propria para nao confirmar
+    a transacao ORM em andamento (ex.: o voto).
+    """
+
+    def __init__(self, max_retries: int | None = None, fee_bump_percent: float | None = None) -> None:
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv(_MAX_RETRIES_ENV, _DEFAULT_MAX_RETRIES))
+        percent = (
+            fee_bump_percent
+            if fee_bump_percent is not None
+            else float(os.getenv(_FEE_BUMP_PERCENT_ENV, _DEFAULT_FEE_BUMP_PERCENT))
+        )
+        self.fee_bump_percent = max(percent, _MIN_FEE_BUMP_PERCENT)
+        self._lock = threading.Lock()
+
+    def allocate(self, web3, address: str) -> int:
+        with self._lock:
+            for _ in range(self.max_retries):
+                try:
+                    nonce = self._try_allocate(web3, address)
+                except IntegrityError:
+                    # Outro worker inicializou a linha ao mesmo tempo; tenta de novo.
+                    continue
+                if nonce is not None:
+                    return nonce
+        raise RuntimeError(f"Could not allocate a nonce for {address}")
+
+    def _try_allocate(self, web3, address: str) -> Optional[int]:
+        with db.engine.begin() as conn:
+            released = conn.execute(
+                select(OwnerTransaction.id, OwnerTransaction.nonce)
+                .where(OwnerTransaction.address == address, OwnerTransaction.status == STATUS_RELEASED)
+                .order_by(OwnerTransaction.nonce.asc())
+                .limit(1)
+            ).first()
+            if released is not None:
+                # Preenche primeiro a lacuna deixada por um envio rejeitado.
+                result = conn.execute(
+                    update(OwnerTransaction)
+                    .where(OwnerTransaction.id == released.id, OwnerTransaction.status == STATUS_RELEASED)
+                    .values(status=STATUS_RESERVED)
+                )
+                return int(released.nonce) if result.rowcount == 1 else None
+            current = conn.execute(
+                select(OwnerNonce.next_nonce).where(OwnerNonce.address == address)
+            ).scalar_one_or_none()
+            if current is None:
+                chain_nonce = int(web3.eth.get_transaction_count(address, "pending"))
+                conn.execute(
+                    insert(OwnerNonce).values(address=address, next_nonce=chain_nonce + 1, updated_at=_utcnow())
+                )
+                return chain_nonce
+            result = conn.execute(
+                update(OwnerNonce)
+                .where(OwnerNonce.address == address, OwnerNonce.next_nonce == current)
+                .values(next_nonce=current + 1, updated_at=_utcnow())
+            )
+            return int(current) if result.rowcount == 1 else None
+
+    def resync(self, web3, address: str) -> int:
+        """Avanca o contador ate o nonce pendente da rede; nunca volta atras.
+
+        Nonces reservados por outros workers e ainda nao transmitidos ficam
+        abaixo do contador e nao podem ser distribuidos de novo.
+        """
+        chain_nonce = int(web3.eth.get_transaction_count(address, "pending"))
+        with self._lock, db.engine.begin() as conn:
+            current = conn.execute(
+                select(OwnerNonce.next_nonce).where(OwnerNonce.address == address)
+            ).scalar_one_or_none()
+            if current is None:
+                conn.execute(insert(OwnerNonce).values(address=address, next_nonce=chain_nonce, updated_at=_utcnow()))
+                current = chain_nonce
+            elif current < chain_nonce:
+                conn.execute(
+                    update(OwnerNonce)
+                    .where(OwnerNonce.address == address, OwnerNonce.next_nonce < chain_nonce)
+                    .values(next_nonce=chain_nonce, updated_at=_utcnow())
+                )
+                current = chain_nonce
+            # Lacunas abaixo do nonce da rede ja foram ocupadas por outra transacao.
+            conn.execute(
+                delete(OwnerTransaction).where(
+                    OwnerTransaction.address == address,
+                    OwnerTransaction.status == STATUS_RELEASED,
+                    OwnerTransaction.nonce < chain_nonce,
+                )
+            )
+        logger.warning("Resynced owner nonce for %s to %s", address, current)
+        return int(current)
+
+    def release(self, address: str, nonce: int) -> None:
+        """Devolve um nonce cujo envio o no rejeitou, para o proximo envio reutilizar."""
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(OwnerTransaction)
+                .where(OwnerTransaction.address == address, OwnerTransaction.nonce == nonce)
+                .values(status=STATUS_RELEASED)
+            )
+
+    def discard(self, address: str, nonce: int) -> None:
+        """Esquece o registro de um nonce que a rede ja usou em outra transacao."""
+        with db.engine.begin() as conn:
+            conn.execute(
+                delete(OwnerTransaction).where(
+                    OwnerTransaction.address == address,
+                    OwnerTransaction.nonce == nonce,
+                    OwnerTransaction.status.in_([STATUS_PENDING, STATUS_RESERVED]),
+                )
+            )
+
+    def record(
+        self,
+        address: str,
+        nonce: int,
+        tx_hash: str,
+        tx: dict[str, Any],
+        reference: Optional[str] = None,
+    ) -> bool:
+        """Registra a transacao assinada antes do envio, para acompanha-la e substitui-la se travar.
+
+        Retorna False se o nonce ja pertence a outra transacao registrada; esse
+        registro nunca e sobrescrito.
+        """
+        values = {
+            "tx_hash": tx_hash,
+            "reference": reference,
+            "payload": json.dumps(tx, default=str),
+            "max_fee_per_gas": int(tx.get("maxFeePerGas", 0)),
+            "max_priority_fee_per_gas": int(tx.get("maxPriorityFeePerGas", 0)),
+            "status": STATUS_PENDING,
+            "sent_at": _utcnow(),
+        }
+        try:
+            with db.engine.begin() as conn:
+                # So assume a linha de um nonce devolvido e reservado por este envio.
+                result = conn.execute(
+                    update(OwnerTransaction)
+                    .where(
+                        OwnerTransaction.address == address,
+                        OwnerTransaction.nonce == nonce,
+                        OwnerTransaction.status == STATUS_RESERVED,
+                    )
+                    .values(replacements=0, **values)
+                )
+                if result.rowcount == 0:
+                    conn.execute(insert(OwnerTransaction).values(address=address, nonce=nonce, replacements=0, **values))
+                else:
+                    conn.execute(
+                        delete(OwnerTransactionHash).where(
+                            OwnerTransactionHash.owner_transaction_id
+                            == select(OwnerTransaction.id)
+                            .where(OwnerTransaction.address == address, OwnerTransaction.nonce == nonce)
+                            .scalar_subquery()
+                        )
+                    )
+        except IntegrityError:
+            logger.warning("Nonce %s for %s already belongs to another transaction", nonce, address)
+            return False
+        return True
+
+    def mark_mined_below(self, address: str, confirmed_nonce: int) -> int:
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                update(OwnerTransaction)
+                .where(
+                    OwnerTransaction.address == address,
+                    OwnerTransaction.status.in_([STATUS_PENDING, STATUS_RELEASED]),
+                    OwnerTransaction.nonce < confirmed_nonce,
+                )
+                .values(status=STATUS_MINED)
+            )
+        return int(result.rowcount or 0)
+
+    def stuck_transactions(self, address: str, older_than_seconds: float) -> list[dict[str, Any]]:
+        """Pendentes antigas e nonces devolvidos que bloqueiam uma pendente acima deles."""
+        cutoff = _utcnow() - timedelta(seconds=older_than_seconds)
+        with db.engine.connect() as conn:
+            highest_pending = conn.execute(
+                select(func.max(OwnerTransaction.nonce)).where(
+                    OwnerTransaction.address == address,
+                    OwnerTransaction.status == STATUS_PENDING,
+                )
+            ).scalar_one_or_none()
+            rows = conn.execute(
+                select(OwnerTransaction)
+                .where(
+                    OwnerTransaction.address == address,
+                    OwnerTransaction.sent_at < cutoff,
+                    or_(
+                        OwnerTransaction.status == STATUS_PENDING,
+                        (OwnerTransaction.status == STATUS_RELEASED)
+                        & (OwnerTransaction.nonce < (highest_pending if highest_pending is not None else -1)),
+                    ),
+                )
+                .order_by(OwnerTransaction.nonce.asc())
+            ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def gap_filler_transaction(
+        self,
+        record: dict[str, Any],
+        address: str,
+        current_gas_price: int,
+        chain_id: int,
+    ) -> dict[str, Any]:
+        """Transferencia de valor zero para a propria conta que ocupa um nonce devolvido."""
+        priority = bump_fee(int(record["max_priority_fee_per_gas"]), self.fee_bump_percent)
+        return {
+            "from": address,
+            "to": address,
+            "value": 0,
+            "data": "0x",
+            "gas": 21000,
+            "nonce": int(record["nonce"]),
+            "maxFeePerGas": max(bump_fee(int(record["max_fee_per_gas"]), self.fee_bump_percent), int(current_gas_price) + priority),
+            "maxPriorityFeePerGas": priority,
+            "chainId": int(chain_id),
+        }
+
+    def bumped_transaction(self, record: dict[str, Any], current_gas_price: int) -> dict[str, Any]:
+        """Mesma transacao e nonce com taxas elevadas para substituir a travada."""
+        tx = json.loads(record["payload"])
+        priority = bump_fee(int(record["max_priority_fee_per_gas"]), self.fee_bump_percent)
+        max_fee = max(bump_fee(int(record["max_fee_per_gas"]), self.fee_bump_percent), int(current_gas_price) + priority)
+        tx.update(
+            {
+                "nonce": int(record["nonce"]),
+                "maxFeePerGas": max_fee,
+                "maxPriorityFeePerGas": priority,
+            }
+        )
+        return tx
+
+    def mark_replaced(self, record: dict[str, Any], new_hash: str, tx: dict[str, Any]) -> None:
+        with db.engine.begin() as conn:
+            conn.execute(insert(OwnerTransactionHash).values(tx_hash=record["tx_hash"], owner_transaction_id=record["id"]))
+            conn.execute(
+                update(OwnerTransaction)
+                .where(OwnerTransaction.id == record["id"])
+                .values(
+                    tx_hash=new_hash,
+                    payload=json.dumps(tx, default=str),
+                    max_fee_per_gas=int(tx["maxFeePerGas"]),
+                    max_priority_fee_per_gas=int(tx["maxPriorityFeePerGas"]),
+                    replacements=OwnerTransaction.replacements + 1,
+                    status=STATUS_PENDING,
+                    sent_at=_utcnow(),
+                )
+            )
+
+    def find_by_reference(self, reference: str) -> Optional[str]:
+        """Hash vigente da transacao registrada com ``reference``, se ela pode ter ido a rede."""
+        with db.engine.connect() as conn:
+            return conn.execute(
+                select(OwnerTransaction.tx_hash).where(
+                    OwnerTransaction.reference == reference,
+                    OwnerTransaction.status.in_([STATUS_PENDING, STATUS_MINED]),
+                )
+            ).scalar_one_or_none()
+
+    def current_hash(self, tx_hash: str) -> str:
+        """Hash vigente para ``tx_hash``, seguindo substituicoes por taxa."""
+        with db.engine.connect() as conn:
+            current = conn.execute(
+                select(OwnerTransaction.tx_hash)
+                .join(OwnerTransactionHash, OwnerTransactionHash.owner_transaction_id == OwnerTransaction.id)
+                .where(OwnerTransactionHash.tx_hash == tx_hash)
+            ).scalar_one_or_none()
+        return current or tx_hash
+
+
+_manager: Optional[NonceManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_nonce_manager() -> NonceManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = NonceManager()
+    return _manager
+
+
+__all__ = [
+    "NonceManager",
+    "STATUS_MINED",
+    "STATUS_PENDING",
+    "STATUS_RELEASED",
+    "bump_fee",
+    "get_nonce_manager",
+    "is_already_known",
+    "is_ambiguous_send_error",
+    "is_nonce_conflict",
+]
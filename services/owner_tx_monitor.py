@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Optional
+
+from flask import Flask
+
+from services.blockchain_integration import is_blockchain_enabled, replace_stuck_transactions
+from services.leader_lock import FileLeaderLock, default_lock_path
+
+_INTERVAL_ENV = "OWNER_TX_MONITOR_INTERVAL_SECONDS"
+_STUCK_ENV = "OWNER_TX_STUCK_SECONDS"
+_LOCK_PATH_ENV = "OWNER_TX_MONITOR_LOCK_PATH"
+_DEFAULT_INTERVAL_SECONDS = 30.0
+_DEFAULT_STUCK_SECONDS = 180.0
+_EXTENSION_KEY = "owner_tx_monitor"
+
+
+logger = logging.getLogger(__name__)
+_START_LOCK = threading.Lock()
+
+
+class OwnerTransactionMonitor:
+    """Substitui periodicamente as transacoes do dono travadas no mempool.
+
+    Assim como o SessionReaper, apenas o worker que detem o lock de arquivo
+    reenvia transacoes, evitando substituicoes duplicadas do mesmo nonce.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        interval_seconds: float | None = None,
+        stuck_after_seconds: float | None = None,
+        lock_path: str | None = None,
+    ) -> None:
+        self.app = app
+        self.interval_seconds = (
+            interval_seconds
+            if interval_seconds is not None
+            else float(os.getenv(_INTERVAL_ENV, _DEFAULT_INTERVAL_SECONDS))
+        )
+        self.stuck_after_seconds = (
+            stuck_after_seconds
+            if stuck_after_seconds is not None
+            else float(os.getenv(_STUCK_ENV, _DEFAULT_STUCK_SECONDS))
+        )
+        self.lock_path = lock_path or default_lock_path(_LOCK_PATH_ENV, "athenas_owner_tx_monitor.lock")
+        self._leader_lock = FileLeaderLock(self.lock_path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def try_acquire_leadership(self) -> bool:
+        return self._leader_lock.try_acquire()
+
+    def release_leadership(self) -> None:
+        self._leader_lock.release()
+
+    def run_once(self) -> list[str]:
+        if not self.try_acquire_leadership():
+            return []
+        with self.app.app_context():
+            try:
+                return replace_stuck_transactions(self.stuck_after_seconds)
+            except Exception as exc:  # pragma: no cover - keep the monitor alive on RPC/DB errors
+                logger.error("Owner transaction monitor failed: %s", exc)
+                return []
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="owner-tx-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds)
+            self._thread = None
+        self.release_leadership()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.run_once()
+
+
+def ensure_owner_tx_monitor(app: Flask) -> Optional[OwnerTransactionMonitor]:
+    """Inicia o monitor uma unica vez por processo quando a blockchain esta configurada."""
+    if app.config.get("TESTING") or not is_blockchain_enabled():
+        return None
+    monitor = app.extensions.get(_EXTENSION_KEY)
+    if monitor is not None:
+        return monitor
+    with _START_LOCK:
+        monitor = app.extensions.get(_EXTENSION_KEY)
+        if monitor is None:
+            monitor = OwnerTransactionMonitor(app)
+            app.extensions[_EXTENSION_KEY] = monitor
+            monitor.start()
+    return monitor
+
+
+__all__ = ["OwnerTransactionMonitor", "ensure_owner_tx_monitor"]
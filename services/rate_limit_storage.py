@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from limits.storage import Storage
+
+_ENTRY = struct.Struct("<16sdq")
+_ENTRIES_PER_BUCKET = 8
+_BUCKET_SIZE = _ENTRY.size * _ENTRIES_PER_BUCKET
+_DEFAULT_BUCKETS = 4096
+_EMPTY_DIGEST = b"\x00" * 16
+# Contagem devolvida quando o bucket nao tem vaga: qualquer limite a excede.
+_OVERFLOW_COUNT = 2**31
+
+logger = logging.getLogger(__name__)
+
+
+class MmapStorage(Storage):
+    """Storage do Flask-Limiter em um arquivo mapeado em memoria compartilhado pelos workers.
+
+    URI: ``mmap:///caminho/arquivo.bin?buckets=4096``. Cada chave cai em um
+    bucket de 8 entradas (digest, expiracao, contador); o bucket e protegido
+    por um lock de faixa de bytes (``lockf``) entre processos e por um lock de
+    thread dentro do processo, entao as contagens sao exatas entre os workers
+    do mesmo host. Entradas vazias ou expiradas sao reaproveitadas; uma
+    entrada viva nunca e despejada, pois zerar o contador de outra chave
+    liberaria seu limite. Com as 8 vagas vivas, a chave nova e recusada (conta
+    como acima do limite) e ``overflows`` aumenta: dimensione ``buckets`` para
+    bem mais que (chaves ativas por janela) / 8; o padrao comporta ~32 mil.
+    """
+
+    STORAGE_SCHEME = ["mmap"]
+
+    def __init__(self, uri: str | None = None, wrap_exceptions: bool = False, **options) -> None:
+        parsed = urlparse(uri or "mmap:///tmp/athenas-ratelimit.bin")
+        query = parse_qs(parsed.query)
+        self.path = parsed.path or "/tmp/athenas-ratelimit.bin"
+        self.buckets = int(query.get("buckets", [options.get("buckets", _DEFAULT_BUCKETS)])[0])
+        self._size = self.buckets * _BUCKET_SIZE
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < self._size:
+            os.ftruncate(self._fd, self._size)
+        self._map = mmap.mmap(self._fd, self._size)
+        self._thread_locks = [threading.Lock() for _ in range(min(self.buckets, 256))]
+        self.overflows = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self) -> type[Exception] | tuple[type[Exception], ...]:
+        return (OSError, ValueError)
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        return digest if digest != _EMPTY_DIGEST else b"\x01" + digest[1:]
+
+    def _locate(self, digest: bytes) -> int:
+        return int.from_bytes(digest[:8], "little") % self.buckets
+
+    def _locked(self, bucket: int):
+        return _BucketLock(self._fd, self._thread_locks[bucket % len(self._thread_locks)], bucket * _BUCKET_SIZE)
+
+    def _read(self, offset: int) -> tuple[bytes, float, int]:
+        return _ENTRY.unpack_from(self._map, offset)
+
+    def _find(self, bucket: int, digest: bytes, now: float) -> tuple[int | None, int | None]:
+        """Retorna (offset da chave, offset vazio ou expirado) dentro do bucket."""
+        base = bucket * _BUCKET_SIZE
+        match = None
+        free = None
+        for index in range(_ENTRIES_PER_BUCKET):
+            offset = base + index * _ENTRY.size
+            entry_digest, expiry, _ = self._read(offset)
+            if entry_digest == digest:
+                match = offset
+                break
+            if free is None and (entry_digest == _EMPTY_DIGEST or expiry <= now):
+                free = offset
+        return match, free
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        digest = self._digest(key)
+        bucket = self._locate(digest)
+        with self._locked(bucket):
+            now = time.time()
+            offset, free = self._find(bucket, digest, now)
+            if offset is not None:
+                _, entry_expiry, count = self._read(offset)
+                if entry_expiry > now:
+                    count += amount
+                    _ENTRY.pack_into(self._map, offset, digest, entry_expiry, count)
+                    return count
+            elif free is not None:
+                offset = free
+            else:
+                self.overflows += 1
+                logger.warning("Rate limit bucket %s is full; rejecting new key (raise buckets in the URI)", bucket)
+                return _OVERFLOW_COUNT
+            _ENTRY.pack_into(self._map, offset, digest, now + expiry, amount)
+            return amount
+
+    def get(self, key: str) -> int:
+        digest = self._digest(key)
+        bucket = self._locate(digest)
+        with self._locked(bucket):
+            now = time.time()
+            offset, _ = self._find(bucket, digest, now)
+            if offset is None:
+                return 0
+            _, entry_expiry, count = self._read(offset)
+            return count if entry_expiry > now else 0
+
+    def get_expiry(self, key: str) -> float:
+        digest = self._digest(key)
+        bucket = self._locate(digest)
+        with self._locked(bucket):
+            now = time.time()
+            offset, _ = self._find(bucket, digest, now)
+            if offset is None:
+                return now
+            _, entry_expiry, _ = self._read(offset)
+            return entry_expiry if entry_expiry > now else now
+
+    def clear(self, key: str) -> None:
+        digest = self._digest(key)
+        bucket = self._locate(digest)
+        with self._locked(bucket):
+            offset, _ = self._find(bucket, digest, time.time())
+            if offset is not None:
+                _ENTRY.pack_into(self._map, offset, _EMPTY_DIGEST, 0.0, 0)
+
+    def reset(self) -> int | None:
+        cleared = 0
+        for bucket in range(self.buckets):
+            with self._locked(bucket):
+                base = bucket * _BUCKET_SIZE
+                for index in range(_ENTRIES_PER_BUCKET):
+                    offset = base + index * _ENTRY.size
+                    if self._read(offset)[0] != _EMPTY_DIGEST:
+                        cleared += 1
+                self._map[base:base + _BUCKET_SIZE] = b"\x00" * _BUCKET_SIZE
+        return cleared
+
+    def check(self) -> bool:
+        return not self._map.closed
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+class _BucketLock:
+    def __init__(self, fd: int, thread_lock: threading.Lock, offset: int) -> None:
+        self._fd = fd
+        self._thread_lock = thread_lock
+        self._offset = offset
+
+    def __enter__(self) -> None:
+        self._thread_lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _BUCKET_SIZE, self._offset)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _BUCKET_SIZE, self._offset)
+        finally:
+            self._thread_lock.release()
+
+
+__all__ = ["MmapStorage"]
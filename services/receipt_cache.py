@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from config.BlockChain import get_web3
+from models import TransactionReceipt, VoteOutbox, Voto, db
+from services.blockchain_integration import fetch_transaction_receipt, is_blockchain_enabled
+
+_SIZE_ENV = "RECEIPT_CACHE_SIZE"
+_NEGATIVE_TTL_ENV = "RECEIPT_NEGATIVE_TTL_SECONDS"
+_CONFIRMATIONS_ENV = "RECEIPT_FINALITY_CONFIRMATIONS"
+_DEFAULT_SIZE = 4096
+_DEFAULT_NEGATIVE_TTL_SECONDS = 5.0
+_DEFAULT_CONFIRMATIONS = 12
+
+logger = logging.getLogger(__name__)
+
+
+def _hex(value) -> str:
+    text = value if isinstance(value, str) else value.hex()
+    return text if text.startswith("0x") else f"0x{text}"
+
+
+def _result(row: TransactionReceipt) -> dict:
+    return {
+        "verified": True,
+        "status": "success" if row.status == 1 else "failed",
+        "blockNumber": row.block_number,
+        "gasUsed": row.gas_used,
+        "transactionHash": row.transaction_hash,
+    }
+
+
+def _not_found(message: str = "Transacao nao encontrada ou pendente.") -> dict:
+    return {"verified": False, "status": "not_found", "message": message}
+
+
+class ReceiptCache:
+    """Verificacao de transacoes com recibos em dois niveis: LRU do processo e tabela.
+
+    Um hash de voto e traduzido pela tabela ``votos`` para a transacao que o
+    levou ao contrato; voto ainda nao enviado responde sem consultar o no.
+    Recibos com ``confirmations`` blocos sao gravados em transaction_receipts
+    e nunca mais consultados; pendentes, nao encontrados e recibos recentes
+    ficam no LRU so por ``negative_ttl_seconds``.
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        negative_ttl_seconds: float | None = None,
+        confirmations: int | None = None,
+        fetch_receipt: Callable[[str], object] = fetch_transaction_receipt,
+        latest_block: Callable[[], int] | None = None,
+    ) -> None:
+        self.max_entries = max(max_entries if max_entries is not None else int(os.getenv(_SIZE_ENV, _DEFAULT_SIZE)), 1)
+        self.negative_ttl = (
+            negative_ttl_seconds
+            if negative_ttl_seconds is not None
+            else float(os.getenv(_NEGATIVE_TTL_ENV, _DEFAULT_NEGATIVE_TTL_SECONDS))
+        )
+        self.confirmations = (
+            confirmations if confirmations is not None else int(os.getenv(_CONFIRMATIONS_ENV, _DEFAULT_CONFIRMATIONS))
+        )
+        self._fetch_receipt = fetch_receipt
+        self._latest_block = latest_block or (lambda: get_web3().eth.block_number)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[dict, Optional[float]]] = OrderedDict()
+        self.provider_calls = 0
+
+    def verify(self, tx_hash: str) -> dict:
+        if not is_blockchain_enabled():
+            return {"verified": False, "status": "error", "message": "Blockchain nao esta configurada."}
+        key = tx_hash.strip().lower()
+        cached = self._get(key)
+        if cached is not None:
+            return dict(cached)
+
+        chain_hash, known_pending = self._resolve_local(key)
+        if known_pending:
+            result = _not_found("Voto registrado; transacao ainda nao enviada ao contrato.")
+            self._put(key, result, final=False)
+            return dict(result)
+
+        row = db.session.get(TransactionReceipt, chain_hash)
+        if row is not None:
+            result = _result(row)
+            self._put(key, result, final=True)
+            return dict(result)
+
+        try:
+            result, final = self._from_provider(chain_hash)
+        except Exception as exc:  # pragma: no cover - defensive fallback
+            logger.error("Erro ao verificar hash '%s' na blockchain: %s", tx_hash, exc)
+            return {"verified": False, "status": "error", "message": f"Erro ao processar o hash: {exc}"}
+        self._put(key, result, final=final)
+        return dict(result)
+
+    def _resolve_local(self, key: str) -> tuple[str, bool]:
+        """Transacao on-chain de um hash de voto e se o voto ainda espera envio."""
+        row = db.session.execute(
+            select(Voto.batch_tx_hash, VoteOutbox.id.label("outbox_id"), VoteOutbox.tx_hash)
+            .select_from(Voto)
+            .outerjoin(VoteOutbox, VoteOutbox.voto_id == Voto.id)
+            .where(Voto.hash_blockchain == key)
+        ).first()
+        if row is None:
+            return key, False
+        chain_hash = row.batch_tx_hash or row.tx_hash
+        if chain_hash:
+            return chain_hash.lower(), False
+        # Voto no outbox sem transacao: ainda na fila (ou em revisao manual).
+        return key, row.outbox_id is not None
+
+    def _from_provider(self, chain_hash: str) -> tuple[dict, bool]:
+        self.provider_calls += 1
+        receipt = self._fetch_receipt(chain_hash)
+        if receipt is None:
+            return _not_found(), False
+        row = TransactionReceipt(
+            tx_hash=chain_hash,
+            transaction_hash=_hex(receipt.get("transactionHash") or chain_hash).lower(),
+            status=int(receipt.get("status") or 0),
+            block_number=int(receipt.get("blockNumber")),
+            gas_used=int(receipt.get("gasUsed") or 0),
+        )
+        result = _result(row)
+        if self._latest_block() - row.block_number + 1 < self.confirmations:
+            # Minerada ha poucos blocos: ainda pode sair da cadeia numa reorganizacao.
+            return result, False
+        self._persist(row)
+        return result, True
+
+    @staticmethod
+    def _persist(row: TransactionReceipt) -> None:
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(
+                    insert(TransactionReceipt).values(
+                        tx_hash=row.tx_hash,
+                        transaction_hash=row.transaction_hash,
+                        status=row.status,
+                        block_number=row.block_number,
+                        gas_used=row.gas_used,
+                    )
+                )
+        except IntegrityError:
+            pass  # outro worker gravou o mesmo recibo
+
+    def _get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def _put(self, key: str, result: dict, final: bool) -> None:
+        if not final and self.negative_ttl <= 0:
+            return
+        expires_at = None if final else time.monotonic() + self.negative_ttl
+        with self._lock:
+            self._entries[key] = (result, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+receipt_cache = ReceiptCache()
+
+
+def verify_transaction(tx_hash: str) -> dict:
+    return receipt_cache.verify(tx_hash)
+
+
+__all__ = ["ReceiptCache", "receipt_cache", "verify_transaction"]
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from flask import current_app
+
+_MAX_STALENESS_ENV = "RESULTS_CACHE_MAX_STALENESS_SECONDS"
+_MAX_ENTRIES_ENV = "RESULTS_CACHE_MAX_ENTRIES"
+_DEFAULT_MAX_STALENESS_SECONDS = 2.0
+_DEFAULT_MAX_ENTRIES = 256
+
+
+@dataclass
+class CachedResults:
+    payload: dict[str, Any]
+    body: bytes
+    etag: str
+    built_at: float
+    updated_at: float
+    read_at: float
+
+
+def _render(payload: dict[str, Any]) -> tuple[bytes, str]:
+    body = current_app.json.dumps(payload).encode("utf-8")
+    return body, hashlib.sha1(body).hexdigest()[:20]
+
+
+class ElectionResultsCache:
+    """Resultados serializados por eleicao, com ETag, atualizados a cada voto confirmado.
+
+    Votos gravados por este worker entram no cache incrementalmente. Votos de
+    outros workers aparecem na reconstrucao, feita quando a entrada passa de
+    ``max_staleness_seconds``; mudancas de candidatos ou da eleicao descartam
+    a entrada.
+
+    O incremento so e aplicado quando a leitura da entrada terminou antes do
+    commit do voto comecar, ou seja, quando ela com certeza nao contou o voto.
+    Ids de voto nao servem de versao: no MySQL eles ficam visiveis na ordem do
+    commit, nao na da insercao.
+    """
+
+    def __init__(
+        self,
+        max_staleness_seconds: float | None = None,
+        max_entries: int | None = None,
+        clock=time.monotonic,
+    ) -> None:
+        self.max_staleness_seconds = (
+            max_staleness_seconds
+            if max_staleness_seconds is not None
+            else float(os.getenv(_MAX_STALENESS_ENV, _DEFAULT_MAX_STALENESS_SECONDS))
+        )
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv(_MAX_ENTRIES_ENV, _DEFAULT_MAX_ENTRIES))
+        self._clock = clock
+        self._entries: OrderedDict[int, CachedResults] = OrderedDict()
+        self._last_vote_at: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.incremental_updates = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_staleness_seconds > 0 and self.max_entries > 0
+
+    def now(self) -> float:
+        return self._clock()
+
+    def get_or_build(
+        self,
+        election_id: int,
+        builder: Callable[[], dict[str, Any]],
+    ) -> tuple[CachedResults, bool]:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(election_id)
+            if entry is not None and now - entry.built_at < self.max_staleness_seconds:
+                self._entries.move_to_end(election_id)
+                self.hits += 1
+                return entry, True
+            self.misses += 1
+
+        payload = builder()
+        read_at = self._clock()
+        body, etag = _render(payload)
+        entry = CachedResults(payload=payload, body=body, etag=etag, built_at=now, updated_at=now, read_at=read_at)
+        if self.enabled:
+            with self._lock:
+                if self._last_vote_at.get(election_id, float("-inf")) >= now:
+                    # Voto confirmado durante a leitura: pode ou nao estar nela, nao guarda.
+                    return entry, False
+                self._entries[election_id] = entry
+                self._entries.move_to_end(election_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry, False
+
+    def record_vote(self, election_id: int, candidate_id: int, commit_started_at: float) -> None:
+        """Soma um voto confirmado na entrada, se ela foi lida antes do commit comecar."""
+        with self._lock:
+            self._last_vote_at[election_id] = self._clock()
+            entry = self._entries.get(election_id)
+            if entry is None:
+                return
+            if entry.read_at >= commit_started_at:
+                # A leitura pode ou nao ter visto o voto; reconstruir e o unico caminho exato.
+                del self._entries[election_id]
+                return
+            payload = copy.deepcopy(entry.payload)
+            results = payload.get("results", [])
+            row = next((item for item in results if item["id"] == candidate_id), None)
+            if row is None:
+                del self._entries[election_id]
+                return
+            row["votos"] += 1
+            payload["total_votos"] = payload.get("total_votos", 0) + 1
+            results.sort(key=lambda item: (-item["votos"], item["id"]))
+            body, etag = _render(payload)
+            self._entries[election_id] = CachedResults(
+                payload=payload,
+                body=body,
+                etag=etag,
+                built_at=entry.built_at,
+                updated_at=self._clock(),
+                read_at=entry.read_at,
+            )
+            self.incremental_updates += 1
+
+    def invalidate(self, election_id: int) -> None:
+        with self._lock:
+            self._entries.pop(election_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._last_vote_at.clear()
+            self.hits = 0
+            self.misses = 0
+            self.incremental_updates = 0
+
+    def staleness(self, election_id: int) -> Optional[float]:
+        with self._lock:
+            entry = self._entries.get(election_id)
+        return self._clock() - entry.built_at if entry is not None else None
+
+    def stats(self) -> dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            total = self.hits + self.misses
+            oldest = max((now - entry.built_at for entry in self._entries.values()), default=0.0)
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "incremental_updates": self.incremental_updates,
+                "size": len(self._entries),
+                "max_staleness_seconds": self.max_staleness_seconds,
+                "oldest_entry_age_seconds": round(oldest, 3),
+            }
+
+
+results_cache = ElectionResultsCache()
+
+
+__all__ = ["CachedResults", "ElectionResultsCache", "results_cache"]
@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from flask import Flask
+from sqlalchemy import func, select
+
+from models import CandidateVoteCounter, db
+
+logger = logging.getLogger(__name__)
+
+_POLL_ENV = "RESULTS_STREAM_POLL_SECONDS"
+_HEARTBEAT_ENV = "RESULTS_STREAM_HEARTBEAT_SECONDS"
+_MAX_SECONDS_ENV = "RESULTS_STREAM_MAX_SECONDS"
+_MAX_CONNECTIONS_ENV = "RESULTS_STREAM_MAX_CONNECTIONS"
+_BUFFER_ENV = "RESULTS_STREAM_BUFFER_SIZE"
+_DEFAULT_POLL_SECONDS = 1.0
+_DEFAULT_HEARTBEAT_SECONDS = 15.0
+_DEFAULT_MAX_SECONDS = 300.0
+_DEFAULT_MAX_CONNECTIONS = 1000
+_DEFAULT_BUFFER_SIZE = 256
+_MIN_POLL_INTERVAL_SECONDS = 0.1
+_EXTENSION_KEY = "results_stream_worker"
+_START_LOCK = threading.Lock()
+
+HEARTBEAT = ": heartbeat\n\n"
+RETRY = "retry: 3000\n\n"
+
+
+def format_event(event: str, event_id: int, data: dict | bytes) -> str:
+    """Evento SSE em uma linha de dados; ``bytes`` ja vem serializado em JSON."""
+    payload = data.decode("utf-8") if isinstance(data, bytes) else json.dumps(data, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+@dataclass
+class _ElectionFeed:
+    """Totais conhecidos de uma eleicao e os ultimos deltas, prontos para envio."""
+
+    totals: dict[int, int]
+    total: int
+    events: deque = field(default_factory=deque)
+    subscribers: int = 0
+    generation: int = 0
+    condition: Optional[threading.Condition] = None
+
+
+class ResultsBroadcaster:
+    """Distribui deltas de votos a todas as conexoes SSE do processo.
+
+    Um unico poll agrupado nos contadores gera o delta de cada eleicao
+    observada; as conexoes so esperam na condicao da eleicao e repassam o
+    texto ja formatado. O id de cada evento e o total de votos da eleicao,
+    entao ``Last-Event-ID`` vale em qualquer worker.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int | None = None,
+        max_connections: int | None = None,
+    ) -> None:
+        self.buffer_size = buffer_size if buffer_size is not None else int(os.getenv(_BUFFER_ENV, _DEFAULT_BUFFER_SIZE))
+        self.max_connections = (
+            max_connections
+            if max_connections is not None
+            else int(os.getenv(_MAX_CONNECTIONS_ENV, _DEFAULT_MAX_CONNECTIONS))
+        )
+        self._lock = threading.Lock()
+        self._feeds: dict[int, _ElectionFeed] = {}
+        self._wake = threading.Event()
+        self.connections = 0
+
+    def subscribe(self, election_id: int) -> bool:
+        """Registra uma conexao; carrega os totais da eleicao se ainda nao observada.
+
+        Retorna False quando o limite de conexoes do processo foi atingido.
+        """
+        with self._lock:
+            if self.connections >= self.max_connections:
+                return False
+            self.connections += 1
+            feed = self._feeds.get(election_id)
+            if feed is not None:
+                feed.subscribers += 1
+                return True
+        totals = _load_totals([election_id]).get(election_id, {})
+        with self._lock:
+            feed = self._feeds.get(election_id)
+            if feed is None:
+                feed = _ElectionFeed(
+                    totals=totals,
+                    total=sum(totals.values()),
+                    events=deque(maxlen=max(self.buffer_size, 1)),
+                    condition=threading.Condition(self._lock),
+                )
+                self._feeds[election_id] = feed
+            feed.subscribers += 1
+        return True
+
+    def unsubscribe(self, election_id: int) -> None:
+        with self._lock:
+            self.connections = max(self.connections - 1, 0)
+            feed = self._feeds.get(election_id)
+            if feed is None:
+                return
+            feed.subscribers -= 1
+            if feed.subscribers <= 0:
+                del self._feeds[election_id]
+
+    def notify(self) -> None:
+        """Antecipa o proximo poll (voto gravado neste worker)."""
+        self._wake.set()
+
+    def wait_for_wake(self, timeout: float) -> None:
+        self._wake.wait(timeout)
+        self._wake.clear()
+
+    def watched_elections(self) -> list[int]:
+        with self._lock:
+            return list(self._feeds)
+
+    def poll_once(self) -> int:
+        """Le os contadores das eleicoes observadas e publica os deltas; retorna quantos eventos."""
+        election_ids = self.watched_elections()
+        if not election_ids:
+            return 0
+        snapshot = _load_totals(election_ids)
+        published = 0
+        with self._lock:
+            for election_id in election_ids:
+                feed = self._feeds.get(election_id)
+                if feed is None:
+                    continue
+                totals = snapshot.get(election_id, {})
+                if totals == feed.totals:
+                    continue
+                previous_total = feed.total
+                new_total = sum(totals.values())
+                changed = {
+                    candidate_id: votes - feed.totals.get(candidate_id, 0)
+                    for candidate_id, votes in totals.items()
+                    if votes != feed.totals.get(candidate_id, 0)
+                }
+                removed = set(feed.totals) - set(totals)
+                feed.totals = totals
+                feed.total = new_total
+                if new_total <= previous_total or removed or any(delta < 0 for delta in changed.values()):
+                    # Contagem caiu (candidato removido ou reconstrucao): deltas antigos deixam de valer.
+                    feed.events.clear()
+                    feed.generation += 1
+                else:
+                    data = {
+                        "eleicao_id": election_id,
+                        "total_votos": new_total,
+                        "votos": [
+                            {"id": candidate_id, "votos": totals[candidate_id], "delta": delta}
+                            for candidate_id, delta in sorted(changed.items())
+                        ],
+                    }
+                    feed.events.append((previous_total, new_total, format_event("delta", new_total, data)))
+                feed.condition.notify_all()
+                published += 1
+        return published
+
+    def _pending(
+        self,
+        feed: _ElectionFeed,
+        election_id: int,
+        last_id: int,
+        generation: int,
+    ) -> tuple[list[str], int]:
+        if generation == feed.generation and last_id >= feed.total:
+            # Em dia, ou o cliente viu votos que este worker ainda nao leu.
+            return [], last_id
+        chunks: list[str] = []
+        cursor = last_id
+        if generation == feed.generation:
+            for start, end, text in feed.events:
+                if start == cursor:
+                    chunks.append(text)
+                    cursor = end
+            if cursor == feed.total:
+                return chunks, cursor
+        # Sem cadeia de deltas a partir do id do cliente: reenvia os totais atuais.
+        data = {
+            "eleicao_id": election_id,
+            "total_votos": feed.total,
+            "votos": [{"id": candidate_id, "votos": votes} for candidate_id, votes in sorted(feed.totals.items())],
+        }
+        return [format_event("totals", feed.total, data)], feed.total
+
+    def stream(
+        self,
+        election_id: int,
+        last_id: int,
+        heartbeat_seconds: float | None = None,
+        max_seconds: float | None = None,
+    ) -> Iterator[str]:
+        """Gera o fluxo SSE de uma conexao registrada com ``subscribe``.
+
+        O chamador libera a conexao com ``unsubscribe`` quando a resposta fecha.
+        """
+        heartbeat = (
+            heartbeat_seconds
+            if heartbeat_seconds is not None
+            else float(os.getenv(_HEARTBEAT_ENV, _DEFAULT_HEARTBEAT_SECONDS))
+        )
+        lifetime = max_seconds if max_seconds is not None else float(os.getenv(_MAX_SECONDS_ENV, _DEFAULT_MAX_SECONDS))
+        deadline = time.monotonic() + lifetime
+        generation: Optional[int] = None
+        while True:
+            with self._lock:
+                feed = self._feeds.get(election_id)
+                if feed is None:
+                    return
+                if generation is None:
+                    generation = feed.generation
+                chunks, last_id = self._pending(feed, election_id, last_id, generation)
+                remaining = deadline - time.monotonic()
+                if not chunks and remaining > 0:
+                    feed.condition.wait(min(heartbeat, remaining))
+                    chunks, last_id = self._pending(feed, election_id, last_id, generation)
+                generation = feed.generation
+            if chunks:
+                yield "".join(chunks)
+            elif time.monotonic() >= deadline:
+                # Encerra para o cliente reconectar com Last-Event-ID (rebalanceia os workers).
+                return
+            else:
+                yield HEARTBEAT
+
+    def clear(self) -> None:
+        with self._lock:
+            self._feeds.clear()
+            self.connections = 0
+        self._wake.clear()
+
+
+def _load_totals(election_ids: list[int]) -> dict[int, dict[int, int]]:
+    rows = db.session.execute(
+        select(
+            CandidateVoteCounter.eleicao_id,
+            CandidateVoteCounter.candidato_id,
+            func.sum(CandidateVoteCounter.votes),
+        )
+        .where(CandidateVoteCounter.eleicao_id.in_(election_ids))
+        .group_by(CandidateVoteCounter.eleicao_id, CandidateVoteCounter.candidato_id)
+    ).all()
+    totals: dict[int, dict[int, int]] = {}
+    for election_id, candidate_id, votes in rows:
+        totals.setdefault(election_id, {})[candidate_id] = int(votes or 0)
+    return totals
+
+
+results_broadcaster = ResultsBroadcaster()
+
+
+class ResultsStreamWorker:
+    """Thread que faz o poll dos contadores para as conexoes SSE deste processo."""
+
+    def __init__(
+        self,
+        app: Flask,
+        broadcaster: ResultsBroadcaster | None = None,
+        poll_seconds: float | None = None,
+    ) -> None:
+        self.app = app
+        self.broadcaster = broadcaster or results_broadcaster
+        self.poll_seconds = poll_seconds if poll_seconds is not None else float(os.getenv(_POLL_ENV, _DEFAULT_POLL_SECONDS))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        with self.app.app_context():
+            try:
+                return self.broadcaster.poll_once()
+            except Exception as exc:  # pragma: no cover - keep the poller alive on transient DB errors
+                logger.error("Results stream poll failed: %s", exc)
+                return 0
+
+    def start(self) -> None:
+        if self._thread is not None or self.poll_seconds <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="results-stream", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.broadcaster.notify()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.broadcaster.wait_for_wake(self.poll_seconds)
+            if self.broadcaster.watched_elections():
+                self.run_once()
+                # Votos em rajada viram um unico delta por intervalo minimo.
+                self._stop.wait(_MIN_POLL_INTERVAL_SECONDS)
+
+
+def ensure_results_stream_worker(app: Flask) -> Optional[ResultsStreamWorker]:
+    """Inicia o poller do SSE uma unica vez por processo."""
+    if app.config.get("TESTING"):
+        return None
+    worker = app.extensions.get(_EXTENSION_KEY)
+    if worker is not None:
+        return worker
+    with _START_LOCK:
+        worker = app.extensions.get(_EXTENSION_KEY)
+        if worker is None:
+            worker = ResultsStreamWorker(app)
+            app.extensions[_EXTENSION_KEY] = worker
+            worker.start()
+    return worker
+
+
+__all__ = [
+    "HEARTBEAT",
+    "RETRY",
+    "ResultsBroadcaster",
+    "ResultsStreamWorker",
+    "ensure_results_stream_worker",
+    "format_event",
+    "results_broadcaster",
+]
@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional, Protocol
+
+import redis
+from redis.exceptions import WatchError
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import SessionToken, db
+
+_BACKEND_ENV = "SESSION_BACKEND"
+_REDIS_URL_ENV = "SESSION_REDIS_URL"
+_REDIS_PREFIX_ENV = "SESSION_REDIS_PREFIX"
+_DEFAULT_REDIS_PREFIX = "athenas:"
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SessionData:
+    token: str
+    user_id: int
+    csrf_token: str
+    expires_at: datetime
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _normalize_dt(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class SessionBackend(Protocol):
+    """Armazenamento de sessoes e nonces usado pelo SessionStore."""
+
+    def save_session(self, data: SessionData, *, commit: bool = True) -> None: ...
+
+    def get_session(self, token: str) -> Optional[SessionData]: ...
+
+    def delete_session(self, token: str) -> None: ...
+
+    def touch_session(self, token: str, expires_at: datetime) -> None: ...
+
+    def save_nonce(self, address: str, nonce: str, expires_at: datetime) -> None: ...
+
+    def peek_nonce(self, address: str) -> Optional[str]: ...
+
+    def pop_nonce(self, address: str) -> Optional[str]: ...
+
+    def consume_nonce(self, address: str, nonce: str, *, commit: bool = True) -> bool: ...
+
+    def clear_nonces(self) -> None: ...
+
+    def purge_expired(self, batch_size: int) -> int: ...
+
+
+def build_nonce_upsert(address: str, nonce: str, expires_at: datetime, dialect_name: str):
+    """INSERT do nonce que sobrescreve o existente via uq_session_store_kind_address.
+
+    Retorna None para dialetos sem upsert nativo, que usam SELECT + UPDATE.
+    """
+    table = SessionToken.__table__
+    values = {
+        "kind": "nonce",
+        "session_id": secrets.token_urlsafe(24),
+        "address": address,
+        "nonce": nonce,
+        "created_at": _utcnow(),
+        "expires_at": expires_at,
+    }
+    if dialect_name in {"mysql", "mariadb"}:
+        stmt = mysql_insert(table).values(**values)
+        return stmt.on_duplicate_key_update(nonce=stmt.inserted.nonce, expires_at=stmt.inserted.expires_at)
+    if dialect_name in {"sqlite", "postgresql"}:
+        insert_factory = postgresql_insert if dialect_name == "postgresql" else sqlite_insert
+        stmt = insert_factory(table).values(**values)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.kind, table.c.address],
+            set_={"nonce": stmt.excluded.nonce, "expires_at": stmt.excluded.expires_at},
+        )
+    return None
+
+
+class SqlSessionBackend:
+    """Backend padrao: tabela session_store via SQLAlchemy."""
+
+    def __init__(self) -> None:
+        self._session = db.session
+
+    def save_session(self, data: SessionData, *, commit: bool = True) -> None:
+        record = SessionToken(
+            kind="session",
+            session_id=data.token,
+            user_id=data.user_id,
+            csrf_token=data.csrf_token,
+            expires_at=data.expires_at,
+        )
+        self._session.add(record)
+        if commit:
+            self._session.commit()
+
+    def get_session(self, token: str) -> Optional[SessionData]:
+        record = self._session.execute(
+            select(SessionToken).where(
+                SessionToken.kind == "session",
+                SessionToken.session_id == token,
+            )
+        ).scalar_one_or_none()
+        if record is None:
+            return None
+        return SessionData(
+            token=token,
+            user_id=record.user_id,
+            csrf_token=record.csrf_token or "",
+            expires_at=record.expires_at,
+        )
+
+    def delete_session(self, token: str) -> None:
+        self._session.execute(
+            delete(SessionToken).where(
+                SessionToken.kind == "session",
+                SessionToken.session_id == token,
+            )
+        )
+        self._session.commit()
+
+    def touch_session(self, token: str, expires_at: datetime) -> None:
+        self._session.execute(
+            update(SessionToken)
+            .where(
+                SessionToken.kind == "session",
+                SessionToken.session_id == token,
+            )
+            .values(expires_at=expires_at)
+        )
+        self._session.commit()
+
+    def save_nonce(self, address: str, nonce: str, expires_at: datetime) -> None:
+        stmt = build_nonce_upsert(address, nonce, expires_at, self._session.get_bind().dialect.name)
+        if stmt is not None:
+            self._session.execute(stmt)
+            self._session.commit()
+            return
+
+        record = self._get_nonce_record(address)
+        if record is None:
+            record = SessionToken(
+                kind="nonce",
+                session_id=secrets.token_urlsafe(24),
+                address=address,
+                nonce=nonce,
+                expires_at=expires_at,
+            )
+            self._session.add(record)
+        else:
+            record.nonce = nonce
+            record.expires_at = expires_at
+        self._session.commit()
+
+    def peek_nonce(self, address: str) -> Optional[str]:
+        record = self._get_nonce_record(address)
+        if record is None:
+            return None
+        if _normalize_dt(record.expires_at) <= _utcnow():
+            self._session.execute(
+                delete(SessionToken).where(SessionToken.id == record.id)
+            )
+            self._session.commit()
+            return None
+        return record.nonce
+
+    def pop_nonce(self, address: str) -> Optional[str]:
+        record = self._get_nonce_record(address)
+        if record is None:
+            return None
+        if _normalize_dt(record.expires_at) <= _utcnow():
+            self._session.execute(
+                delete(SessionToken).where(SessionToken.id == record.id)
+            )
+            self._session.commit()
+            return None
+        nonce = record.nonce
+        self._session.execute(delete(SessionToken).where(SessionToken.id == record.id))
+        self._session.commit()
+        return nonce
+
+    def consume_nonce(self, address: str, nonce: str, *, commit: bool = True) -> bool:
+        """DELETE condicional: so um chamador concorrente consome o mesmo nonce."""
+        result = self._session.execute(
+            delete(SessionToken).where(
+                SessionToken.kind == "nonce",
+                SessionToken.address == address,
+                SessionToken.nonce == nonce,
+                SessionToken.expires_at > _utcnow(),
+            )
+        )
+        if commit:
+            self._session.commit()
+        return result.rowcount > 0
+
+    def clear_nonces(self) -> None:
+        self._session.execute(
+            delete(SessionToken).where(SessionToken.kind == "nonce")
+        )
+        self._session.commit()
+
+    def purge_expired(self, batch_size: int) -> int:
+        """Remove sessoes e nonces expirados em lotes limitados por chave primaria."""
+        removed = 0
+        while True:
+            ids = list(
+                self._session.execute(
+                    select(SessionToken.id)
+                    .where(SessionToken.expires_at < _utcnow())
+                    .order_by(SessionToken.id.asc())
+                    .limit(batch_size)
+                ).scalars()
+            )
+            if not ids:
+                self._session.commit()
+                return removed
+            self._session.execute(delete(SessionToken).where(SessionToken.id.in_(ids)))
+            self._session.commit()
+            removed += len(ids)
+            if len(ids) < batch_size:
+                return removed
+
+    def _get_nonce_record(self, address: str) -> Optional[SessionToken]:
+        return self._session.execute(
+            select(SessionToken).where(
+                SessionToken.kind == "nonce",
+                SessionToken.address == address,
+            )
+        ).scalar_one_or_none()
+
+
+class RedisSessionBackend:
+    """Backend chave-valor compativel com o protocolo Redis, usando TTL nativo.
+
+    Sessoes ficam em hashes ``<prefix>session:<token>`` e nonces em strings
+    ``<prefix>nonce:<address>``; ambos expiram sozinhos via PEXPIREAT/PX, entao
+    nao ha limpeza periodica a fazer.
+    """
+
+    def __init__(self, client: Any, prefix: str = _DEFAULT_REDIS_PREFIX) -> None:
+        self._client = client
+        self._prefix = prefix
+
+    def _session_key(self, token: str) -> str:
+        return f"{self._prefix}session:{token}"
+
+    def _nonce_key(self, address: str) -> str:
+        return f"{self._prefix}nonce:{address}"
+
+    @staticmethod
+    def _ttl_ms(expires_at: datetime) -> int:
+        return int((_normalize_dt(expires_at) - _utcnow()).total_seconds() * 1000)
+
+    def save_session(self, data: SessionData, *, commit: bool = True) -> None:
+        key = self._session_key(data.token)
+        expires_at = _normalize_dt(data.expires_at)
+        pipe = self._client.pipeline(transaction=True)
+        pipe.hset(
+            key,
+            mapping={
+                "user_id": data.user_id,
+                "csrf_token": data.csrf_token,
+                "expires_at": expires_at.timestamp(),
+            },
+        )
+        pipe.pexpireat(key, int(expires_at.timestamp() * 1000))
+        pipe.execute()
+
+    def get_session(self, token: str) -> Optional[SessionData]:
+        values = self._client.hgetall(self._session_key(token))
+        if not values:
+            return None
+        decoded = {_decode(key): _decode(value) for key, value in values.items()}
+        if "user_id" not in decoded or "expires_at" not in decoded:
+            # Hash parcial (ex.: recriado por uma escrita concorrente): sessao inexistente.
+            return None
+        return SessionData(
+            token=token,
+            user_id=int(decoded["user_id"]),
+            csrf_token=decoded.get("csrf_token", ""),
+            expires_at=datetime.fromtimestamp(float(decoded["expires_at"]), tz=timezone.utc),
+        )
+
+    def delete_session(self, token: str) -> None:
+        self._client.delete(self._session_key(token))
+
+    def touch_session(self, token: str, expires_at: datetime) -> None:
+        """Estende a sessao so se ela ainda existe; um logout concorrente vence."""
+        key = self._session_key(token)
+        expires_at = _normalize_dt(expires_at)
+        with self._client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(key)
+                if not pipe.hexists(key, "user_id"):
+                    pipe.unwatch()
+                    return
+                pipe.multi()
+                pipe.hset(key, "expires_at", expires_at.timestamp())
+                pipe.pexpireat(key, int(expires_at.timestamp() * 1000))
+                pipe.execute()
+            except WatchError:
+                # Removida ou alterada entre a leitura e a escrita: nao recria.
+                return
+
+    def save_nonce(self, address: str, nonce: str, expires_at: datetime) -> None:
+        ttl_ms = self._ttl_ms(expires_at)
+        if ttl_ms <= 0:
+            self._client.delete(self._nonce_key(address))
+            return
+        self._client.set(self._nonce_key(address), nonce, px=ttl_ms)
+
+    def peek_nonce(self, address: str) -> Optional[str]:
+        value = self._client.get(self._nonce_key(address))
+        return _decode(value) if value is not None else None
+
+    def pop_nonce(self, address: str) -> Optional[str]:
+        value = self._client.getdel(self._nonce_key(address))
+        return _decode(value) if value is not None else None
+
+    def consume_nonce(self, address: str, nonce: str, *, commit: bool = True) -> bool:
+        key = self._nonce_key(address)
+        with self._client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(key)
+                current = pipe.get(key)
+                if current is None or _decode(current) != nonce:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.delete(key)
+                pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    def clear_nonces(self) -> None:
+        batch: list[str] = []
+        for key in self._client.scan_iter(match=f"{self._prefix}nonce:*", count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                self._client.delete(*batch)
+                batch = []
+        if batch:
+            self._client.delete(*batch)
+
+    def purge_expired(self, batch_size: int) -> int:
+        return 0
+
+
+def _decode(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return str(value)
+
+
+def build_session_backend() -> SessionBackend:
+    """Seleciona o backend via SESSION_BACKEND (``sql`` ou ``redis``)."""
+    kind = (os.getenv(_BACKEND_ENV) or "sql").strip().lower()
+    if kind == "sql":
+        return SqlSessionBackend()
+    if kind == "redis":
+        url = os.getenv(_REDIS_URL_ENV)
+        if not url:
+            raise RuntimeError("SESSION_BACKEND=redis requires SESSION_REDIS_URL.")
+        client = redis.Redis.from_url(url)
+        prefix = os.getenv(_REDIS_PREFIX_ENV, _DEFAULT_REDIS_PREFIX)
+        logger.info("Using Redis session backend with prefix %s", prefix)
+        return RedisSessionBackend(client, prefix=prefix)
+    raise RuntimeError(f"Unknown SESSION_BACKEND '{kind}'. Use 'sql' or 'redis'.")
+
+
+__all__ = [
+    "SessionBackend",
+    "SessionData",
+    "SqlSessionBackend",
+    "RedisSessionBackend",
+    "build_nonce_upsert",
+    "build_session_backend",
+]
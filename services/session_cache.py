@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+_TTL_ENV = "SESSION_CACHE_TTL_SECONDS"
+_MAX_ENTRIES_ENV = "SESSION_CACHE_MAX_ENTRIES"
+_DEFAULT_TTL_SECONDS = 30.0
+_DEFAULT_MAX_ENTRIES = 10_000
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _normalize_dt(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class CachedSession:
+    user_id: int
+    csrf_token: str
+    expires_at: datetime
+    user_values: dict[str, Any]
+    cached_until: float
+
+
+class SessionCache:
+    """Cache LRU em memoria de sessoes resolvidas, com TTL limitado pelo expires_at."""
+
+    def __init__(
+        self,
+        ttl_seconds: float | None = None,
+        max_entries: int | None = None,
+        clock=time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else _env_float(_TTL_ENV, _DEFAULT_TTL_SECONDS)
+        self.max_entries = max_entries if max_entries is not None else _env_int(_MAX_ENTRIES_ENV, _DEFAULT_MAX_ENTRIES)
+        self._clock = clock
+        self._entries: OrderedDict[str, CachedSession] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, token: str) -> Optional[CachedSession]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and (
+                entry.cached_until <= self._clock() or _normalize_dt(entry.expires_at) <= _utcnow()
+            ):
+                del self._entries[token]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        token: str,
+        *,
+        user_id: int,
+        csrf_token: str,
+        expires_at: datetime,
+        user_values: dict[str, Any],
+    ) -> None:
+        if not self.enabled:
+            return
+        remaining = (_normalize_dt(expires_at) - _utcnow()).total_seconds()
+        if remaining <= 0:
+            return
+        entry = CachedSession(
+            user_id=user_id,
+            csrf_token=csrf_token,
+            expires_at=expires_at,
+            user_values=dict(user_values),
+            cached_until=self._clock() + min(self.ttl_seconds, remaining),
+        )
+        with self._lock:
+            self._entries[token] = entry
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update_expiry(self, token: str, expires_at: datetime) -> None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                self._entries[token] = replace(entry, expires_at=expires_at)
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            stale = [token for token, entry in self._entries.items() if entry.user_id == user_id]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+__all__ = ["CachedSession", "SessionCache"]
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Optional
+
+from flask import Flask
+
+from services.idempotency import IdempotencyStore
+from services.leader_lock import FileLeaderLock, default_lock_path
+from services.session_backends import build_session_backend
+from services.session_service import SessionStore
+from services.signed_tokens import build_token_codec
+
+_INTERVAL_ENV = "SESSION_REAPER_INTERVAL_SECONDS"
+_BATCH_SIZE_ENV = "SESSION_REAPER_BATCH_SIZE"
+_LOCK_PATH_ENV = "SESSION_REAPER_LOCK_PATH"
+_DEFAULT_INTERVAL_SECONDS = 60.0
+_DEFAULT_BATCH_SIZE = 500
+_EXTENSION_KEY = "session_reaper"
+
+
+logger = logging.getLogger(__name__)
+_START_LOCK = threading.Lock()
+
+
+class SessionReaper:
+    """Remove periodicamente sessoes, nonces e chaves de idempotencia expirados fora das requisicoes.
+
+    Em um deploy com varios workers do gunicorn apenas o processo que detem o
+    lock de arquivo executa a limpeza; os demais tentam assumir a cada ciclo.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        interval_seconds: float | None = None,
+        batch_size: int | None = None,
+        lock_path: str | None = None,
+    ) -> None:
+        self.app = app
+        self.interval_seconds = (
+            interval_seconds
+            if interval_seconds is not None
+            else float(os.getenv(_INTERVAL_ENV, _DEFAULT_INTERVAL_SECONDS))
+        )
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv(_BATCH_SIZE_ENV, _DEFAULT_BATCH_SIZE))
+        self.lock_path = lock_path or default_lock_path(_LOCK_PATH_ENV, "athenas_session_reaper.lock")
+        self._leader_lock = FileLeaderLock(self.lock_path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader_lock.held
+
+    def try_acquire_leadership(self) -> bool:
+        return self._leader_lock.try_acquire()
+
+    def release_leadership(self) -> None:
+        self._leader_lock.release()
+
+    def run_once(self) -> int:
+        if not self.try_acquire_leadership():
+            return 0
+        with self.app.app_context():
+            try:
+                store = SessionStore(backend=build_session_backend(), codec=build_token_codec())
+                removed = store.purge_expired(batch_size=self.batch_size)
+                removed += IdempotencyStore().purge_expired(batch_size=self.batch_size)
+            except Exception as exc:  # pragma: no cover - keep the reaper alive on transient DB errors
+                logger.error("Session reaper failed: %s", exc)
+                return 0
+        if removed:
+            logger.info("Session reaper removed %s expired rows", removed)
+        return removed
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="session-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds)
+            self._thread = None
+        self.release_leadership()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.run_once()
+
+
+def ensure_session_reaper(app: Flask) -> Optional[SessionReaper]:
+    """Inicia o reaper uma unica vez por processo (apos o fork do worker)."""
+    if app.config.get("TESTING"):
+        return None
+    reaper = app.extensions.get(_EXTENSION_KEY)
+    if reaper is not None:
+        return reaper
+    with _START_LOCK:
+        reaper = app.extensions.get(_EXTENSION_KEY)
+        if reaper is None:
+            reaper = SessionReaper(app)
+            app.extensions[_EXTENSION_KEY] = reaper
+            reaper.start()
+    return reaper
+
+
+__all__ = ["SessionReaper", "ensure_session_reaper"]
@@ -1,21 +1,22 @@
 from __future__ import annotations
 
+import hashlib
+import hmac
+import os
 import secrets
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy import delete, select
+from sqlalchemy.orm import make_transient_to_detached
 
 from models import SessionToken, Usuario, db
+from services.session_backends import SessionBackend, SessionData, SqlSessionBackend
+from services.session_cache import SessionCache
+from services.signed_tokens import RevocationList, SignedTokenCodec, hash_csrf_token, is_signed_token
 
-
-@dataclass(frozen=True)
-class SessionData:
-    token: str
-    user_id: int
-    csrf_token: str
-    expires_at: datetime
+_SLIDING_INTERVAL_ENV = "SESSION_SLIDING_INTERVAL_SECONDS"
+_DEFAULT_SLIDING_INTERVAL_SECONDS = 300.0
 
 
 @dataclass(frozen=True)
@@ -24,6 +25,12 @@ class ResolvedSession:
     user: Usuario
     csrf_token: str
     expires_at: datetime
+    csrf_hash: Optional[str] = None
+
+    def csrf_matches(self, candidate: str) -> bool:
+        if self.csrf_hash is not None:
+            return hmac.compare_digest(self.csrf_hash, hash_csrf_token(candidate))
+        return bool(self.csrf_token) and hmac.compare_digest(self.csrf_token, candidate)
 
 
 def _utcnow() -> datetime:
@@ -36,44 +43,86 @@ def _normalize_dt(value: datetime) -> datetime:
     return value.astimezone(timezone.utc)
 
 
+def _session_revocation_key(token: str) -> str:
+    return "session:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:48]
+
+
+def _user_revocation_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _snapshot_user(user: Usuario) -> dict:
+    return {column.key: getattr(user, column.key) for column in Usuario.__table__.columns}
+
+
 class SessionStore:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        backend: SessionBackend | None = None,
+        cache: SessionCache | None = None,
+        codec: SignedTokenCodec | None = None,
+        revocations: RevocationList | None = None,
+        sliding_interval_seconds: float | None = None,
+    ) -> None:
         self._session = db.session
+        self.backend = backend if backend is not None else SqlSessionBackend()
+        self.cache = cache if cache is not None else SessionCache()
+        self.codec = codec
+        self.revocations = revocations if revocations is not None else RevocationList()
+        if sliding_interval_seconds is None:
+            sliding_interval_seconds = float(
+                os.getenv(_SLIDING_INTERVAL_ENV, _DEFAULT_SLIDING_INTERVAL_SECONDS)
+            )
+        self.sliding_interval = timedelta(seconds=sliding_interval_seconds)
 
-    def _cleanup_expired(self) -> None:
-        now = _utcnow()
-        self._session.execute(
-            delete(SessionToken).where(SessionToken.expires_at < now)
-        )
-        self._session.commit()
+    def purge_expired(self, batch_size: int = 500) -> int:
+        """Remove sessoes, nonces e revogacoes expirados; backends com TTL nativo retornam 0.
 
-    def create(self, user_id: int) -> SessionData:
-        self._cleanup_expired()
-        token = secrets.token_urlsafe(32)
-        csrf_token = secrets.token_urlsafe(16)
-        expires_at = SessionToken.default_session_expiry()
-        record = SessionToken(
-            kind="session",
-            session_id=token,
+        Revogacoes sao limpas mesmo sem codec: sobram linhas ao voltar para tokens opacos.
+        """
+        removed = self.backend.purge_expired(batch_size)
+        removed += self.revocations.purge_expired(batch_size)
+        return removed
+
+    def create(self, user_id: int, *, commit: bool = True) -> SessionData:
+        if self.codec is not None:
+            csrf_token = secrets.token_urlsafe(16)
+            expires_at = SessionToken.default_session_expiry()
+            token, _ = self.codec.encode(user_id, csrf_token, expires_at)
+            return SessionData(token=token, user_id=user_id, csrf_token=csrf_token, expires_at=expires_at)
+
+        data = SessionData(
+            token=secrets.token_urlsafe(32),
             user_id=user_id,
-            csrf_token=csrf_token,
-            expires_at=expires_at,
+            csrf_token=secrets.token_urlsafe(16),
+            expires_at=SessionToken.default_session_expiry(),
         )
-        self._session.add(record)
-        self._session.commit()
-        return SessionData(token=token, user_id=user_id, csrf_token=csrf_token, expires_at=expires_at)
+        self.backend.save_session(data, commit=commit)
+        return data
+
+    def login_transaction(self) -> "LoginTransaction":
+        return LoginTransaction(self)
 
     def resolve(self, token: Optional[str]) -> Optional[ResolvedSession]:
         if not token:
             return None
 
-        record = self._session.execute(
-            select(SessionToken).where(
-                SessionToken.kind == "session",
-                SessionToken.session_id == token,
+        if self.codec is not None and is_signed_token(token):
+            return self._resolve_signed(token)
+
+        cached = self.cache.get(token)
+        if cached is not None and self._cache_revoked(token, cached.user_id):
+            self.cache.invalidate(token)
+            cached = None
+        if cached is not None:
+            return ResolvedSession(
+                token=token,
+                user=self._attach_cached_user(cached.user_values),
+                csrf_token=cached.csrf_token,
+                expires_at=self._extend_expiry(token, cached.expires_at),
             )
-        ).scalar_one_or_none()
 
+        record = self.backend.get_session(token)
         if record is None:
             return None
 
@@ -86,83 +135,155 @@ class SessionStore:
             self.destroy(token)
             return None
 
+        user_values = _snapshot_user(user)
+        expires_at = self._extend_expiry(token, record.expires_at)
+        self.cache.put(
+            token,
+            user_id=record.user_id,
+            csrf_token=record.csrf_token,
+            expires_at=expires_at,
+            user_values=user_values,
+        )
         return ResolvedSession(
             token=token,
             user=user,
-            csrf_token=record.csrf_token or "",
-            expires_at=record.expires_at,
+            csrf_token=record.csrf_token,
+            expires_at=expires_at,
+        )
+
+    def _extend_expiry(self, token: str, expires_at: datetime) -> datetime:
+        """Expiracao deslizante: so grava quando o ganho supera o intervalo configurado.
+
+        O ganho e derivado do proprio expires_at, entao a coalescencia vale entre
+        workers e nao exige estado extra: uma sessao ativa gera no maximo um
+        UPDATE por intervalo.
+        """
+        expires_at = _normalize_dt(expires_at)
+        if self.sliding_interval.total_seconds() <= 0:
+            return expires_at
+        extended = _utcnow() + SessionToken.session_ttl()
+        if extended - expires_at < self.sliding_interval:
+            return expires_at
+        self.backend.touch_session(token, extended)
+        self.cache.update_expiry(token, extended)
+        return extended
+
+    def _cache_revoked(self, token: str, user_id: int) -> bool:
+        """Logout ou alteracao de cadastro feitos em outro worker.
+
+        O cache e por processo; ``destroy`` e ``invalidate_user`` publicam chaves
+        em revoked_tokens que valem pelo TTL do cache, e cada worker as enxerga
+        no proximo refresh da lista (SESSION_REVOCATION_REFRESH_SECONDS).
+        """
+        return self.revocations.is_revoked(_session_revocation_key(token)) or self.revocations.is_revoked(
+            _user_revocation_key(user_id)
+        )
+
+    def _publish_cache_revocation(self, key: str) -> None:
+        if not self.cache.enabled:
+            return
+        self.revocations.revoke(key, _utcnow() + timedelta(seconds=self.cache.ttl_seconds))
+
+    def _resolve_signed(self, token: str) -> Optional[ResolvedSession]:
+        claims = self.codec.decode(token)
+        if claims is None or self.revocations.is_revoked(claims.jti):
+            return None
+        return ResolvedSession(
+            token=token,
+            user=self._attach_user_reference(claims.user_id),
+            csrf_token="",
+            expires_at=claims.expires_at,
+            csrf_hash=claims.csrf_hash,
         )
 
+    def invalidate_user(self, user_id: int) -> None:
+        """Descarta sessoes em cache do usuario apos alteracoes no seu cadastro, em todos os workers."""
+        self.cache.invalidate_user(user_id)
+        self._publish_cache_revocation(_user_revocation_key(user_id))
+
+    def _attach_cached_user(self, values: dict) -> Usuario:
+        user = Usuario(**values)
+        make_transient_to_detached(user)
+        return self._session.merge(user, load=False)
+
+    def _attach_user_reference(self, user_id: int) -> Usuario:
+        # Referencia sem SELECT: os demais atributos sao carregados apenas se acessados.
+        user = Usuario(id=user_id)
+        make_transient_to_detached(user)
+        return self._session.merge(user, load=False)
+
     def destroy(self, token: Optional[str]) -> None:
         if not token:
             return
-        self._session.execute(
-            delete(SessionToken).where(
-                SessionToken.kind == "session",
-                SessionToken.session_id == token,
-            )
-        )
-        self._session.commit()
+        if self.codec is not None and is_signed_token(token):
+            claims = self.codec.decode(token)
+            if claims is not None:
+                self.revocations.revoke(claims.jti, claims.expires_at)
+            return
+        self.cache.invalidate(token)
+        self.backend.delete_session(token)
+        self._publish_cache_revocation(_session_revocation_key(token))
 
     def save_nonce(self, address: str, nonce: str) -> None:
-        self._cleanup_expired()
-        record = self._get_nonce_record(address)
+        self.backend.save_nonce(address, nonce, SessionToken.default_nonce_expiry())
 
-        expires_at = SessionToken.default_nonce_expiry()
-        if record is None:
-            record = SessionToken(
-                kind="nonce",
-                session_id=secrets.token_urlsafe(24),
-                address=address,
-                nonce=nonce,
-                expires_at=expires_at,
-            )
-            self._session.add(record)
-        else:
-            record.nonce = nonce
-            record.expires_at = expires_at
-        self._session.commit()
+    def peek_nonce(self, address: str) -> Optional[str]:
+        return self.backend.peek_nonce(address)
+
+    def pop_nonce(self, address: str) -> Optional[str]:
+        return self.backend.pop_nonce(address)
+
+    def clear_nonces(self) -> None:
+        self.backend.clear_nonces()
+
+
+class LoginTransaction:
+    """Unidade de trabalho do login: consumo do nonce, upsert do usuario e sessao em um commit.
+
+    Expoe ``peek_nonce``/``pop_nonce`` para ser passada como ``store`` a
+    ``verify_signature_response``; o ``pop_nonce`` vira um DELETE condicional ao
+    nonce lido, sem commit, e ``nonce_conflict`` indica que outra requisicao o
+    consumiu antes.
+    """
+
+    def __init__(self, store: SessionStore) -> None:
+        self._store = store
+        self._peeked: dict[str, str] = {}
+        self.nonce_conflict = False
+        self._committed = False
+
+    def __enter__(self) -> "LoginTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if not self._committed:
+            db.session.rollback()
 
     def peek_nonce(self, address: str) -> Optional[str]:
-        record = self._get_nonce_record(address)
-        if record is None:
-            return None
-        if _normalize_dt(record.expires_at) <= _utcnow():
-            self._session.execute(
-                delete(SessionToken).where(SessionToken.id == record.id)
-            )
-            self._session.commit()
-            return None
-        return record.nonce
+        nonce = self._store.backend.peek_nonce(address)
+        if nonce is not None:
+            self._peeked[address] = nonce
+        return nonce
 
     def pop_nonce(self, address: str) -> Optional[str]:
-        record = self._get_nonce_record(address)
-        if record is None:
-            return None
-        if _normalize_dt(record.expires_at) <= _utcnow():
-            self._session.execute(
-                delete(SessionToken).where(SessionToken.id == record.id)
-            )
-            self._session.commit()
+        nonce = self._peeked.pop(address, None)
+        if nonce is None:
+            nonce = self._store.backend.peek_nonce(address)
+        if nonce is None or not self._store.backend.consume_nonce(address, nonce, commit=False):
+            self.nonce_conflict = True
             return None
-        nonce = record.nonce
-        self._session.execute(delete(SessionToken).where(SessionToken.id == record.id))
-        self._session.commit()
         return nonce
 
-    def clear_nonces(self) -> None:
-        self._session.execute(
-            delete(SessionToken).where(SessionToken.kind == "nonce")
-        )
-        self._session.commit()
+    def create(self, user_id: int) -> SessionData:
+        return self._store.create(user_id, commit=False)
 
-    def _get_nonce_record(self, address: str) -> Optional[SessionToken]:
-        return self._session.execute(
-            select(SessionToken).where(
-                SessionToken.kind == "nonce",
-                SessionToken.address == address,
-            )
-        ).scalar_one_or_none()
+    def commit(self) -> None:
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self._committed = True
 
 
-__all__ = ["SessionStore", "SessionData", "ResolvedSession"]
+__all__ = ["SessionStore", "SessionData", "ResolvedSession", "LoginTransaction"]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Optional, Sequence
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+_POOL_SIZE_ENV = "SIGNATURE_POOL_SIZE"
+_POOL_TIMEOUT_ENV = "SIGNATURE_POOL_TIMEOUT_SECONDS"
+_POOL_START_METHOD_ENV = "SIGNATURE_POOL_START_METHOD"
+_DEFAULT_TIMEOUT_SECONDS = 5.0
+_DEFAULT_START_METHOD = "spawn"
+_PENDING_PER_PROCESS = 8
+
+
+logger = logging.getLogger(__name__)
+
+
+def recover_message_signer(message: str, signature: str) -> str:
+    """Recupera o endereco que assinou ``message`` (EIP-191). Executa no processo atual."""
+    return Account.recover_message(encode_defunct(text=message), signature=signature)
+
+
+def _recover_or_error(message: str, signature: str) -> str | Exception:
+    try:
+        return recover_message_signer(message, signature)
+    except Exception as exc:
+        # ValueError garante que o erro seja serializavel de volta ao processo pai.
+        return ValueError(str(exc))
+
+
+class SignaturePool:
+    """Pool de processos limitado para a recuperacao secp256k1 das assinaturas de login.
+
+    Com ``size=0`` tudo roda de forma sincrona. Quando o pool esta saturado,
+    quebrado ou nao responde dentro do timeout, a recuperacao cai para o
+    processo atual em vez de falhar a requisicao.
+    """
+
+    def __init__(
+        self,
+        size: int | None = None,
+        timeout_seconds: float | None = None,
+        start_method: str | None = None,
+    ) -> None:
+        self.size = size if size is not None else int(os.getenv(_POOL_SIZE_ENV, "0"))
+        self.timeout_seconds = (
+            timeout_seconds
+            if timeout_seconds is not None
+            else float(os.getenv(_POOL_TIMEOUT_ENV, _DEFAULT_TIMEOUT_SECONDS))
+        )
+        self.start_method = start_method or os.getenv(_POOL_START_METHOD_ENV, _DEFAULT_START_METHOD)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._pending = threading.BoundedSemaphore(max(self.size, 1) * _PENDING_PER_PROCESS)
+        self.offloaded = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.size, mp_context=context)
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def recover(self, message: str, signature: str) -> str:
+        if not self.enabled or not self._pending.acquire(blocking=False):
+            self.fallbacks += int(self.enabled)
+            return recover_message_signer(message, signature)
+        try:
+            future = self._get_executor().submit(recover_message_signer, message, signature)
+            result = future.result(timeout=self.timeout_seconds)
+            self.offloaded += 1
+            return result
+        except BrokenProcessPool:
+            logger.warning("Signature pool broken; recreating and recovering inline")
+            self._reset_executor()
+        except FutureTimeoutError:
+            logger.warning("Signature pool timed out after %ss; recovering inline", self.timeout_seconds)
+        finally:
+            self._pending.release()
+        self.fallbacks += 1
+        return recover_message_signer(message, signature)
+
+    def batch_recover(self, items: Iterable[tuple[str, str]]) -> list[str | Exception]:
+        """Recupera varios signatarios; falhas individuais voltam como excecoes na mesma posicao."""
+        pairs: Sequence[tuple[str, str]] = list(items)
+        if not pairs:
+            return []
+        if self.enabled:
+            try:
+                messages, signatures = zip(*pairs)
+                chunksize = max(1, len(pairs) // (self.size * 4))
+                results = list(
+                    self._get_executor().map(_recover_or_error, messages, signatures, chunksize=chunksize)
+                )
+                self.offloaded += len(pairs)
+                return results
+            except BrokenProcessPool:
+                logger.warning("Signature pool broken during batch; recovering inline")
+                self._reset_executor()
+                self.fallbacks += len(pairs)
+        return [_recover_or_error(message, signature) for message, signature in pairs]
+
+    def shutdown(self) -> None:
+        self._reset_executor()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": self.size, "offloaded": self.offloaded, "fallbacks": self.fallbacks}
+
+
+_pool: Optional[SignaturePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_signature_pool() -> SignaturePool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SignaturePool()
+    return _pool
+
+
+def reset_signature_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+__all__ = [
+    "SignaturePool",
+    "get_signature_pool",
+    "recover_message_signer",
+    "reset_signature_pool",
+]
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import RevokedToken, db
+
+_MODE_ENV = "SESSION_TOKEN_MODE"
+_SIGNING_KEY_ENV = "SESSION_SIGNING_KEY"
+_REFRESH_ENV = "SESSION_REVOCATION_REFRESH_SECONDS"
+_DEFAULT_REFRESH_SECONDS = 5.0
+_OVERLAP_ENV = "SESSION_REVOCATION_OVERLAP_SECONDS"
+_DEFAULT_OVERLAP_SECONDS = 60.0
+_TOKEN_VERSION = 1
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _normalize_dt(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(value: str) -> bytes:
+    padding = "=" * (-len(value) % 4)
+    return base64.urlsafe_b64decode(value + padding)
+
+
+def hash_csrf_token(csrf_token: str) -> str:
+    return _b64encode(hashlib.sha256(csrf_token.encode("utf-8")).digest()[:16])
+
+
+def is_signed_token(token: str) -> bool:
+    # token_urlsafe nunca gera ".", entao o separador distingue os dois formatos.
+    return "." in token
+
+
+@dataclass(frozen=True)
+class SignedTokenClaims:
+    user_id: int
+    csrf_hash: str
+    expires_at: datetime
+    jti: str
+
+
+class SignedTokenCodec:
+    """Codifica/valida tokens ``<payload>.<assinatura>`` com HMAC-SHA256."""
+
+    def __init__(self, key: bytes) -> None:
+        if not key:
+            raise ValueError("Signing key must not be empty")
+        self._key = key
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._key, payload, hashlib.sha256).digest()
+
+    def encode(self, user_id: int, csrf_token: str, expires_at: datetime) -> tuple[str, SignedTokenClaims]:
+        claims = SignedTokenClaims(
+            user_id=user_id,
+            csrf_hash=hash_csrf_token(csrf_token),
+            expires_at=expires_at,
+            jti=secrets.token_urlsafe(12),
+        )
+        payload = json.dumps(
+            {
+                "v": _TOKEN_VERSION,
+                "uid": claims.user_id,
+                "csrf": claims.csrf_hash,
+                "exp": int(expires_at.timestamp()),
+                "jti": claims.jti,
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
+        token = f"{_b64encode(payload)}.{_b64encode(self._sign(payload))}"
+        return token, claims
+
+    def decode(self, token: str) -> Optional[SignedTokenClaims]:
+        try:
+            encoded_payload, encoded_signature = token.split(".", 1)
+            payload = _b64decode(encoded_payload)
+            signature = _b64decode(encoded_signature)
+        except (ValueError, TypeError):
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        try:
+            data = json.loads(payload)
+            if data.get("v") != _TOKEN_VERSION:
+                return None
+            expires_at = datetime.fromtimestamp(int(data["exp"]), tz=timezone.utc)
+            claims = SignedTokenClaims(
+                user_id=int(data["uid"]),
+                csrf_hash=str(data["csrf"]),
+                expires_at=expires_at,
+                jti=str(data["jti"]),
+            )
+        except (ValueError, TypeError, KeyError):
+            return None
+        if claims.expires_at <= _utcnow():
+            return None
+        return claims
+
+
+class RevocationList:
+    """Conjunto em memoria de jti revogados, sincronizado incrementalmente com revoked_tokens.
+
+    Cada refresh rele as revogacoes desde a mais recente ja vista menos
+    ``overlap_seconds``: ids auto-incremento ficam visiveis na ordem do commit,
+    nao na da insercao, entao um limite estrito por id perderia logouts.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float | None = None,
+        clock=time.monotonic,
+        overlap_seconds: float | None = None,
+    ) -> None:
+        self.refresh_seconds = (
+            refresh_seconds
+            if refresh_seconds is not None
+            else float(os.getenv(_REFRESH_ENV, _DEFAULT_REFRESH_SECONDS))
+        )
+        self.overlap = timedelta(
+            seconds=overlap_seconds
+            if overlap_seconds is not None
+            else float(os.getenv(_OVERLAP_ENV, _DEFAULT_OVERLAP_SECONDS))
+        )
+        self._clock = clock
+        self._revoked: dict[str, datetime] = {}
+        self._watermark: Optional[datetime] = None
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, jti: str) -> bool:
+        self.refresh()
+        return jti in self._revoked
+
+    def revoke(self, jti: str, expires_at: datetime) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+        db.session.add(RevokedToken(jti=jti, expires_at=expires_at))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # Chave reaproveitada (invalidacoes de sessao em cache): renova a linha
+            # para que o refresh dos outros workers a leia de novo.
+            db.session.execute(
+                update(RevokedToken)
+                .where(RevokedToken.jti == jti)
+                .values(revoked_at=_utcnow(), expires_at=expires_at)
+            )
+            db.session.commit()
+
+    def refresh(self, force: bool = False) -> None:
+        now = self._clock()
+        if not force and now < self._next_refresh:
+            return
+        with self._lock:
+            if not force and now < self._next_refresh:
+                return
+            current = _utcnow()
+            stmt = select(RevokedToken.jti, RevokedToken.revoked_at, RevokedToken.expires_at)
+            if self._watermark is None:
+                stmt = stmt.where(RevokedToken.expires_at > current)
+            else:
+                stmt = stmt.where(RevokedToken.revoked_at >= self._watermark - self.overlap)
+            for row in db.session.execute(stmt).all():
+                # Linhas da janela de sobreposicao voltam repetidas; o jti deduplica.
+                self._revoked[row.jti] = row.expires_at
+                revoked_at = _normalize_dt(row.revoked_at)
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+            for jti in [jti for jti, exp in self._revoked.items() if _normalize_dt(exp) <= current]:
+                del self._revoked[jti]
+            self._next_refresh = now + self.refresh_seconds
+
+    def purge_expired(self, batch_size: int) -> int:
+        removed = 0
+        while True:
+            ids = list(
+                db.session.execute(
+                    select(RevokedToken.id)
+                    .where(RevokedToken.expires_at < _utcnow())
+                    .order_by(RevokedToken.id.asc())
+                    .limit(batch_size)
+                ).scalars()
+            )
+            if not ids:
+                db.session.commit()
+                return removed
+            db.session.execute(delete(RevokedToken).where(RevokedToken.id.in_(ids)))
+            db.session.commit()
+            removed += len(ids)
+            if len(ids) < batch_size:
+                return removed
+
+
+def build_token_codec() -> Optional[SignedTokenCodec]:
+    """Retorna o codec quando SESSION_TOKEN_MODE=signed; None mantem tokens opacos."""
+    mode = (os.getenv(_MODE_ENV) or "opaque").strip().lower()
+    if mode == "opaque":
+        return None
+    if mode != "signed":
+        raise RuntimeError(f"Unknown SESSION_TOKEN_MODE '{mode}'. Use 'opaque' or 'signed'.")
+    key = os.getenv(_SIGNING_KEY_ENV)
+    if not key:
+        raise RuntimeError("SESSION_TOKEN_MODE=signed requires SESSION_SIGNING_KEY.")
+    return SignedTokenCodec(key.encode("utf-8"))
+
+
+__all__ = [
+    "RevocationList",
+    "SignedTokenClaims",
+    "SignedTokenCodec",
+    "build_token_codec",
+    "hash_csrf_token",
+    "is_signed_token",
+]
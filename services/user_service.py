@@ -3,6 +3,10 @@ from __future__ import annotations
 from typing import Optional
 
 from flask import abort
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import SQLAlchemyError
 
 from dtos.user_dto import UpdateUserProfileDTO
@@ -28,6 +32,44 @@ def get_or_create_user(address: str) -> Usuario:
     return user
 
 
+def build_user_upsert(address: str, dialect_name: str):
+    """Monta o INSERT ... ON CONFLICT/ON DUPLICATE KEY em usuarios.endereco_wallet."""
+    table = Usuario.__table__
+    if dialect_name in {"mysql", "mariadb"}:
+        # LAST_INSERT_ID(id) faz o lastrowid apontar para a linha existente em caso de conflito.
+        return (
+            mysql_insert(table)
+            .values(endereco_wallet=address)
+            .on_duplicate_key_update(id=func.last_insert_id(table.c.id))
+        )
+    insert_factory = postgresql_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert_factory(Usuario).values(endereco_wallet=address)
+    return stmt.on_conflict_do_update(
+        index_elements=[Usuario.endereco_wallet],
+        set_={"endereco_wallet": stmt.excluded.endereco_wallet},
+    ).returning(Usuario)
+
+
+def upsert_user(address: str) -> Usuario:
+    """Garante o usuario da carteira em um unico statement, sem commit."""
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name in {"mysql", "mariadb"}:
+        result = db.session.execute(build_user_upsert(address, dialect_name))
+        return db.session.get(Usuario, result.lastrowid)
+    if dialect_name in {"sqlite", "postgresql"}:
+        return db.session.scalars(
+            build_user_upsert(address, dialect_name),
+            execution_options={"populate_existing": True},
+        ).one()
+
+    user = db.session.query(Usuario).filter_by(endereco_wallet=address).one_or_none()
+    if user is None:
+        user = Usuario(endereco_wallet=address)
+        db.session.add(user)
+        db.session.flush()
+    return user
+
+
 def get_user_by_id(user_id: int) -> Optional[Usuario]:
     return db.session.get(Usuario, user_id)
 
@@ -64,4 +106,11 @@ def update_user_profile(user: Usuario, dto: UpdateUserProfileDTO) -> dict:
     return serialize_user(user)
 
 
-__all__ = ["get_or_create_user", "get_user_by_id", "serialize_user", "update_user_profile"]
+__all__ = [
+    "build_user_upsert",
+    "get_or_create_user",
+    "get_user_by_id",
+    "serialize_user",
+    "update_user_profile",
+    "upsert_user",
+]
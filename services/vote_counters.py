@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import random
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import CandidateVoteCounter, Voto, db
+
+_SHARDS_ENV = "VOTE_COUNTER_SHARDS"
+_DEFAULT_SHARDS = 8
+
+
+def counter_shards() -> int:
+    return max(int(os.getenv(_SHARDS_ENV, _DEFAULT_SHARDS)), 1)
+
+
+def build_counter_increment(
+    candidate_id: int,
+    election_id: int,
+    shard: int,
+    amount: int,
+    dialect_name: str,
+):
+    """INSERT que soma ``amount`` ao shard existente; None para dialetos sem upsert."""
+    table = CandidateVoteCounter.__table__
+    values = {"candidato_id": candidate_id, "shard": shard, "eleicao_id": election_id, "votes": amount}
+    if dialect_name in {"mysql", "mariadb"}:
+        stmt = mysql_insert(table).values(**values)
+        return stmt.on_duplicate_key_update(votes=table.c.votes + stmt.inserted.votes)
+    if dialect_name in {"sqlite", "postgresql"}:
+        insert_factory = postgresql_insert if dialect_name == "postgresql" else sqlite_insert
+        stmt = insert_factory(table).values(**values)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.candidato_id, table.c.shard],
+            set_={"votes": table.c.votes + stmt.excluded.votes},
+        )
+    return None
+
+
+def increment_vote_counter(candidate_id: int, election_id: int, amount: int = 1) -> None:
+    """Soma votos em um shard aleatorio dentro da transacao atual (sem commit)."""
+    shard = random.randrange(counter_shards())
+    stmt = build_counter_increment(candidate_id, election_id, shard, amount, db.session.get_bind().dialect.name)
+    if stmt is not None:
+        db.session.execute(stmt)
+        return
+    result = db.session.execute(
+        update(CandidateVoteCounter)
+        .where(CandidateVoteCounter.candidato_id == candidate_id, CandidateVoteCounter.shard == shard)
+        .values(votes=CandidateVoteCounter.votes + amount)
+    )
+    if result.rowcount == 0:
+        db.session.execute(
+            insert(CandidateVoteCounter).values(
+                candidato_id=candidate_id,
+                shard=shard,
+                eleicao_id=election_id,
+                votes=amount,
+            )
+        )
+
+
+def candidate_vote_total(candidate_id: int) -> int:
+    stmt = select(func.coalesce(func.sum(CandidateVoteCounter.votes), 0)).where(
+        CandidateVoteCounter.candidato_id == candidate_id
+    )
+    return int(db.session.execute(stmt).scalar_one())
+
+
+def candidate_vote_totals(election_id: int) -> dict[int, int]:
+    rows = db.session.execute(
+        select(CandidateVoteCounter.candidato_id, func.sum(CandidateVoteCounter.votes))
+        .where(CandidateVoteCounter.eleicao_id == election_id)
+        .group_by(CandidateVoteCounter.candidato_id)
+    ).all()
+    return {candidate_id: int(total or 0) for candidate_id, total in rows}
+
+
+def election_vote_total(election_id: int) -> int:
+    stmt = select(func.coalesce(func.sum(CandidateVoteCounter.votes), 0)).where(
+        CandidateVoteCounter.eleicao_id == election_id
+    )
+    return int(db.session.execute(stmt).scalar_one())
+
+
+def rebuild_vote_counters(election_id: Optional[int] = None) -> int:
+    """Recalcula os contadores a partir de ``votos``; retorna quantos candidatos foram gravados.
+
+    Votos gravados durante a reconstrucao podem ficar de fora; rode com a
+    eleicao encerrada ou em janela de manutencao.
+    """
+    counts = select(Voto.candidato_id, Voto.eleicao_id, func.count(Voto.id).label("total")).group_by(
+        Voto.candidato_id, Voto.eleicao_id
+    )
+    clear = delete(CandidateVoteCounter)
+    if election_id is not None:
+        counts = counts.where(Voto.eleicao_id == election_id)
+        clear = clear.where(CandidateVoteCounter.eleicao_id == election_id)
+    rows = db.session.execute(counts).all()
+    try:
+        db.session.execute(clear)
+        if rows:
+            db.session.execute(
+                insert(CandidateVoteCounter),
+                [
+                    {"candidato_id": row.candidato_id, "shard": 0, "eleicao_id": row.eleicao_id, "votes": int(row.total)}
+                    for row in rows
+                ],
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
+
+
+__all__ = [
+    "build_counter_increment",
+    "candidate_vote_total",
+    "candidate_vote_totals",
+    "counter_shards",
+    "election_vote_total",
+    "increment_vote_counter",
+    "rebuild_vote_counters",
+]
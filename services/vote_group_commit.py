@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from models import Voto, db
+from services.results_cache import results_cache
+from services.results_stream import results_broadcaster
+from services.vote_counters import increment_vote_counter
+from services.vote_outbox import enqueue_vote
+
+_WINDOW_ENV = "VOTE_GROUP_COMMIT_WINDOW_MS"
+_MAX_BATCH_ENV = "VOTE_GROUP_COMMIT_MAX_BATCH"
+_DEFAULT_WINDOW_MS = 0.0
+_DEFAULT_MAX_BATCH = 64
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WrittenVote:
+    id: int
+    tracking_id: Optional[str] = None
+    blockchain_status: Optional[str] = None
+
+
+@dataclass
+class _PendingVote:
+    election_id: int
+    candidate_id: int
+    vote_hash: str
+    candidate_index: Optional[int]
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[WrittenVote] = None
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class _Group:
+    items: list[_PendingVote] = field(default_factory=list)
+    full: threading.Event = field(default_factory=threading.Event)
+
+
+class VoteGroupCommitter:
+    """Junta os votos de requisicoes concorrentes do worker em um unico commit.
+
+    A primeira requisicao de uma janela vira lider: espera ``window_ms`` (ou
+    o grupo encher), grava todos os votos com uma unica transacao na propria
+    sessao e acorda as demais, cada uma com seu resultado. Um hash repetido
+    devolve None so para quem o enviou. So ajuda com workers com threads
+    (gthread); em workers sync cada grupo tem um voto.
+    """
+
+    def __init__(self, window_ms: float | None = None, max_batch: int | None = None) -> None:
+        self.window_ms = window_ms if window_ms is not None else float(os.getenv(_WINDOW_ENV, _DEFAULT_WINDOW_MS))
+        self.max_batch = max(max_batch if max_batch is not None else int(os.getenv(_MAX_BATCH_ENV, _DEFAULT_MAX_BATCH)), 1)
+        self._lock = threading.Lock()
+        self._open: Optional[_Group] = None
+        self.groups = 0
+        self.votes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_ms > 0
+
+    def submit(
+        self,
+        election_id: int,
+        candidate_id: int,
+        vote_hash: str,
+        candidate_index: Optional[int] = None,
+    ) -> Optional[WrittenVote]:
+        """Grava o voto no proximo commit em grupo; ``candidate_index`` enfileira no outbox."""
+        item = _PendingVote(election_id, candidate_id, vote_hash, candidate_index)
+        with self._lock:
+            group = self._open
+            leader = group is None
+            if leader:
+                group = self._open = _Group()
+            group.items.append(item)
+            if len(group.items) >= self.max_batch:
+                self._open = None
+                group.full.set()
+
+        if leader:
+            group.full.wait(self.window_ms / 1000)
+            with self._lock:
+                if self._open is group:
+                    self._open = None
+            self._write(group.items)
+        else:
+            item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _write(self, items: list[_PendingVote]) -> None:
+        try:
+            try:
+                written = self._insert(items)
+            except IntegrityError:
+                # Hash gravado por outro worker entre a checagem e o INSERT: um commit por voto.
+                db.session.rollback()
+                written = {}
+                for item in items:
+                    try:
+                        written.update(self._insert([item]))
+                    except IntegrityError:
+                        db.session.rollback()
+            for item in items:
+                item.result = written.get(id(item))
+        except BaseException as exc:
+            db.session.rollback()
+            logger.error("Group commit of %s votes failed: %s", len(items), exc)
+            for item in items:
+                item.error = exc
+        finally:
+            for item in items:
+                item.done.set()
+
+    def _insert(self, items: list[_PendingVote]) -> dict[int, WrittenVote]:
+        existing = set(
+            db.session.execute(
+                select(Voto.hash_blockchain).where(Voto.hash_blockchain.in_([item.vote_hash for item in items]))
+            ).scalars()
+        )
+        accepted: list[tuple[_PendingVote, Voto, object]] = []
+        for item in items:
+            if item.vote_hash in existing:
+                continue
+            existing.add(item.vote_hash)
+            vote = Voto(eleicao_id=item.election_id, candidato_id=item.candidate_id, hash_blockchain=item.vote_hash)
+            db.session.add(vote)
+            entry = enqueue_vote(vote, item.candidate_index) if item.candidate_index is not None else None
+            accepted.append((item, vote, entry))
+        if not accepted:
+            db.session.rollback()
+            return {}
+        db.session.flush()
+        per_candidate = Counter((item.candidate_id, item.election_id) for item, _, _ in accepted)
+        for (candidate_id, election_id), amount in per_candidate.items():
+            increment_vote_counter(candidate_id, election_id, amount)
+        written = {
+            id(item): WrittenVote(
+                id=vote.id,
+                tracking_id=entry.tracking_id if entry is not None else None,
+                blockchain_status=entry.status if entry is not None else None,
+            )
+            for item, vote, entry in accepted
+        }
+        commit_started_at = results_cache.now()
+        db.session.commit()
+        with self._lock:
+            self.groups += 1
+            self.votes += len(accepted)
+        for item, _, _ in accepted:
+            results_cache.record_vote(item.election_id, item.candidate_id, commit_started_at)
+        results_broadcaster.notify()
+        return written
+
+
+vote_group_committer = VoteGroupCommitter()
+
+
+__all__ = ["VoteGroupCommitter", "WrittenVote", "vote_group_committer"]
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import IO, Iterable, Iterator, Optional
+
+from flask import abort
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from dtos.vote_dto import CastVoteDTO
+from models import Candidato, Eleicao, Voto, db
+from services.results_cache import results_cache
+from services.results_stream import results_broadcaster
+from services.vote_counters import increment_vote_counter
+
+_CHUNK_SIZE_ENV = "VOTE_IMPORT_CHUNK_SIZE"
+_MAX_ERRORS_ENV = "VOTE_IMPORT_MAX_ERRORS"
+_DEFAULT_CHUNK_SIZE = 1000
+_DEFAULT_MAX_ERRORS = 1000
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportReport:
+    importados: int = 0
+    duplicados: int = 0
+    invalidos: int = 0
+    erros: list[dict] = field(default_factory=list)
+    max_errors: int = _DEFAULT_MAX_ERRORS
+
+    def error(self, line: int, message: str) -> None:
+        self.invalidos += 1
+        if len(self.erros) < self.max_errors:
+            self.erros.append({"linha": line, "erro": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "importados": self.importados,
+            "duplicados": self.duplicados,
+            "invalidos": self.invalidos,
+            "erros": self.erros,
+            "erros_truncados": self.invalidos > len(self.erros),
+        }
+
+
+def _ndjson_rows(stream: IO[str]) -> Iterator[tuple[int, object]]:
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield line_number, ValueError(f"invalid JSON: {exc.msg}")
+
+
+def _csv_rows(stream: IO[str]) -> Iterator[tuple[int, object]]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _describe(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+
+
+class BallotImporter:
+    """Importa cedulas (papel/offline) de uma eleicao em lotes com executemany.
+
+    Cada linha passa pela mesma validacao do ``/votar`` e pelo mapa de
+    candidatos da eleicao, lido uma vez. Hashes repetidos no arquivo ou ja
+    gravados contam como duplicados. Cada lote grava votos e contadores em
+    um commit; ao final o cache de resultados da eleicao e descartado.
+    Cedulas importadas nao sao enviadas ao contrato.
+    """
+
+    def __init__(self, chunk_size: int | None = None, max_errors: int | None = None) -> None:
+        self.chunk_size = max(
+            chunk_size if chunk_size is not None else int(os.getenv(_CHUNK_SIZE_ENV, _DEFAULT_CHUNK_SIZE)),
+            1,
+        )
+        self.max_errors = max_errors if max_errors is not None else int(os.getenv(_MAX_ERRORS_ENV, _DEFAULT_MAX_ERRORS))
+
+    def run(self, election_id: int, stream: IO[str], fmt: str = FORMAT_NDJSON) -> ImportReport:
+        if db.session.get(Eleicao, election_id) is None:
+            abort(404, description="Election not found")
+        candidates = set(
+            db.session.execute(select(Candidato.id).where(Candidato.eleicao_id == election_id)).scalars()
+        )
+        db.session.rollback()
+
+        rows = _csv_rows(stream) if fmt == FORMAT_CSV else _ndjson_rows(stream)
+        report = ImportReport(max_errors=self.max_errors)
+        chunk: dict[str, int] = {}
+        try:
+            for candidate_id, vote_hash in self._validated(rows, candidates, report):
+                if vote_hash in chunk:
+                    report.duplicados += 1
+                    continue
+                chunk[vote_hash] = candidate_id
+                if len(chunk) >= self.chunk_size:
+                    self._write(election_id, chunk, report)
+                    chunk = {}
+            if chunk:
+                self._write(election_id, chunk, report)
+        finally:
+            if report.importados:
+                results_cache.invalidate(election_id)
+                results_broadcaster.notify()
+        logger.info(
+            "Ballot import election_id=%s imported=%s duplicates=%s invalid=%s",
+            election_id,
+            report.importados,
+            report.duplicados,
+            report.invalidos,
+        )
+        return report
+
+    @staticmethod
+    def _validated(
+        rows: Iterable[tuple[int, object]],
+        candidates: set[int],
+        report: ImportReport,
+    ) -> Iterator[tuple[int, str]]:
+        for line_number, row in rows:
+            if isinstance(row, Exception):
+                report.error(line_number, str(row))
+                continue
+            if not isinstance(row, dict):
+                report.error(line_number, "expected an object with candidato_id and hash_blockchain")
+                continue
+            try:
+                dto = CastVoteDTO(**row)
+            except (ValidationError, TypeError) as exc:
+                report.error(line_number, _describe(exc) if isinstance(exc, ValidationError) else str(exc))
+                continue
+            if dto.candidato_id not in candidates:
+                report.error(line_number, "Candidate not found for this election")
+                continue
+            # Mesma normalizacao do /votar, para que a deduplicacao valha entre os dois caminhos.
+            yield dto.candidato_id, dto.hash_blockchain.lower()
+
+    def _write(self, election_id: int, chunk: dict[str, int], report: ImportReport) -> None:
+        for attempt in range(2):
+            existing = set(
+                db.session.execute(select(Voto.hash_blockchain).where(Voto.hash_blockchain.in_(list(chunk)))).scalars()
+            )
+            fresh = [
+                {"eleicao_id": election_id, "candidato_id": candidate_id, "hash_blockchain": vote_hash}
+                for vote_hash, candidate_id in chunk.items()
+                if vote_hash not in existing
+            ]
+            try:
+                if fresh:
+                    db.session.execute(insert(Voto), fresh)
+                    for candidate_id, amount in Counter(row["candidato_id"] for row in fresh).items():
+                        increment_vote_counter(candidate_id, election_id, amount)
+                db.session.commit()
+            except IntegrityError:
+                # Voto concorrente com o mesmo hash entre a leitura e o INSERT: rele e tenta de novo.
+                db.session.rollback()
+                if attempt:
+                    raise
+                continue
+            report.importados += len(fresh)
+            report.duplicados += len(chunk) - len(fresh)
+            return
+
+
+def import_ballots(
+    election_id: int,
+    stream: IO[str],
+    fmt: str = FORMAT_NDJSON,
+    importer: Optional[BallotImporter] = None,
+) -> dict:
+    return (importer or BallotImporter()).run(election_id, stream, fmt).to_dict()
+
+
+__all__ = ["BallotImporter", "FORMAT_CSV", "FORMAT_NDJSON", "ImportReport", "import_ballots"]
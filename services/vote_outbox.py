@@ -0,0 +1,519 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from flask import Flask, abort
+from sqlalchemy import and_, func, or_, select, update
+
+from models import VoteOutbox, Voto, db
+from services.blockchain_integration import (
+    AmbiguousSubmissionError,
+    fetch_transaction_receipt,
+    submit_batch_vote_onchain,
+    submit_vote_onchain,
+    supports_batch_vote,
+)
+from services.nonce_manager import get_nonce_manager
+
+_MODE_ENV = "VOTE_ONCHAIN_MODE"
+_POLL_ENV = "VOTE_OUTBOX_POLL_SECONDS"
+_BATCH_SIZE_ENV = "VOTE_OUTBOX_BATCH_SIZE"
+_WORKERS_ENV = "VOTE_OUTBOX_WORKERS"
+_MAX_ATTEMPTS_ENV = "VOTE_OUTBOX_MAX_ATTEMPTS"
+_BACKOFF_ENV = "VOTE_OUTBOX_BACKOFF_SECONDS"
+_MAX_BACKOFF_ENV = "VOTE_OUTBOX_MAX_BACKOFF_SECONDS"
+_LEASE_ENV = "VOTE_OUTBOX_LEASE_SECONDS"
+_RECEIPT_POLL_ENV = "VOTE_OUTBOX_RECEIPT_POLL_SECONDS"
+_RECEIPT_TIMEOUT_ENV = "VOTE_OUTBOX_RECEIPT_TIMEOUT_SECONDS"
+_ONCHAIN_BATCH_SIZE_ENV = "VOTE_ONCHAIN_BATCH_SIZE"
+_BATCH_MAX_WAIT_ENV = "VOTE_ONCHAIN_BATCH_MAX_WAIT_MS"
+_DEFAULT_POLL_SECONDS = 1.0
+_DEFAULT_BATCH_SIZE = 20
+_DEFAULT_WORKERS = 1
+_DEFAULT_MAX_ATTEMPTS = 8
+_DEFAULT_BACKOFF_SECONDS = 2.0
+_DEFAULT_MAX_BACKOFF_SECONDS = 300.0
+_DEFAULT_LEASE_SECONDS = 60.0
+_DEFAULT_RECEIPT_POLL_SECONDS = 3.0
+_DEFAULT_RECEIPT_TIMEOUT_SECONDS = 900.0
+_DEFAULT_ONCHAIN_BATCH_SIZE = 1
+_DEFAULT_BATCH_MAX_WAIT_MS = 500.0
+_EXTENSION_KEY = "vote_outbox_worker"
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_SUBMITTED = "submitted"
+STATUS_CONFIRMED = "confirmed"
+STATUS_DEAD = "dead"
+
+
+logger = logging.getLogger(__name__)
+_START_LOCK = threading.Lock()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _normalize_dt(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _serialize_datetime(value: datetime | None) -> str | None:
+    return _normalize_dt(value).isoformat() if value is not None else None
+
+
+def is_async_vote_mode() -> bool:
+    """VOTE_ONCHAIN_MODE=async grava o voto e delega o envio on-chain ao outbox."""
+    return (os.getenv(_MODE_ENV) or "sync").strip().lower() == "async"
+
+
+def enqueue_vote(vote: Voto, candidate_index: int) -> VoteOutbox:
+    """Adiciona o envio on-chain do voto na mesma transacao do voto (sem commit)."""
+    entry = VoteOutbox(
+        tracking_id=uuid.uuid4().hex,
+        voto=vote,
+        eleicao_id=vote.eleicao_id,
+        candidate_index=candidate_index,
+        status=STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=_utcnow(),
+    )
+    db.session.add(entry)
+    return entry
+
+
+def serialize_outbox_entry(entry: VoteOutbox) -> dict:
+    return {
+        "tracking_id": entry.tracking_id,
+        "voto_id": entry.voto_id,
+        "eleicao_id": entry.eleicao_id,
+        "status": entry.status,
+        "attempts": entry.attempts,
+        "blockchain_tx": entry.tx_hash,
+        "batch_position": entry.voto.batch_position if entry.voto is not None else None,
+        "last_error": entry.last_error,
+        "next_attempt_at": _serialize_datetime(entry.next_attempt_at),
+        "created_at": _serialize_datetime(entry.created_at),
+        "updated_at": _serialize_datetime(entry.updated_at),
+    }
+
+
+def get_vote_status(tracking_id: str) -> dict:
+    entry = db.session.execute(
+        select(VoteOutbox).where(VoteOutbox.tracking_id == tracking_id)
+    ).scalar_one_or_none()
+    if entry is None:
+        abort(404, description="Vote tracking id not found")
+    return serialize_outbox_entry(entry)
+
+
+class VoteOutboxProcessor:
+    """Envia ao contrato os votos pendentes do outbox, com retentativas e dead-letter.
+
+    As linhas sao reivindicadas com UPDATE condicional e um lease, entao varios
+    workers (threads ou processos) podem rodar em paralelo sem enviar o mesmo
+    voto duas vezes. O envio nao espera a mineracao: o hash e gravado como
+    ``submitted`` e o recibo e conferido nas rodadas seguintes. Antes de cada
+    envio o voto recebe uma ``submission_ref`` (UPDATE condicional) que vai
+    junto para ``owner_transactions``; o hash e confirmado logo apos o envio,
+    e um envio cujo hash se perdeu e reconciliado em vez de repetido.
+
+    Com ``onchain_batch_size`` > 1 os votos novos sao agrupados em uma chamada
+    ``batchVote``, enviada quando ha N votos na fila ou o mais antigo espera ha
+    ``batch_max_wait_ms``. Votos que ja falharam sao reenviados sozinhos para
+    que um item invalido nao derrube o lote inteiro de novo. Se o contrato
+    implantado nao tem ``batchVote`` (artefato ainda nao recompilado), os votos
+    seguem um a um com ``vote()``.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int | None = None,
+        backoff_seconds: float | None = None,
+        max_backoff_seconds: float | None = None,
+        lease_seconds: float | None = None,
+        receipt_poll_seconds: float | None = None,
+        receipt_timeout_seconds: float | None = None,
+        onchain_batch_size: int | None = None,
+        batch_max_wait_ms: float | None = None,
+        submit: Callable[..., Optional[str]] = submit_vote_onchain,
+        submit_batch: Callable[..., Optional[str]] = submit_batch_vote_onchain,
+        fetch_receipt: Callable[[str], object] = fetch_transaction_receipt,
+        find_submission: Optional[Callable[[str], Optional[str]]] = None,
+        batch_supported: Callable[[], bool] = supports_batch_vote,
+    ) -> None:
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv(_MAX_ATTEMPTS_ENV, _DEFAULT_MAX_ATTEMPTS))
+        self.backoff_seconds = (
+            backoff_seconds if backoff_seconds is not None else float(os.getenv(_BACKOFF_ENV, _DEFAULT_BACKOFF_SECONDS))
+        )
+        self.max_backoff_seconds = (
+            max_backoff_seconds
+            if max_backoff_seconds is not None
+            else float(os.getenv(_MAX_BACKOFF_ENV, _DEFAULT_MAX_BACKOFF_SECONDS))
+        )
+        self.lease_seconds = lease_seconds if lease_seconds is not None else float(os.getenv(_LEASE_ENV, _DEFAULT_LEASE_SECONDS))
+        self.receipt_poll_seconds = (
+            receipt_poll_seconds
+            if receipt_poll_seconds is not None
+            else float(os.getenv(_RECEIPT_POLL_ENV, _DEFAULT_RECEIPT_POLL_SECONDS))
+        )
+        self.receipt_timeout_seconds = (
+            receipt_timeout_seconds
+            if receipt_timeout_seconds is not None
+            else float(os.getenv(_RECEIPT_TIMEOUT_ENV, _DEFAULT_RECEIPT_TIMEOUT_SECONDS))
+        )
+        self.onchain_batch_size = (
+            onchain_batch_size
+            if onchain_batch_size is not None
+            else int(os.getenv(_ONCHAIN_BATCH_SIZE_ENV, _DEFAULT_ONCHAIN_BATCH_SIZE))
+        )
+        self.batch_max_wait_ms = (
+            batch_max_wait_ms
+            if batch_max_wait_ms is not None
+            else float(os.getenv(_BATCH_MAX_WAIT_ENV, _DEFAULT_BATCH_MAX_WAIT_MS))
+        )
+        self._submit = submit
+        self._submit_batch = submit_batch
+        self._fetch_receipt = fetch_receipt
+        self._find_submission = find_submission or get_nonce_manager().find_by_reference
+        self._batch_supported = batch_supported
+        self._batch_support: Optional[bool] = None
+
+    @property
+    def batching(self) -> bool:
+        if self.onchain_batch_size <= 1:
+            return False
+        if self._batch_support is None:
+            try:
+                self._batch_support = bool(self._batch_supported())
+            except Exception as exc:  # pragma: no cover - node fora do ar: tenta de novo na proxima rodada
+                logger.warning("Could not check batchVote support: %s", exc)
+                return False
+            if not self._batch_support:
+                logger.warning(
+                    "VOTE_ONCHAIN_BATCH_SIZE=%s ignored: deployed contract has no batchVote; sending vote() per entry",
+                    self.onchain_batch_size,
+                )
+        return self._batch_support
+
+    def backoff_delay(self, attempts: int) -> float:
+        delay = min(self.backoff_seconds * (2 ** max(attempts - 1, 0)), self.max_backoff_seconds)
+        # Jitter evita que varios votos com falha voltem todos no mesmo instante.
+        return delay * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def _claimable(now: datetime, include_unsubmitted: bool = True):
+        due = and_(
+            VoteOutbox.status.in_((STATUS_PENDING, STATUS_SUBMITTED)),
+            VoteOutbox.next_attempt_at <= now,
+        )
+        if not include_unsubmitted:
+            due = and_(due, VoteOutbox.tx_hash.isnot(None))
+        return or_(due, and_(VoteOutbox.status == STATUS_PROCESSING, VoteOutbox.locked_until < now))
+
+    def batch_ready(self, now: datetime | None = None) -> bool:
+        """Ha votos novos suficientes (ou esperando ha tempo suficiente) para um lote?"""
+        if not self.batching:
+            return True
+        now = now or _utcnow()
+        count, oldest = db.session.execute(
+            select(func.count(VoteOutbox.id), func.min(VoteOutbox.created_at)).where(
+                VoteOutbox.status == STATUS_PENDING,
+                VoteOutbox.tx_hash.is_(None),
+                VoteOutbox.next_attempt_at <= now,
+            )
+        ).one()
+        if not count:
+            return False
+        if count >= self.onchain_batch_size:
+            return True
+        return _normalize_dt(oldest) <= now - timedelta(milliseconds=self.batch_max_wait_ms)
+
+    def claim(self, limit: int, include_unsubmitted: bool = True) -> list[int]:
+        now = _utcnow()
+        ids = list(
+            db.session.execute(
+                select(VoteOutbox.id)
+                .where(self._claimable(now, include_unsubmitted))
+                .order_by(VoteOutbox.next_attempt_at.asc(), VoteOutbox.id.asc())
+                .limit(limit)
+            ).scalars()
+        )
+        claimed: list[int] = []
+        for entry_id in ids:
+            result = db.session.execute(
+                update(VoteOutbox)
+                .where(VoteOutbox.id == entry_id, self._claimable(now, include_unsubmitted))
+                .values(status=STATUS_PROCESSING, locked_until=now + timedelta(seconds=self.lease_seconds))
+            )
+            if result.rowcount:
+                claimed.append(entry_id)
+        db.session.commit()
+        return claimed
+
+    def run_once(self, limit: int) -> int:
+        claimed = self.claim(limit, include_unsubmitted=self.batch_ready())
+        if not claimed:
+            return 0
+        entries = list(
+            db.session.execute(
+                select(VoteOutbox).where(VoteOutbox.id.in_(claimed)).order_by(VoteOutbox.id.asc())
+            ).scalars()
+        )
+        try:
+            self._process(entries)
+            for entry in entries:
+                entry.locked_until = None
+            db.session.commit()
+        except Exception as exc:  # pragma: no cover - leases expire and the rows are claimed again
+            db.session.rollback()
+            logger.error("Vote outbox batch %s failed: %s", claimed, exc)
+            return 0
+        return len(entries)
+
+    def _process(self, entries: list[VoteOutbox]) -> None:
+        receipts: dict[str, object] = {}
+        unsubmitted: list[VoteOutbox] = []
+        for entry in entries:
+            if entry.tx_hash:
+                self._check_receipt(entry, receipts)
+            else:
+                unsubmitted.append(entry)
+        if not self.batching:
+            for entry in unsubmitted:
+                self._send([entry], batch=False)
+            return
+        fresh = [entry for entry in unsubmitted if entry.attempts == 0]
+        retries = [entry for entry in unsubmitted if entry.attempts > 0]
+        for start in range(0, len(fresh), self.onchain_batch_size):
+            self._send(fresh[start:start + self.onchain_batch_size], batch=True)
+        for entry in retries:
+            self._send([entry], batch=True)
+
+    def _reserve(self, entries: list[VoteOutbox], batch: bool) -> list[VoteOutbox]:
+        """Reserva o envio de cada voto com UPDATE condicional em ``submission_ref``.
+
+        Um voto que ja tinha referencia pode ter ido a rede sem o hash chegar ao
+        outbox (queda, erro no commit, lease vencido); se ``owner_transactions``
+        tem a transacao, o hash e adotado em vez de reenviar.
+        """
+        reference = uuid.uuid4().hex
+        ready: list[VoteOutbox] = []
+        for entry in entries:
+            previous = entry.submission_ref
+            if previous is not None:
+                tx_hash = self._find_submission(previous)
+                if tx_hash is not None:
+                    self._adopt_submission(entry, previous, tx_hash, batch)
+                    continue
+            owned = VoteOutbox.submission_ref.is_(None) if previous is None else VoteOutbox.submission_ref == previous
+            result = db.session.execute(
+                update(VoteOutbox)
+                .where(VoteOutbox.id == entry.id, owned)
+                .values(
+                    submission_ref=reference,
+                    locked_until=_utcnow() + timedelta(seconds=self.lease_seconds),
+                )
+            )
+            if result.rowcount:
+                ready.append(entry)
+        db.session.commit()
+        return ready
+
+    def _adopt_submission(self, entry: VoteOutbox, reference: str, tx_hash: str, batch: bool) -> None:
+        logger.warning("Vote outbox entry %s reconciled with transaction %s", entry.id, tx_hash)
+        self._mark_submitted(entry, tx_hash)
+        if batch:
+            same_batch = db.session.execute(
+                select(VoteOutbox.id).where(VoteOutbox.submission_ref == reference).order_by(VoteOutbox.id.asc())
+            ).scalars().all()
+            entry.voto.batch_tx_hash = tx_hash
+            entry.voto.batch_position = same_batch.index(entry.id)
+
+    def _send(self, entries: list[VoteOutbox], batch: bool) -> None:
+        entries = self._reserve(entries, batch)
+        if not entries:
+            return
+        reference = entries[0].submission_ref
+        indices = [entry.candidate_index for entry in entries]
+        for entry in entries:
+            entry.attempts += 1
+        error: Optional[str] = None
+        try:
+            if batch:
+                tx_hash = self._submit_batch(indices, reference=reference)
+            else:
+                tx_hash = self._submit(indices[0], reference=reference)
+        except AmbiguousSubmissionError as exc:
+            # Pode ter chegado ao no: acompanha o recibo, nunca reenvia.
+            tx_hash = exc.tx_hash
+            error = str(exc)
+        except Exception as exc:
+            for entry in entries:
+                self._fail(entry, str(exc))
+            db.session.commit()
+            return
+        if tx_hash is None:
+            for entry in entries:
+                self._fail(entry, "Blockchain is not configured")
+            db.session.commit()
+            return
+        for position, entry in enumerate(entries):
+            self._mark_submitted(entry, tx_hash)
+            entry.last_error = error
+            if batch:
+                entry.voto.batch_tx_hash = tx_hash
+                entry.voto.batch_position = position
+        # Cada envio e gravado no proprio commit, sem esperar o restante da rodada.
+        db.session.commit()
+
+    def _mark_submitted(self, entry: VoteOutbox, tx_hash: str) -> None:
+        entry.tx_hash = tx_hash
+        entry.submitted_at = _utcnow()
+        entry.status = STATUS_SUBMITTED
+        entry.last_error = None
+        entry.next_attempt_at = _utcnow() + timedelta(seconds=self.receipt_poll_seconds)
+
+    def _check_receipt(self, entry: VoteOutbox, receipts: dict[str, object]) -> None:
+        # Votos do mesmo lote compartilham o hash: uma consulta ao no por transacao.
+        if entry.tx_hash not in receipts:
+            try:
+                receipts[entry.tx_hash] = self._fetch_receipt(entry.tx_hash)
+            except Exception as exc:
+                receipts[entry.tx_hash] = exc
+        receipt = receipts[entry.tx_hash]
+        if isinstance(receipt, Exception):
+            entry.status = STATUS_SUBMITTED
+            entry.last_error = str(receipt)
+            entry.next_attempt_at = _utcnow() + timedelta(seconds=self.receipt_poll_seconds)
+            return
+        if receipt is None:
+            submitted_at = _normalize_dt(entry.submitted_at or entry.created_at)
+            if (_utcnow() - submitted_at).total_seconds() >= self.receipt_timeout_seconds:
+                # Reenviar poderia contar o voto duas vezes; fica para revisao manual.
+                entry.status = STATUS_DEAD
+                entry.last_error = f"No receipt for {entry.tx_hash} after {self.receipt_timeout_seconds:.0f}s"
+                return
+            entry.status = STATUS_SUBMITTED
+            entry.next_attempt_at = _utcnow() + timedelta(seconds=self.receipt_poll_seconds)
+            return
+        if receipt.get("status") == 1:
+            entry.status = STATUS_CONFIRMED
+            entry.last_error = None
+            # Pode ser o hash da transacao que substituiu a original com taxas maiores.
+            mined_hash = receipt.get("transactionHash")
+            if mined_hash is not None:
+                entry.tx_hash = mined_hash if isinstance(mined_hash, str) else mined_hash.hex()
+                if entry.voto.batch_tx_hash is not None:
+                    entry.voto.batch_tx_hash = entry.tx_hash
+            return
+        # Transacao revertida: nada foi contado on-chain, entao e seguro reenviar.
+        entry.tx_hash = None
+        entry.submission_ref = None
+        entry.submitted_at = None
+        entry.voto.batch_tx_hash = None
+        entry.voto.batch_position = None
+        self._fail(entry, "Transaction reverted on-chain")
+
+    def _fail(self, entry: VoteOutbox, error: str) -> None:
+        entry.last_error = error
+        if entry.attempts >= self.max_attempts:
+            entry.status = STATUS_DEAD
+            logger.error("Vote outbox entry %s dead-lettered after %s attempts: %s", entry.id, entry.attempts, error)
+            return
+        entry.status = STATUS_PENDING
+        entry.next_attempt_at = _utcnow() + timedelta(seconds=self.backoff_delay(entry.attempts))
+        logger.warning("Vote outbox entry %s attempt %s failed: %s", entry.id, entry.attempts, error)
+
+
+class VoteOutboxWorker:
+    """Threads em segundo plano que drenam o outbox de votos dentro do contexto da app."""
+
+    def __init__(
+        self,
+        app: Flask,
+        poll_seconds: float | None = None,
+        batch_size: int | None = None,
+        workers: int | None = None,
+        processor: VoteOutboxProcessor | None = None,
+    ) -> None:
+        self.app = app
+        self.poll_seconds = poll_seconds if poll_seconds is not None else float(os.getenv(_POLL_ENV, _DEFAULT_POLL_SECONDS))
+        self.batch_size = batch_size if batch_size is not None else int(os.getenv(_BATCH_SIZE_ENV, _DEFAULT_BATCH_SIZE))
+        self.workers = workers if workers is not None else int(os.getenv(_WORKERS_ENV, _DEFAULT_WORKERS))
+        self.processor = processor or VoteOutboxProcessor()
+        if self.processor.batching:
+            # Um lote cheio cabe em uma rodada e o prazo T do lote parcial e respeitado.
+            self.batch_size = max(self.batch_size, self.processor.onchain_batch_size)
+            self.poll_seconds = min(self.poll_seconds, self.processor.batch_max_wait_ms / 1000)
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def run_once(self) -> int:
+        with self.app.app_context():
+            try:
+                return self.processor.run_once(self.batch_size)
+            except Exception as exc:  # pragma: no cover - keep the worker alive on transient DB errors
+                logger.error("Vote outbox worker failed: %s", exc)
+                return 0
+
+    def start(self) -> None:
+        if self._threads or self.poll_seconds <= 0:
+            return
+        for index in range(max(self.workers, 1)):
+            thread = threading.Thread(target=self._run, name=f"vote-outbox-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=self.poll_seconds)
+        self._threads = []
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Lote cheio indica fila acumulada: segue drenando sem esperar.
+            if self.run_once() < self.batch_size:
+                self._stop.wait(self.poll_seconds)
+
+
+def ensure_vote_outbox_worker(app: Flask) -> Optional[VoteOutboxWorker]:
+    """Inicia os workers do outbox uma unica vez por processo quando o modo async esta ativo."""
+    if app.config.get("TESTING") or not is_async_vote_mode():
+        return None
+    worker = app.extensions.get(_EXTENSION_KEY)
+    if worker is not None:
+        return worker
+    with _START_LOCK:
+        worker = app.extensions.get(_EXTENSION_KEY)
+        if worker is None:
+            worker = VoteOutboxWorker(app)
+            app.extensions[_EXTENSION_KEY] = worker
+            worker.start()
+    return worker
+
+
+__all__ = [
+    "STATUS_CONFIRMED",
+    "STATUS_DEAD",
+    "STATUS_PENDING",
+    "STATUS_PROCESSING",
+    "STATUS_SUBMITTED",
+    "VoteOutboxProcessor",
+    "VoteOutboxWorker",
+    "enqueue_vote",
+    "ensure_vote_outbox_worker",
+    "get_vote_status",
+    "is_async_vote_mode",
+    "serialize_outbox_entry",
+]
@@ -4,19 +4,26 @@ import logging
 from typing import Optional
 
 from flask import abort
-from sqlalchemy import func, select
+from sqlalchemy import and_, func, select
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from werkzeug.exceptions import HTTPException
 
 from dtos.vote_dto import CastVoteDTO
 from models import Candidato, Eleicao, Voto, db
-from services.blockchain_integration import (
-    is_blockchain_enabled,
-    record_vote_onchain,
-    verify_transaction_on_chain,
-)
-from services.candidate_service import ensure_candidate_indices
+from services.blockchain_integration import is_blockchain_enabled, record_vote_onchain
+from services.candidate_service import resolve_candidate_index
 from services.election_service import serialize_election
+from services.receipt_cache import verify_transaction
+from services.results_cache import CachedResults, results_cache
+from services.results_stream import results_broadcaster
+from services.vote_group_commit import vote_group_committer
+from services.vote_counters import (
+    candidate_vote_total,
+    candidate_vote_totals,
+    election_vote_total,
+    increment_vote_counter,
+)
+from services.vote_outbox import enqueue_vote, is_async_vote_mode
 
 
 logger = logging.getLogger(__name__)
@@ -39,33 +46,52 @@ def _sync_vote_on_blockchain(candidate_index: int) -> str | None:
     return receipt.transactionHash.hex()
 
 
-def register_vote(election_id: int, dto: CastVoteDTO) -> dict:
-    election: Optional[Eleicao] = db.session.get(Eleicao, election_id)
-    if election is None:
+def _load_vote_target(election_id: int, candidate_id: int):
+    """Eleicao e candidato validados em uma unica leitura (LEFT JOIN pelo candidato)."""
+    row = db.session.execute(
+        select(Eleicao.ativa, Eleicao.data_inicio, Candidato.id.label("candidato_id"))
+        .select_from(Eleicao)
+        .outerjoin(Candidato, and_(Candidato.id == candidate_id, Candidato.eleicao_id == Eleicao.id))
+        .where(Eleicao.id == election_id)
+    ).first()
+    if row is None:
         abort(404, description="Election not found")
-    if not election.ativa:
+    if not row.ativa:
         abort(400, description="Election is not active")
-
-    candidate: Optional[Candidato] = db.session.get(Candidato, dto.candidato_id)
-    if candidate is None or candidate.eleicao_id != election_id:
+    if row.candidato_id is None:
         abort(404, description="Candidate not found for this election")
+    return row
 
-    # Garante que o índice 0-based utilizado pelo contrato esteja alinhado com o banco local
-    index_map = ensure_candidate_indices(election_id)
-    candidate_index = index_map.get(candidate.id)
-    if candidate_index is None:
-        logger.error(
-            "Unable to resolve blockchain index for candidate_id=%s election_id=%s",
-            candidate.id,
-            election_id,
-        )
-        abort(500, description="Failed to reconcile candidate index for blockchain sync")
-
-    vote = Voto(
-        eleicao_id=election_id,
-        candidato_id=candidate.id,
-        hash_blockchain=_normalize_hash(dto.hash_blockchain),
-    )
+
+def register_vote(election_id: int, dto: CastVoteDTO) -> dict:
+    """Registra o voto dentro de um orcamento fixo de comandos SQL.
+
+    Sem blockchain: leitura de validacao, INSERT do voto, upsert do contador e
+    a soma do candidato, lida na propria transacao; nada e recarregado apos o
+    commit. O modo async acrescenta o INSERT do outbox.
+    """
+    target = _load_vote_target(election_id, dto.candidato_id)
+    candidate_id = target.candidato_id
+    vote_hash = _normalize_hash(dto.hash_blockchain)
+
+    blockchain_enabled = is_blockchain_enabled()
+    candidate_index = None
+    if blockchain_enabled:
+        # Índice 0-based do contrato, resolvido pelo mapa em cache da eleição
+        candidate_index = resolve_candidate_index(election_id, target.data_inicio, candidate_id)
+        if candidate_index is None:
+            logger.error(
+                "Unable to resolve blockchain index for candidate_id=%s election_id=%s",
+                candidate_id,
+                election_id,
+            )
+            abort(500, description="Failed to reconcile candidate index for blockchain sync")
+
+    async_onchain = blockchain_enabled and is_async_vote_mode()
+    if vote_group_committer.enabled and (async_onchain or not blockchain_enabled):
+        return _register_vote_in_group(election_id, candidate_id, vote_hash, candidate_index)
+
+    vote = Voto(eleicao_id=election_id, candidato_id=candidate_id, hash_blockchain=vote_hash)
     db.session.add(vote)
 
     try:
@@ -73,9 +99,21 @@ def register_vote(election_id: int, dto: CastVoteDTO) -> dict:
     except IntegrityError:
         db.session.rollback()
         abort(409, description="Vote already registered")
-
-    receipt_hash = _sync_vote_on_blockchain(candidate_index)
-
+    vote_id = vote.id
+    increment_vote_counter(candidate_id, election_id)
+
+    # No modo async o envio on-chain fica no outbox, gravado na mesma transacao do voto.
+    outbox_entry = None
+    receipt_hash = None
+    if async_onchain:
+        outbox_entry = enqueue_vote(vote, candidate_index)
+    elif blockchain_enabled:
+        receipt_hash = _sync_vote_on_blockchain(candidate_index)
+    # Lido antes do commit: inclui este voto e dispensa recarregar o voto depois.
+    total_votes_candidate = candidate_vote_total(candidate_id)
+    outbox_fields = (outbox_entry.tracking_id, outbox_entry.status) if outbox_entry is not None else None
+
+    commit_started_at = results_cache.now()
     try:
         db.session.commit()
     except HTTPException:
@@ -85,19 +123,43 @@ def register_vote(election_id: int, dto: CastVoteDTO) -> dict:
         db.session.rollback()
         logger.error("Failed to register vote: %s", exc)
         raise
+    results_cache.record_vote(election_id, candidate_id, commit_started_at)
+    results_broadcaster.notify()
 
-    db.session.refresh(vote)
-    vote_total_stmt = select(func.count(Voto.id)).where(Voto.candidato_id == candidate.id)
-    total_votes_candidate = int(db.session.execute(vote_total_stmt).scalar_one() or 0)
     payload = {
-        "id": vote.id,
+        "id": vote_id,
         "eleicao_id": election_id,
-        "candidato_id": candidate.id,
-        "hash_blockchain": vote.hash_blockchain,
+        "candidato_id": candidate_id,
+        "hash_blockchain": vote_hash,
         "total_votos_candidato": total_votes_candidate,
     }
     if receipt_hash:
         payload["blockchain_tx"] = receipt_hash
+    if outbox_fields is not None:
+        payload["tracking_id"], payload["blockchain_status"] = outbox_fields
+    return payload
+
+
+def _register_vote_in_group(
+    election_id: int,
+    candidate_id: int,
+    vote_hash: str,
+    candidate_index: Optional[int],
+) -> dict:
+    """Voto gravado pelo commit em grupo do worker (VOTE_GROUP_COMMIT_WINDOW_MS)."""
+    written = vote_group_committer.submit(election_id, candidate_id, vote_hash, candidate_index)
+    if written is None:
+        abort(409, description="Vote already registered")
+    payload = {
+        "id": written.id,
+        "eleicao_id": election_id,
+        "candidato_id": candidate_id,
+        "hash_blockchain": vote_hash,
+        "total_votos_candidato": candidate_vote_total(candidate_id),
+    }
+    if written.tracking_id is not None:
+        payload["tracking_id"] = written.tracking_id
+        payload["blockchain_status"] = written.blockchain_status
     return payload
 
 
@@ -106,44 +168,39 @@ def get_election_results(election_id: int) -> dict:
     if election is None:
         abort(404, description="Election not found")
 
-    stmt = (
-        select(
-            Candidato.id,
-            Candidato.nome,
-            func.count(Voto.id).label("total"),
-        )
-        .outerjoin(Voto, Voto.candidato_id == Candidato.id)
-        .where(Candidato.eleicao_id == election_id)
-        .group_by(Candidato.id)
-        .order_by(func.count(Voto.id).desc(), Candidato.id.asc())
+    candidates = db.session.execute(
+        select(Candidato.id, Candidato.nome).where(Candidato.eleicao_id == election_id)
+    ).all()
+    totals = candidate_vote_totals(election_id)
+    rows = sorted(
+        ((candidate.id, candidate.nome, totals.get(candidate.id, 0)) for candidate in candidates),
+        key=lambda row: (-row[2], row[0]),
     )
-    rows = list(db.session.execute(stmt))
-    total_votes = sum(int(row.total or 0) for row in rows)
     return {
         "election": serialize_election(election),
         "results": [
             {
-                "id": row.id,
-                "nome": row.nome,
-                "votos": int(row.total or 0),
+                "id": candidate_id,
+                "nome": nome,
+                "votos": votes,
             }
-            for row in rows
+            for candidate_id, nome, votes in rows
         ],
-        "total_votos": total_votes,
+        "total_votos": sum(votes for _, _, votes in rows),
     }
 
 
+def get_cached_election_results(election_id: int) -> tuple[CachedResults, bool]:
+    """Resultados do cache por eleicao; o booleano indica se veio do cache."""
+    return results_cache.get_or_build(election_id, lambda: get_election_results(election_id))
+
+
 def get_election_status(election_id: int) -> dict:
     election: Optional[Eleicao] = db.session.get(Eleicao, election_id)
     if election is None:
         abort(404, description="Election not found")
 
-    total_votes = (
-        db.session.query(func.count(Voto.id))
-        .filter_by(eleicao_id=election_id)
-        .scalar()
-        or 0
-    )
+    total_votes = election_vote_total(election_id)
     total_candidates = (
         db.session.query(func.count(Candidato.id))
         .filter_by(eleicao_id=election_id)
@@ -165,12 +222,13 @@ def verify_vote_on_chain(tx_hash: str) -> dict:
             "status": "error",
             "message": "Transaction hash is required",
         }
-    return verify_transaction_on_chain(cleaned)
+    return verify_transaction(cleaned)
 
 
 __all__ = [
     "register_vote",
     "get_election_results",
+    "get_cached_election_results",
     "get_election_status",
     "verify_vote_on_chain",
 ]
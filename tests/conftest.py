@@ -11,6 +11,12 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from app import app
 from extensions import limiter
 from models import db
+from services.blockchain_integration import blockchain_client
+from services.candidate_service import candidate_index_cache
+from services.fee_oracle import fee_oracle
+from services.receipt_cache import receipt_cache
+from services.results_cache import results_cache
+from services.results_stream import results_broadcaster
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -49,5 +55,11 @@ def client():
             db.session.execute(table.delete())
         db.session.commit()
         app.extensions.pop("session_store", None)
+        candidate_index_cache.clear()
+        results_cache.clear()
+        results_broadcaster.clear()
+        blockchain_client.invalidate()
+        receipt_cache.clear()
+        fee_oracle.clear()
     with app.test_client() as test_client:
         yield test_client
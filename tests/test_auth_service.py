@@ -1,7 +1,10 @@
 import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
 
 from services.auth_service import generate_nonce_response, logout_response, verify_signature_response
 from services.session_service import SessionStore
+from services.signature_pool import SignaturePool, recover_message_signer
 
 
 class DummyAccount:
@@ -78,3 +81,48 @@ def test_logout_response_clears_nonce(client):
         assert response.status == 200
         assert response.payload["success"] is True
         assert store.peek_nonce(address) is None
+
+
+def _signed_nonce(nonce: str = "pool-nonce"):
+    account = Account.create()
+    signature = account.sign_message(encode_defunct(text=nonce)).signature.hex()
+    return account.address, nonce, signature
+
+
+def test_signature_pool_disabled_recovers_inline():
+    address, nonce, signature = _signed_nonce()
+    pool = SignaturePool(size=0)
+    assert pool.enabled is False
+    assert pool.recover(nonce, signature) == address
+    assert pool.stats()["offloaded"] == 0
+
+
+def test_signature_pool_offloads_and_batches():
+    address, nonce, signature = _signed_nonce()
+    pool = SignaturePool(size=1)
+    try:
+        assert pool.recover(nonce, signature) == address
+        assert pool.stats()["offloaded"] == 1
+
+        results = pool.batch_recover([(nonce, signature), (nonce, "0xdeadbeef")])
+        assert results[0] == address
+        assert isinstance(results[1], Exception)
+
+        with pytest.raises(Exception):
+            pool.recover(nonce, "0xdeadbeef")
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.usefixtures("client")
+def test_verify_signature_response_uses_signature_pool(client, monkeypatch):
+    address, nonce, signature = _signed_nonce()
+    pool = SignaturePool(size=1)
+    pool.recover = lambda message, sig: recover_message_signer(message, sig)
+    monkeypatch.setattr("services.auth_service.get_signature_pool", lambda: pool)
+    with client.application.app_context():
+        store = SessionStore()
+        store.save_nonce(address, nonce)
+        response = verify_signature_response(address=address, signature=signature, store=store, web3=DummyWeb3())
+        assert response.status == 200
+        assert response.payload["address"] == address
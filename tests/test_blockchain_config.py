@@ -1,6 +1,10 @@
+import json
+import time
+
 import pytest
+import requests
 
-from config.BlockChain import get_web3, resolve_provider_url
+from config.BlockChain import PooledHTTPProvider, get_web3, resolve_provider_url
 
 
 def setup_function():
@@ -32,3 +36,213 @@ def test_get_web3_uses_cached_provider(monkeypatch):
     first = get_web3()
     monkeypatch.setenv("INFURA_URL", "https://other.com")
     assert get_web3() is first
+
+
+def test_blockchain_client_loads_config_once_until_invalidated(monkeypatch, tmp_path):
+    from services import blockchain_integration
+    from services.blockchain_integration import BlockchainClient
+
+    artifact = tmp_path / "AthenaElection.json"
+    artifact.write_text('{"abi": [{"type": "function", "name": "vote"}]}', encoding="utf-8")
+    reads: list[int] = []
+    original = blockchain_integration._load_artifact
+
+    def counting_load():
+        reads.append(1)
+        return original()
+
+    monkeypatch.setattr(blockchain_integration, "_load_artifact", counting_load)
+    monkeypatch.delenv("CONTRACT_ADDRESS", raising=False)
+    monkeypatch.setenv("CONTRACT_OWNER_PRIVATE_KEY", "0x" + "11" * 32)
+    monkeypatch.setenv("CONTRACT_ABI_PATH", str(artifact))
+
+    client = BlockchainClient(check_seconds=0)
+    assert not client.enabled
+    assert not client.enabled
+    assert reads == []
+
+    monkeypatch.setenv("CONTRACT_ADDRESS", "0x" + "ab" * 20)
+    assert not client.enabled  # mudanca de env so vale depois de invalidate
+    client.invalidate()
+    assert client.enabled
+    assert client.enabled
+    assert reads == [1]
+    assert client.config.abi == [{"type": "function", "name": "vote"}]
+
+
+def test_blockchain_client_reloads_when_artifact_changes(monkeypatch, tmp_path):
+    import os
+
+    from services.blockchain_integration import BlockchainClient
+
+    artifact = tmp_path / "AthenaElection.json"
+    artifact.write_text('{"abi": [{"name": "vote"}]}', encoding="utf-8")
+    monkeypatch.setenv("CONTRACT_ADDRESS", "0x" + "ab" * 20)
+    monkeypatch.setenv("CONTRACT_OWNER_PRIVATE_KEY", "0x" + "11" * 32)
+    monkeypatch.setenv("CONTRACT_ABI_PATH", str(artifact))
+
+    client = BlockchainClient(check_seconds=0.001)
+    assert client.config.abi == [{"name": "vote"}]
+    artifact.write_text('{"abi": [{"name": "vote"}, {"name": "batchVote"}]}', encoding="utf-8")
+    stat = artifact.stat()
+    os.utime(artifact, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    time.sleep(0.01)
+
+    assert [item["name"] for item in client.config.abi] == ["vote", "batchVote"]
+    assert client.reloads == 2
+
+
+def _pool_with(responses: dict, **kwargs):
+    provider = PooledHTTPProvider(list(responses), **{"cooldown_seconds": 60, **kwargs})
+    calls: list[str] = []
+
+    def fake_post(endpoint, data):
+        calls.append(endpoint.url)
+        behaviour = responses[endpoint.url]
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        delay, result = behaviour
+        time.sleep(delay)
+        request = json.loads(data)
+        return json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": result}).encode()
+
+    provider._post = fake_post
+    return provider, calls
+
+
+def test_pooled_provider_fails_over_and_ranks_by_latency():
+    provider, calls = _pool_with(
+        {
+            "https://down.example/v3/secret": requests.ConnectionError("refused"),
+            "https://slow.example": (0.02, "0x2"),
+            "https://fast.example": (0.0, "0x1"),
+        }
+    )
+
+    for _ in range(4):
+        assert provider.make_request("eth_blockNumber", [])["result"] in {"0x1", "0x2"}
+    assert provider.make_request("eth_blockNumber", [])["result"] == "0x1"
+    assert calls.count("https://down.example/v3/secret") == 1
+
+    stats = {item["url"]: item for item in provider.stats()}
+    assert stats["https://down.example"]["errors"] == 1
+    assert stats["https://down.example"]["healthy"] is False
+    assert "secret" not in str(provider.stats())
+    assert stats["https://fast.example"]["latency_ms"] < stats["https://slow.example"]["latency_ms"]
+
+
+def test_pooled_provider_hedges_only_idempotent_reads():
+    provider, calls = _pool_with(
+        {"https://stalled.example": (0.3, "0xstalled"), "https://backup.example": (0.0, "0xbackup")},
+        hedge_reads=True,
+        hedge_after_ms=20,
+    )
+
+    started = time.monotonic()
+    assert provider.make_request("eth_getTransactionReceipt", ["0xabc"])["result"] == "0xbackup"
+    assert time.monotonic() - started < 0.25
+    assert provider.hedged == 1
+
+    calls.clear()
+    provider.endpoints[1].latency_ms = 1000.0  # backup por ultimo no ranking
+    provider.endpoints[0].latency_ms = 1.0
+    assert provider.make_request("eth_sendRawTransaction", ["0x00"])["result"] == "0xstalled"
+    assert calls == ["https://stalled.example"]
+
+
+class _PreparedFunction:
+    def __init__(self) -> None:
+        self.estimates = 0
+
+    def build_transaction(self, params: dict) -> dict:
+        return {**params, "to": "0xcontract", "data": "0x0121b93f", "value": 0}
+
+    def estimate_gas(self, params: dict) -> int:
+        self.estimates += 1
+        return 50_000
+
+
+_FEE_HISTORY = {
+    "oldestBlock": "0x64",
+    "baseFeePerGas": ["0x3b9aca00", "0x3b9aca00", "0x77359400"],  # 1, 1 e 2 gwei (proximo bloco)
+    "gasUsedRatio": [0.5, 0.0],
+    "reward": [["0x5f5e100"], ["0x0"]],  # 0.1 gwei; o bloco vazio nao conta
+}
+
+
+def test_prepare_transaction_inputs_uses_one_batch_and_falls_back_when_rejected():
+    from types import SimpleNamespace
+
+    from services.blockchain_integration import blockchain_client, prepare_transaction_inputs
+    from services.fee_oracle import fee_oracle
+
+    batches: list[list[str]] = []
+    reject = {"value": False}
+
+    def make_batch_request(calls):
+        batches.append([method for method, _ in calls])
+        if reject["value"]:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "batch not supported"}}
+        results = {"eth_estimateGas": "0xc350", "eth_feeHistory": _FEE_HISTORY, "eth_chainId": "0x539"}
+        return [{"jsonrpc": "2.0", "id": index, "result": results[method]} for index, (method, _) in enumerate(calls)]
+
+    eth = SimpleNamespace(
+        gas_price=7,
+        chain_id=1337,
+        fee_history=lambda blocks, newest, percentiles: _FEE_HISTORY,
+    )
+    web3 = SimpleNamespace(eth=eth, provider=SimpleNamespace(make_batch_request=make_batch_request))
+    function = _PreparedFunction()
+    blockchain_client.invalidate()
+    fee_oracle.clear()
+
+    first = prepare_transaction_inputs(web3, function, "0xsender")
+    second = prepare_transaction_inputs(web3, function, "0xsender")
+    assert (first.gas, first.chain_id) == (50_000, 1337)
+    assert first.fees.max_priority_fee_per_gas == 10**8
+    assert first.fees.max_fee_per_gas == 2 * 2 * 10**9 + 10**8
+    assert first.fees.block == 101
+    assert second == first
+    assert batches == [
+        ["eth_estimateGas", "eth_feeHistory", "eth_chainId"],
+        ["eth_estimateGas"],
+    ]
+    assert function.estimates == 0
+
+    reject["value"] = True
+    fee_oracle.clear()
+    fallback = prepare_transaction_inputs(web3, function, "0xsender")
+    prepare_transaction_inputs(web3, function, "0xsender")
+    assert (fallback.gas, fallback.fees, fallback.chain_id) == (50_000, first.fees, 1337)
+    assert len(batches) == 3  # recusado uma vez, depois so chamadas unitarias
+    assert function.estimates == 2
+    blockchain_client.invalidate()
+    fee_oracle.clear()
+
+
+def test_fee_oracle_reuses_one_quote_per_block_and_falls_back_to_gas_price():
+    from types import SimpleNamespace
+
+    from services.fee_oracle import FeeOracle
+
+    requests_made: list[int] = []
+
+    def fee_history(blocks, newest, percentiles):
+        requests_made.append(blocks)
+        assert percentiles == [90.0]
+        return _FEE_HISTORY
+
+    oracle = FeeOracle(percentile=90, blocks=2, base_fee_multiplier=1.5, min_priority_gwei=0.5, ttl_seconds=60)
+    web3 = SimpleNamespace(eth=SimpleNamespace(fee_history=fee_history))
+    quote = oracle.quote(web3)
+    assert oracle.quote(web3) is quote
+    assert requests_made == [2]
+    assert quote.max_priority_fee_per_gas == 5 * 10**8  # piso acima da gorjeta observada
+    assert quote.max_fee_per_gas == 3 * 10**9 + 5 * 10**8
+
+    def missing(*_args):
+        raise ValueError("the method eth_feeHistory does not exist")
+
+    legacy = FeeOracle(ttl_seconds=60)
+    web3 = SimpleNamespace(eth=SimpleNamespace(fee_history=missing, gas_price=20), to_wei=lambda value, unit: 10**9)
+    assert legacy.quote(web3).max_fee_per_gas == 20 + 10**9
@@ -1,10 +1,12 @@
 import pytest
 
+from services.receipt_cache import receipt_cache
+
 
 @pytest.mark.usefixtures("client")
 def test_verify_blockchain_hash_success(client, monkeypatch):
     monkeypatch.setattr(
-        "routes.blockchain.verify_transaction_on_chain",
+        "routes.blockchain.verify_transaction",
         lambda h: {
             "verified": True,
             "status": "success",
@@ -23,7 +25,7 @@ def test_verify_blockchain_hash_success(client, monkeypatch):
 @pytest.mark.usefixtures("client")
 def test_verify_blockchain_hash_not_found(client, monkeypatch):
     monkeypatch.setattr(
-        "routes.blockchain.verify_transaction_on_chain",
+        "routes.blockchain.verify_transaction",
         lambda h: {"verified": False, "status": "not_found", "message": "missing"},
     )
 
@@ -34,10 +36,56 @@ def test_verify_blockchain_hash_not_found(client, monkeypatch):
 @pytest.mark.usefixtures("client")
 def test_verify_blockchain_hash_handles_error(client, monkeypatch):
     monkeypatch.setattr(
-        "routes.blockchain.verify_transaction_on_chain",
+        "routes.blockchain.verify_transaction",
         lambda h: {"verified": False, "status": "error", "message": "bad"},
     )
 
     response = client.get("/api/blockchain/verificar/0xerror")
     assert response.status_code == 400
     assert response.get_json()["status"] == "error"
+
+
+@pytest.mark.usefixtures("client")
+def test_verify_serves_finalized_receipts_without_the_provider(client, monkeypatch):
+    calls: list[str] = []
+    receipts = {"0xabc": {"status": 1, "blockNumber": 100, "gasUsed": 21000, "transactionHash": "0xABC"}}
+
+    def fake_fetch(tx_hash):
+        calls.append(tx_hash)
+        return receipts.get(tx_hash)
+
+    monkeypatch.setattr("services.receipt_cache.is_blockchain_enabled", lambda: True)
+    monkeypatch.setattr(receipt_cache, "_fetch_receipt", fake_fetch)
+    monkeypatch.setattr(receipt_cache, "_latest_block", lambda: 200)
+
+    first = client.get("/api/blockchain/verificar/0xABC")
+    receipt_cache.clear()  # outro worker: so a tabela
+    second = client.get("/api/blockchain/verificar/0xabc")
+    third = client.get("/api/blockchain/verificar/0xabc")
+
+    assert first.status_code == second.status_code == third.status_code == 200
+    assert first.get_json() == second.get_json() == third.get_json()
+    assert first.get_json()["transactionHash"] == "0xabc"
+    assert calls == ["0xabc"]
+
+    assert client.get("/api/blockchain/verificar/0xmissing").status_code == 404
+    assert client.get("/api/blockchain/verificar/0xmissing").status_code == 404
+    assert calls == ["0xabc", "0xmissing"]
+
+
+@pytest.mark.usefixtures("client")
+def test_verify_rechecks_receipts_without_enough_confirmations(client, monkeypatch):
+    calls: list[str] = []
+
+    def fake_fetch(tx_hash):
+        calls.append(tx_hash)
+        return {"status": 1, "blockNumber": 100, "gasUsed": 21000, "transactionHash": tx_hash}
+
+    monkeypatch.setattr("services.receipt_cache.is_blockchain_enabled", lambda: True)
+    monkeypatch.setattr(receipt_cache, "_fetch_receipt", fake_fetch)
+    monkeypatch.setattr(receipt_cache, "_latest_block", lambda: 101)
+    monkeypatch.setattr(receipt_cache, "negative_ttl", 0)
+
+    assert client.get("/api/blockchain/verificar/0xrecent").status_code == 200
+    assert client.get("/api/blockchain/verificar/0xrecent").status_code == 200
+    assert calls == ["0xrecent", "0xrecent"]
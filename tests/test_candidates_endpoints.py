@@ -376,3 +376,19 @@ def test_delete_candidate_removes_associated_votes(client, monkeypatch):
     with client.application.app_context():
         assert Candidato.query.count() == 0
         assert Voto.query.count() == 0
+
+
+def test_delete_candidate_reindexes_remaining_candidates(client, monkeypatch):
+    headers = _auth_headers(client, monkeypatch)
+    election = _create_election(client, headers)
+    first = _create_candidate(client, election["id"], headers, "Alice")
+    second = _create_candidate(client, election["id"], headers, "Bob")
+    assert second["blockchain_index"] == 1
+
+    delete_response = client.delete(f"/api/candidatos/{first['id']}", headers=headers)
+    assert delete_response.status_code == 204
+
+    with client.application.app_context():
+        remaining = db.session.get(Candidato, second["id"])
+        assert remaining.blockchain_index == 0
+        assert validate_candidate_indices(election["id"]) is True
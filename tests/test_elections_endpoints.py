@@ -224,3 +224,19 @@ def test_start_election_rejects_when_end_date_in_past(client, monkeypatch):
     response = client.post(f"/api/eleicoes/{election['id']}/start", headers=headers)
 
     assert response.status_code == 400
+
+
+def test_start_election_replays_response_for_repeated_idempotency_key(client, monkeypatch):
+    headers = _auth_headers(client, monkeypatch)
+    election = _create_election(client, headers)
+    keyed = {**headers, "Idempotency-Key": "start-retry-1"}
+
+    first = client.post(f"/api/eleicoes/{election['id']}/start", headers=keyed)
+    retry = client.post(f"/api/eleicoes/{election['id']}/start", headers=keyed)
+    fresh = client.post(f"/api/eleicoes/{election['id']}/start", headers=headers)
+
+    assert first.status_code == 200
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json == first.json
+    assert fresh.status_code == 400
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from models import OwnerNonce, OwnerTransaction, db
+from services import blockchain_integration
+from services.nonce_manager import NonceManager, bump_fee, is_nonce_conflict
+
+
+OWNER = "0x00000000000000000000000000000000000000Ab"
+
+
+class _FakeHash:
+    def __init__(self, value: str) -> None:
+        self._value = value
+
+    def hex(self) -> str:
+        return self._value
+
+
+class _FakeEth:
+    def __init__(self, pending: int = 0, latest: int = 0) -> None:
+        self.pending = pending
+        self.latest = latest
+        self.count_calls = 0
+        self.sent: list[dict] = []
+        self.send_errors: list[Exception] = []
+        self.gas_price = 10
+        self.chain_id = 1337
+
+    def get_transaction_count(self, address: str, block: str = "latest") -> int:
+        self.count_calls += 1
+        return self.pending if block == "pending" else self.latest
+
+    def send_raw_transaction(self, raw: dict) -> _FakeHash:
+        if self.send_errors:
+            raise self.send_errors.pop(0)
+        self.sent.append(raw)
+        self.pending = max(self.pending, raw["nonce"] + 1)
+        return _FakeHash(_signed_hash(raw))
+
+
+class _FakeFunction:
+    def estimate_gas(self, params: dict) -> int:
+        return 100
+
+    def build_transaction(self, params: dict) -> dict:
+        return {**params, "to": "0xcontract", "data": "0xdeadbeef", "value": 0}
+
+
+def _signed_hash(tx: dict) -> str:
+    return f"0xtx{tx['nonce']}-{tx['maxFeePerGas']}"
+
+
+def _sign(tx: dict) -> SimpleNamespace:
+    return SimpleNamespace(raw_transaction=dict(tx), hash=_FakeHash(_signed_hash(tx)))
+
+
+def _fake_chain(monkeypatch, eth: _FakeEth):
+    web3 = SimpleNamespace(eth=eth, to_wei=lambda value, unit: int(value))
+    account = SimpleNamespace(address=OWNER, sign_transaction=_sign)
+    monkeypatch.setattr(blockchain_integration, "_get_contract_and_account", lambda: (web3, object(), account))
+    monkeypatch.setattr(blockchain_integration, "is_blockchain_enabled", lambda: True)
+    return web3
+
+
+def test_allocate_hands_out_sequential_nonces_from_database(client):
+    eth = _FakeEth(pending=5)
+    web3 = SimpleNamespace(eth=eth)
+    manager = NonceManager()
+    with client.application.app_context():
+        assert [manager.allocate(web3, OWNER) for _ in range(3)] == [5, 6, 7]
+        assert eth.count_calls == 1
+        assert db.session.get(OwnerNonce, OWNER).next_nonce == 8
+
+        eth.pending = 12
+        assert manager.resync(web3, OWNER) == 12
+        assert manager.allocate(web3, OWNER) == 12
+
+
+def test_submit_transaction_resyncs_and_retries_on_nonce_too_low(client, monkeypatch):
+    eth = _FakeEth(pending=3)
+    _fake_chain(monkeypatch, eth)
+    with client.application.app_context():
+        manager = NonceManager()
+        manager.allocate(SimpleNamespace(eth=eth), OWNER)  # reserva 3 sem enviar
+        eth.pending = 6  # outra conta de servico ja usou os nonces 4 e 5 na rede
+        eth.send_errors.append(ValueError("nonce too low"))
+
+        _, tx_hash = blockchain_integration._submit_transaction(lambda contract: _FakeFunction())
+
+        assert eth.sent[-1]["nonce"] == 6
+        assert tx_hash == _signed_hash(eth.sent[-1])
+        record = db.session.execute(db.select(OwnerTransaction)).scalar_one()
+        assert (record.nonce, record.tx_hash, record.status) == (6, tx_hash, "pending")
+
+
+def test_resync_never_moves_the_counter_backwards(client):
+    eth = _FakeEth(pending=5)
+    web3 = SimpleNamespace(eth=eth)
+    manager = NonceManager()
+    with client.application.app_context():
+        for _ in range(3):
+            manager.allocate(web3, OWNER)  # 5, 6 e 7 reservados por outros workers
+        eth.pending = 5
+        assert manager.resync(web3, OWNER) == 8
+        assert manager.allocate(web3, OWNER) == 8
+
+
+def test_rejected_send_releases_nonce_for_next_transaction(client, monkeypatch):
+    eth = _FakeEth(pending=0)
+    _fake_chain(monkeypatch, eth)
+    with client.application.app_context():
+        eth.send_errors.append(ValueError("insufficient funds for gas * price + value"))
+        with pytest.raises(ValueError):
+            blockchain_integration._submit_transaction(lambda contract: _FakeFunction())
+        assert db.session.get(OwnerNonce, OWNER).next_nonce == 1
+
+        _, tx_hash = blockchain_integration._submit_transaction(lambda contract: _FakeFunction())
+
+        assert eth.sent[-1]["nonce"] == 0
+        record = db.session.execute(db.select(OwnerTransaction)).scalar_one()
+        assert (record.nonce, record.tx_hash, record.status) == (0, tx_hash, "pending")
+        assert db.session.get(OwnerNonce, OWNER).next_nonce == 1
+
+
+def test_transport_error_keeps_signed_hash_and_does_not_resend(client, monkeypatch):
+    eth = _FakeEth(pending=0)
+    _fake_chain(monkeypatch, eth)
+    with client.application.app_context():
+        eth.send_errors.append(requests.exceptions.ReadTimeout("read timed out"))
+        with pytest.raises(blockchain_integration.AmbiguousSubmissionError) as excinfo:
+            blockchain_integration._submit_transaction(lambda contract: _FakeFunction())
+
+        record = db.session.execute(db.select(OwnerTransaction)).scalar_one()
+        assert (record.nonce, record.status) == (0, "pending")
+        assert record.tx_hash == excinfo.value.tx_hash
+        assert eth.sent == []
+        # O nonce nao volta: o proximo envio usa o seguinte.
+        blockchain_integration._submit_transaction(lambda contract: _FakeFunction())
+        assert eth.sent[-1]["nonce"] == 1
+
+
+def test_replace_stuck_transactions_bumps_fees_with_same_nonce(client, monkeypatch):
+    eth = _FakeEth(pending=0)
+    _fake_chain(monkeypatch, eth)
+    with client.application.app_context():
+        _, first_hash = blockchain_integration._submit_transaction(lambda contract: _FakeFunction())
+        original = dict(eth.sent[-1])
+        record = db.session.execute(db.select(OwnerTransaction)).scalar_one()
+        record.sent_at = datetime.now(timezone.utc) - timedelta(minutes=10)
+        db.session.commit()
+
+        replaced = blockchain_integration.replace_stuck_transactions(stuck_after_seconds=60)
+
+        assert len(replaced) == 1
+        bumped = eth.sent[-1]
+        assert bumped["nonce"] == original["nonce"]
+        assert bumped["data"] == original["data"]
+        assert bumped["maxPriorityFeePerGas"] >= original["maxPriorityFeePerGas"] * 1.1
+        assert bumped["maxFeePerGas"] >= original["maxFeePerGas"] * 1.1
+        db.session.expire_all()
+        record = db.session.execute(db.select(OwnerTransaction)).scalar_one()
+        assert record.replacements == 1
+        assert NonceManager().current_hash(first_hash) == replaced[0]
+
+        eth.latest = 1
+        assert blockchain_integration.replace_stuck_transactions(stuck_after_seconds=0) == []
+        db.session.expire_all()
+        assert db.session.execute(db.select(OwnerTransaction)).scalar_one().status == "mined"
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("nonce too low: next nonce 5, tx nonce 4", True),
+        ("replacement transaction underpriced", True),
+        ("insufficient funds for gas", False),
+    ],
+)
+def test_is_nonce_conflict(message, expected):
+    assert is_nonce_conflict(ValueError(message)) is expected
+
+
+def test_bump_fee_always_increases():
+    assert bump_fee(0, 15) == 1
+    assert bump_fee(100, 15) == 115
@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+
+from routes.security import authenticated_wallet_key
+from services.auth_service import ServiceResponse
+from services.rate_limit_storage import MmapStorage
+
+
+def _hammer(uri: str, hits: int) -> None:
+    storage = MmapStorage(uri)
+    for _ in range(hits):
+        storage.incr("shared-key", 60)
+    storage.close()
+
+
+@pytest.fixture
+def storage_uri(tmp_path):
+    return f"mmap://{tmp_path / 'ratelimit.bin'}?buckets=64"
+
+
+def test_mmap_storage_is_registered(storage_uri):
+    storage = storage_from_string(storage_uri)
+    assert isinstance(storage, MmapStorage)
+    assert storage.check() is True
+
+
+def test_mmap_storage_counts_and_expires(storage_uri):
+    storage = MmapStorage(storage_uri)
+    assert storage.incr("k", 1) == 1
+    assert storage.incr("k", 1) == 2
+    assert storage.get("k") == 2
+    assert storage.get_expiry("k") > time.time()
+    storage.clear("k")
+    assert storage.get("k") == 0
+
+    storage.incr("short", 0.05)
+    time.sleep(0.1)
+    assert storage.get("short") == 0
+    assert storage.incr("short", 60) == 1
+
+
+def test_mmap_storage_is_exact_across_processes(storage_uri):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_hammer, args=(storage_uri, 250)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    assert MmapStorage(storage_uri).get("shared-key") == 1000
+
+
+def test_fixed_window_limiter_shares_state_between_workers(storage_uri):
+    limit = parse("10 per minute")
+    worker_a = FixedWindowRateLimiter(MmapStorage(storage_uri))
+    worker_b = FixedWindowRateLimiter(MmapStorage(storage_uri))
+    results = [(worker_a if index % 2 else worker_b).hit(limit, "0xabc") for index in range(12)]
+    assert results.count(True) == 10
+
+
+def test_mmap_storage_never_evicts_live_keys(tmp_path):
+    storage = MmapStorage(f"mmap://{tmp_path / 'full.bin'}?buckets=1")
+    keys = [f"key-{index}" for index in range(8)]
+    for key in keys:
+        storage.incr(key, 60)
+        storage.incr(key, 60)
+
+    assert storage.incr("newcomer", 60) > 1_000_000
+    assert storage.overflows == 1
+    assert [storage.get(key) for key in keys] == [2] * 8
+
+    storage.clear(keys[0])
+    assert storage.incr("newcomer", 60) == 1
+
+
+def test_authenticated_wallet_key_prefers_user_id(client, monkeypatch):
+    monkeypatch.setattr("routes.auth.get_web3", lambda: object())
+    monkeypatch.setattr(
+        "routes.auth.verify_signature_response",
+        lambda address, signature, store, web3: ServiceResponse(payload={"success": True, "address": address}),
+    )
+    address = "0x00000000000000000000000000000000000000Ee"
+    login = client.post("/api/auth/login", json={"address": address, "signature": "0x1"}).get_json()
+    token = login["token"]
+
+    app = client.application
+    with app.test_request_context("/", headers={"Authorization": f"Bearer {token}"}):
+        assert authenticated_wallet_key() == f"user:{login['user']['id']}"
+    with app.test_request_context("/", environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        assert authenticated_wallet_key() == "10.0.0.1"
@@ -0,0 +1,443 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from models import RevokedToken, SessionToken, Usuario, db
+from services.auth_service import ServiceResponse
+from services.session_backends import (
+    RedisSessionBackend,
+    SessionData,
+    SqlSessionBackend,
+    build_nonce_upsert,
+    build_session_backend,
+)
+from services.session_cache import SessionCache
+from services.session_reaper import SessionReaper
+from services.session_service import SessionStore
+from services.signed_tokens import RevocationList, SignedTokenCodec, is_signed_token
+
+
+@contextmanager
+def _count_statements():
+    statements: list[str] = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def _create_user(address: str = "0x00000000000000000000000000000000000000aa") -> int:
+    user = Usuario(endereco_wallet=address)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+@pytest.mark.usefixtures("client")
+def test_resolve_cache_hit_skips_database(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        store = SessionStore(revocations=RevocationList(refresh_seconds=60))
+        session = store.create(user_id)
+
+        first = store.resolve(session.token)
+        assert first is not None
+        store.revocations.refresh(force=True)
+        db.session.remove()
+
+        with _count_statements() as statements:
+            second = store.resolve(session.token)
+            assert second.user.id == user_id
+            assert second.user.endereco_wallet == "0x00000000000000000000000000000000000000aa"
+        assert statements == []
+        assert second.csrf_token == session.csrf_token
+        assert store.cache.stats()["hits"] == 1
+
+
+@pytest.mark.usefixtures("client")
+def test_destroy_invalidates_cached_session(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        store = SessionStore()
+        session = store.create(user_id)
+        assert store.resolve(session.token) is not None
+
+        store.destroy(session.token)
+        assert store.resolve(session.token) is None
+
+
+@pytest.mark.usefixtures("client")
+def test_destroy_and_user_changes_reach_other_workers_caches(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        worker_a = SessionStore(revocations=RevocationList(refresh_seconds=60))
+        worker_b = SessionStore(revocations=RevocationList(refresh_seconds=60))
+        kept = worker_a.create(user_id)
+        logged_out = worker_a.create(user_id)
+        assert worker_a.resolve(kept.token) is not None
+        assert worker_a.resolve(logged_out.token) is not None
+
+        worker_b.destroy(logged_out.token)
+        worker_a.revocations.refresh(force=True)
+        assert worker_a.resolve(logged_out.token) is None
+        assert worker_a.resolve(kept.token) is not None
+
+        db.session.get(Usuario, user_id).nome = "Renomeado"
+        db.session.commit()
+        worker_b.invalidate_user(user_id)
+        worker_b.invalidate_user(user_id)
+        worker_a.revocations.refresh(force=True)
+        db.session.remove()
+        assert worker_a.resolve(kept.token).user.nome == "Renomeado"
+
+
+@pytest.mark.usefixtures("client")
+def test_invalidate_user_drops_cached_sessions(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        store = SessionStore()
+        session = store.create(user_id)
+        store.resolve(session.token)
+        assert store.cache.stats()["size"] == 1
+
+        store.invalidate_user(user_id)
+        assert store.cache.stats()["size"] == 0
+
+
+def test_session_cache_expires_entries_and_evicts_lru():
+    now = [0.0]
+    cache = SessionCache(ttl_seconds=10, max_entries=2, clock=lambda: now[0])
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    for token in ("a", "b", "c"):
+        cache.put(token, user_id=1, csrf_token="x", expires_at=expires_at, user_values={"id": 1})
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    now[0] = 11.0
+    assert cache.get("c") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 1}
+
+
+def test_session_cache_caps_ttl_at_session_expiry():
+    cache = SessionCache(ttl_seconds=60, max_entries=10, clock=lambda: 0.0)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=5)
+    cache.put("token", user_id=1, csrf_token="x", expires_at=expires_at, user_values={"id": 1})
+    entry = cache.get("token")
+    assert entry is not None
+    assert entry.cached_until <= 5.0
+
+
+@pytest.mark.usefixtures("client")
+def test_create_and_save_nonce_do_not_purge_expired_rows(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        store = SessionStore()
+        expired = store.create(user_id)
+        record = db.session.execute(
+            select(SessionToken).where(SessionToken.session_id == expired.token)
+        ).scalar_one()
+        record.expires_at = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.session.commit()
+
+        with _count_statements() as statements:
+            store.create(user_id)
+            store.save_nonce("0x1", "nonce")
+        assert not any(statement.lstrip().upper().startswith("DELETE") for statement in statements)
+        assert db.session.query(SessionToken).count() == 3
+
+
+@pytest.mark.usefixtures("client")
+def test_purge_expired_removes_rows_in_batches(client):
+    with client.application.app_context():
+        past = datetime.now(timezone.utc) - timedelta(minutes=1)
+        for index in range(5):
+            db.session.add(
+                SessionToken(kind="nonce", session_id=f"expired-{index}", address=f"0x{index}", expires_at=past)
+            )
+        db.session.add(SessionToken(kind="nonce", session_id="alive", address="0xa", expires_at=past + timedelta(hours=1)))
+        db.session.commit()
+
+        with _count_statements() as statements:
+            removed = SessionStore().purge_expired(batch_size=2)
+        assert removed == 5
+        assert sum(statement.lstrip().upper().startswith("DELETE") for statement in statements) == 3
+        assert db.session.query(SessionToken).count() == 1
+
+
+def test_session_reaper_runs_on_single_leader(client, tmp_path):
+    lock_path = str(tmp_path / "reaper.lock")
+    leader = SessionReaper(client.application, interval_seconds=0, lock_path=lock_path)
+    follower = SessionReaper(client.application, interval_seconds=0, lock_path=lock_path)
+    try:
+        assert leader.try_acquire_leadership() is True
+        assert follower.try_acquire_leadership() is False
+        assert follower.run_once() == 0
+        leader.release_leadership()
+        assert follower.try_acquire_leadership() is True
+    finally:
+        leader.release_leadership()
+        follower.release_leadership()
+
+
+def test_session_reaper_purges_expired_revocations(client, tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_TOKEN_MODE", "signed")
+    monkeypatch.setenv("SESSION_SIGNING_KEY", "test-signing-key")
+    now = datetime.now(timezone.utc)
+    with client.application.app_context():
+        db.session.add(RevokedToken(jti="expired", expires_at=now - timedelta(minutes=1)))
+        db.session.add(RevokedToken(jti="active", expires_at=now + timedelta(hours=1)))
+        db.session.commit()
+
+    reaper = SessionReaper(client.application, interval_seconds=0, lock_path=str(tmp_path / "reaper.lock"))
+    try:
+        assert reaper.run_once() == 1
+    finally:
+        reaper.release_leadership()
+
+    with client.application.app_context():
+        assert db.session.execute(select(RevokedToken.jti)).scalars().all() == ["active"]
+
+
+@pytest.fixture
+def redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server)
+    return RedisSessionBackend(client, prefix="test:"), client
+
+
+@pytest.mark.usefixtures("client")
+def test_redis_backend_sessions_use_native_ttl(client, redis_backend):
+    backend, redis_client = redis_backend
+    with client.application.app_context():
+        user_id = _create_user()
+        store = SessionStore(backend=backend, cache=SessionCache(ttl_seconds=0))
+        session = store.create(user_id)
+
+        ttl = redis_client.pttl(f"test:session:{session.token}")
+        assert 0 < ttl <= 24 * 60 * 60 * 1000
+        resolved = store.resolve(session.token)
+        assert resolved.user.id == user_id
+        assert resolved.csrf_token == session.csrf_token
+
+        store.destroy(session.token)
+        assert store.resolve(session.token) is None
+        assert db.session.query(SessionToken).count() == 0
+
+
+def test_redis_touch_does_not_recreate_deleted_session(redis_backend):
+    backend, redis_client = redis_backend
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    data = SessionData(token="tok", user_id=1, csrf_token="csrf", expires_at=expires_at)
+    backend.save_session(data)
+    backend.delete_session("tok")
+
+    backend.touch_session("tok", expires_at + timedelta(hours=1))
+    assert redis_client.exists("test:session:tok") == 0
+    assert backend.get_session("tok") is None
+
+    redis_client.hset("test:session:partial", "expires_at", expires_at.timestamp())
+    assert backend.get_session("partial") is None
+
+
+def test_redis_backend_nonce_roundtrip(redis_backend):
+    backend, redis_client = redis_backend
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+
+    backend.save_nonce("0xabc", "first", expires_at)
+    backend.save_nonce("0xabc", "second", expires_at)
+    assert backend.peek_nonce("0xabc") == "second"
+    assert 0 < redis_client.pttl("test:nonce:0xabc") <= 5 * 60 * 1000
+    assert backend.consume_nonce("0xabc", "first") is False
+    assert backend.pop_nonce("0xabc") == "second"
+    assert backend.pop_nonce("0xabc") is None
+
+    backend.save_nonce("0xabc", "third", expires_at)
+    assert backend.consume_nonce("0xabc", "third") is True
+    assert backend.consume_nonce("0xabc", "third") is False
+
+    backend.save_nonce("0x1", "a", expires_at)
+    backend.save_nonce("0x2", "b", expires_at)
+    backend.clear_nonces()
+    assert backend.peek_nonce("0x1") is None
+    assert backend.peek_nonce("0x2") is None
+    assert backend.purge_expired(100) == 0
+
+
+def test_build_session_backend_selects_implementation(monkeypatch):
+    monkeypatch.delenv("SESSION_BACKEND", raising=False)
+    assert isinstance(build_session_backend(), SqlSessionBackend)
+
+    monkeypatch.setenv("SESSION_BACKEND", "redis")
+    monkeypatch.delenv("SESSION_REDIS_URL", raising=False)
+    with pytest.raises(RuntimeError):
+        build_session_backend()
+
+    monkeypatch.setenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+    assert isinstance(build_session_backend(), RedisSessionBackend)
+
+
+@pytest.mark.usefixtures("client")
+def test_signed_token_resolves_without_database_reads(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        store = SessionStore(codec=SignedTokenCodec(b"secret"), revocations=RevocationList(refresh_seconds=60))
+        session = store.create(user_id)
+        assert is_signed_token(session.token)
+        assert db.session.query(SessionToken).count() == 0
+        store.revocations.refresh(force=True)
+        db.session.remove()
+
+        with _count_statements() as statements:
+            resolved = store.resolve(session.token)
+            assert resolved.user.id == user_id
+        assert statements == []
+        assert resolved.csrf_matches(session.csrf_token)
+        assert not resolved.csrf_matches("forged")
+
+
+@pytest.mark.usefixtures("client")
+def test_signed_token_rejects_tampering_and_revocation(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        codec = SignedTokenCodec(b"secret")
+        store = SessionStore(codec=codec, revocations=RevocationList(refresh_seconds=60))
+        session = store.create(user_id)
+
+        forged, _ = SignedTokenCodec(b"other").encode(user_id, "csrf", session.expires_at)
+        assert store.resolve(forged) is None
+
+        store.destroy(session.token)
+        assert store.resolve(session.token) is None
+
+        other_worker = SessionStore(codec=codec, revocations=RevocationList(refresh_seconds=60))
+        assert other_worker.resolve(session.token) is None
+        assert len(other_worker.revocations) == 1
+
+
+@pytest.mark.usefixtures("client")
+def test_revocation_refresh_sees_rows_committed_out_of_id_order(client):
+    with client.application.app_context():
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(hours=1)
+        revocations = RevocationList(refresh_seconds=0)
+        db.session.add(RevokedToken(id=2, jti="later-id", revoked_at=now, expires_at=expires_at))
+        db.session.commit()
+        revocations.refresh(force=True)
+        assert revocations.is_revoked("later-id")
+
+        # Id menor, inserido antes mas confirmado depois do refresh acima.
+        db.session.add(RevokedToken(id=1, jti="earlier-id", revoked_at=now - timedelta(seconds=1), expires_at=expires_at))
+        db.session.commit()
+        assert revocations.is_revoked("earlier-id")
+        assert len(revocations) == 2
+
+
+def test_signed_mode_login_and_logout_endpoints(client, monkeypatch):
+    monkeypatch.setenv("SESSION_TOKEN_MODE", "signed")
+    monkeypatch.setenv("SESSION_SIGNING_KEY", "test-signing-key")
+    monkeypatch.setattr("routes.auth.get_web3", lambda: object())
+    monkeypatch.setattr(
+        "routes.auth.verify_signature_response",
+        lambda address, signature, store, web3: ServiceResponse(payload={"success": True, "address": address}),
+    )
+
+    login = client.post("/api/auth/login", json={"address": "0x00000000000000000000000000000000000000dd", "signature": "0x1"})
+    assert login.status_code == 200
+    body = login.get_json()
+    auth = {"Authorization": f"Bearer {body['token']}"}
+
+    me = client.get("/api/auth/me", headers=auth)
+    assert me.status_code == 200
+    assert me.get_json()["endereco_wallet"] == "0x00000000000000000000000000000000000000dd"
+
+    denied = client.post("/api/auth/logout", headers={**auth, "X-CSRF-Token": "wrong"})
+    assert denied.status_code == 403
+    logout = client.post("/api/auth/logout", headers={**auth, "X-CSRF-Token": body["csrf_token"]})
+    assert logout.status_code == 200
+    assert client.get("/api/auth/me", headers=auth).status_code == 401
+
+
+@pytest.mark.usefixtures("client")
+def test_save_nonce_is_single_upsert_statement(client):
+    with client.application.app_context():
+        backend = SqlSessionBackend()
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+        backend.save_nonce("0xabc", "first", expires_at)
+
+        with _count_statements() as statements:
+            backend.save_nonce("0xabc", "second", expires_at)
+        assert len(statements) == 1
+        assert db.session.query(SessionToken).filter_by(kind="nonce").count() == 1
+        assert backend.peek_nonce("0xabc") == "second"
+
+
+@pytest.mark.usefixtures("client")
+def test_session_store_rejects_duplicate_nonce_rows(client):
+    with client.application.app_context():
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+        db.session.add(SessionToken(kind="nonce", session_id="n1", address="0xabc", nonce="a", expires_at=expires_at))
+        db.session.add(SessionToken(kind="nonce", session_id="n2", address="0xabc", nonce="b", expires_at=expires_at))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+def test_nonce_upsert_is_dialect_aware():
+    expires_at = datetime.now(timezone.utc)
+    mysql_sql = str(build_nonce_upsert("0xabc", "n", expires_at, "mysql").compile(dialect=mysql.dialect()))
+    assert "ON DUPLICATE KEY UPDATE" in mysql_sql
+    sqlite_sql = str(build_nonce_upsert("0xabc", "n", expires_at, "sqlite").compile(dialect=sqlite.dialect()))
+    assert "ON CONFLICT (kind, address) DO UPDATE" in sqlite_sql
+
+
+@pytest.mark.usefixtures("client")
+def test_sliding_expiry_coalesces_writes(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        store = SessionStore(cache=SessionCache(ttl_seconds=0), sliding_interval_seconds=300)
+        session = store.create(user_id)
+        record = db.session.execute(
+            select(SessionToken).where(SessionToken.session_id == session.token)
+        ).scalar_one()
+        record.expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        db.session.commit()
+
+        with _count_statements() as statements:
+            for _ in range(50):
+                resolved = store.resolve(session.token)
+        updates = [statement for statement in statements if statement.lstrip().upper().startswith("UPDATE")]
+        assert len(updates) == 1
+        assert resolved.expires_at > datetime.now(timezone.utc) + timedelta(hours=23)
+
+        db.session.expire_all()
+        stored = db.session.execute(
+            select(SessionToken).where(SessionToken.session_id == session.token)
+        ).scalar_one()
+        assert stored.expires_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) + timedelta(hours=23)
+
+
+@pytest.mark.usefixtures("client")
+def test_sliding_expiry_can_be_disabled(client):
+    with client.application.app_context():
+        user_id = _create_user()
+        store = SessionStore(sliding_interval_seconds=0)
+        session = store.create(user_id)
+        record = db.session.execute(
+            select(SessionToken).where(SessionToken.session_id == session.token)
+        ).scalar_one()
+        original = datetime.now(timezone.utc) + timedelta(hours=1)
+        record.expires_at = original
+        db.session.commit()
+
+        resolved = store.resolve(session.token)
+        assert resolved.expires_at.replace(tzinfo=timezone.utc) == original
@@ -1,7 +1,13 @@
 import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql, sqlite
 
 from config import BlockChain
+from models import db
 from services.auth_service import ServiceResponse
+from services.user_service import build_user_upsert
 
 
 
@@ -138,3 +144,58 @@ def test_update_profile_persists_changes(client, monkeypatch):
     me_response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
     assert me_response.status_code == 200
     assert me_response.get_json()["nome"] == payload["nome"]
+
+
+class _AccountWeb3:
+    def __init__(self):
+        self.eth = type("Eth", (), {"account": Account})()
+
+
+def test_login_runs_in_single_transaction(client, monkeypatch):
+    account = Account.create()
+    monkeypatch.setattr("routes.auth.get_web3", lambda: _AccountWeb3())
+    nonce = client.post("/auth/request_nonce", json={"address": account.address}).get_json()["nonce"]
+    signature = account.sign_message(encode_defunct(text=nonce)).signature.hex()
+
+    statements: list[str] = []
+    commits: list[bool] = []
+    with client.application.app_context():
+        engine = db.engine
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def _on_commit(conn):
+        commits.append(True)
+
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    event.listen(engine, "commit", _on_commit)
+    try:
+        response = client.post("/api/auth/login", json={"address": account.address, "signature": signature})
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_execute)
+        event.remove(engine, "commit", _on_commit)
+
+    assert response.status_code == 200
+    assert response.get_json()["user"]["endereco_wallet"] == account.address
+    assert len(commits) == 1
+    assert len(statements) <= 4
+
+    replay = client.post("/api/auth/login", json={"address": account.address, "signature": signature})
+    assert replay.status_code == 400
+
+
+def test_login_upsert_reuses_existing_user(client, monkeypatch):
+    first = _perform_login(client, monkeypatch)
+    second = _perform_login(client, monkeypatch)
+    assert first["user"]["id"] == second["user"]["id"]
+
+
+def test_user_upsert_is_dialect_aware():
+    mysql_sql = str(build_user_upsert(ADDRESS, "mysql").compile(dialect=mysql.dialect()))
+    assert "ON DUPLICATE KEY UPDATE" in mysql_sql
+    assert "LAST_INSERT_ID" in mysql_sql.upper()
+
+    sqlite_sql = str(build_user_upsert(ADDRESS, "sqlite").compile(dialect=sqlite.dialect()))
+    assert "ON CONFLICT (endereco_wallet) DO UPDATE" in sqlite_sql
+    assert "RETURNING" in sqlite_sql
@@ -1,9 +1,25 @@
+import io
+import json
+import threading
 from datetime import datetime, timedelta, timezone
 
 import pytest
+from sqlalchemy import event
 
-from models import Candidato, Eleicao, Voto, db
+from sqlalchemy.dialects import mysql
+
+from models import CandidateVoteCounter, Candidato, Eleicao, Usuario, VoteOutbox, Voto, db
 from services.auth_service import ServiceResponse
+from services.candidate_service import get_candidate_index
+from services.idempotency import IdempotencyStore, idempotency_key_hash, request_fingerprint
+from services.receipt_cache import receipt_cache
+from services.results_cache import ElectionResultsCache
+from services.results_stream import results_broadcaster
+from services.vote_counters import build_counter_increment, election_vote_total, rebuild_vote_counters
+from services.blockchain_integration import AmbiguousSubmissionError
+from services.vote_group_commit import VoteGroupCommitter, vote_group_committer
+from services.vote_import import BallotImporter
+from services.vote_outbox import VoteOutboxProcessor, enqueue_vote
 
 
 AUTH_ADDRESS = "0x00000000000000000000000000000000000000cc"
@@ -254,3 +270,775 @@ def test_cast_vote_returns_502_when_blockchain_sync_fails(client, monkeypatch):
     assert response.status_code == 502
     body = response.get_json()
     assert "blockchain" in body.get("description", "").lower()
+
+
+@pytest.mark.usefixtures("client")
+def test_candidate_index_lookup_scans_candidates_once_per_voting_period(client):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+        engine = db.engine
+        scans: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and "FROM candidatos" in statement:
+                scans.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            election = db.session.get(Eleicao, election_id)
+            assert get_candidate_index(election, candidate_id) == 0
+            assert get_candidate_index(election, candidate_id) == 0
+            assert len(scans) == 1
+
+            election.data_inicio = datetime.now(timezone.utc)
+            assert get_candidate_index(election, candidate_id) == 0
+            assert len(scans) == 2
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+
+def _cast_async_vote(client, monkeypatch, hash_blockchain: str) -> dict:
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+
+    headers = _auth_headers(client, monkeypatch)
+    monkeypatch.setenv("VOTE_ONCHAIN_MODE", "async")
+    monkeypatch.setattr("services.vote_service.is_blockchain_enabled", lambda: True)
+
+    def unexpected_sync(_index: int):  # pragma: no cover - must not run in async mode
+        raise AssertionError("vote must not block on the blockchain")
+
+    monkeypatch.setattr("services.vote_service.record_vote_onchain", unexpected_sync)
+
+    response = client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": hash_blockchain},
+        headers=headers,
+    )
+    assert response.status_code == 202
+    return response.get_json()
+
+
+@pytest.mark.usefixtures("client")
+def test_cast_vote_async_mode_queues_outbox_and_confirms(client, monkeypatch):
+    body = _cast_async_vote(client, monkeypatch, "0xa11ce")
+    assert body["blockchain_status"] == "pending"
+    tracking_id = body["tracking_id"]
+
+    status_response = client.get(f"/api/votos/{tracking_id}/status")
+    assert status_response.status_code == 200
+    assert status_response.get_json()["status"] == "pending"
+
+    submitted: list[int] = []
+    processor = VoteOutboxProcessor(
+        receipt_poll_seconds=0,
+        submit=lambda index, reference=None: submitted.append(index) or "0xtx0",
+        fetch_receipt=lambda tx_hash: {"status": 1, "transactionHash": tx_hash},
+    )
+    with client.application.app_context():
+        assert processor.run_once(10) == 1
+        assert processor.run_once(10) == 1
+        assert processor.run_once(10) == 0
+
+    assert submitted == [0]
+    status = client.get(f"/api/votos/{tracking_id}/status").get_json()
+    assert status["status"] == "confirmed"
+    assert status["blockchain_tx"] == "0xtx0"
+    assert status["attempts"] == 1
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_outbox_retries_with_backoff_then_dead_letters(client, monkeypatch):
+    body = _cast_async_vote(client, monkeypatch, "0xb0b0b0")
+
+    def failing_submit(_index: int, reference=None):
+        raise RuntimeError("rpc unavailable")
+
+    processor = VoteOutboxProcessor(max_attempts=2, backoff_seconds=30, submit=failing_submit)
+    with client.application.app_context():
+        assert processor.run_once(10) == 1
+        entry = db.session.execute(
+            db.select(VoteOutbox).where(VoteOutbox.tracking_id == body["tracking_id"])
+        ).scalar_one()
+        assert entry.status == "pending"
+        assert entry.attempts == 1
+        assert "rpc unavailable" in entry.last_error
+        # Ainda em backoff: nada a reivindicar.
+        assert processor.run_once(10) == 0
+
+        entry.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.commit()
+        assert processor.run_once(10) == 1
+
+    status = client.get(f"/api/votos/{body['tracking_id']}/status").get_json()
+    assert status["status"] == "dead"
+    assert status["attempts"] == 2
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_outbox_treats_ambiguous_send_as_submitted(client, monkeypatch):
+    body = _cast_async_vote(client, monkeypatch, "0xa3b1c0")
+
+    def timed_out(_index: int, reference=None):
+        raise AmbiguousSubmissionError("0xsigned", TimeoutError("read timed out"))
+
+    processor = VoteOutboxProcessor(submit=timed_out)
+    with client.application.app_context():
+        assert processor.run_once(10) == 1
+
+    status = client.get(f"/api/votos/{body['tracking_id']}/status").get_json()
+    assert status["status"] == "submitted"
+    assert status["blockchain_tx"] == "0xsigned"
+    assert "may have been broadcast" in status["last_error"]
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_outbox_reconciles_send_whose_hash_was_lost(client, monkeypatch):
+    body = _cast_async_vote(client, monkeypatch, "0xc0ffee")
+    sent: dict[str, str] = {}
+
+    def submit(_index: int, reference=None):
+        sent[reference] = "0xonchain"
+        raise RuntimeError("worker died before the commit")
+
+    with client.application.app_context():
+        VoteOutboxProcessor(submit=submit, find_submission=lambda ref: None).run_once(10)
+        entry = db.session.execute(db.select(VoteOutbox)).scalar_one()
+        assert entry.submission_ref in sent
+        entry.next_attempt_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.commit()
+
+        def must_not_resend(_index: int, reference=None):  # pragma: no cover - path under test
+            raise AssertionError("vote already went on-chain")
+
+        processor = VoteOutboxProcessor(submit=must_not_resend, find_submission=sent.get)
+        assert processor.run_once(10) == 1
+
+    status = client.get(f"/api/votos/{body['tracking_id']}/status").get_json()
+    assert status["status"] == "submitted"
+    assert status["blockchain_tx"] == "0xonchain"
+
+
+def test_vote_status_returns_404_for_unknown_tracking_id(client):
+    response = client.get("/api/votos/desconhecido/status")
+    assert response.status_code == 404
+
+
+def _queue_async_votes(client, monkeypatch, hashes: list[str]) -> list[str]:
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+
+    headers = _auth_headers(client, monkeypatch)
+    monkeypatch.setenv("VOTE_ONCHAIN_MODE", "async")
+    monkeypatch.setattr("services.vote_service.is_blockchain_enabled", lambda: True)
+    tracking_ids = []
+    for value in hashes:
+        response = client.post(
+            f"/api/eleicoes/{election_id}/votar",
+            json={"candidato_id": candidate_id, "hash_blockchain": value},
+            headers=headers,
+        )
+        assert response.status_code == 202
+        tracking_ids.append(response.get_json()["tracking_id"])
+    return tracking_ids
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_outbox_flushes_batch_when_size_reached(client, monkeypatch):
+    batches: list[list[int]] = []
+    receipt_checks: list[str] = []
+
+    def submit_batch(indices: list[int], reference=None) -> str:
+        batches.append(indices)
+        return f"0xbatch{len(batches)}"
+
+    def fetch_receipt(tx_hash: str):
+        receipt_checks.append(tx_hash)
+        return {"status": 1, "transactionHash": tx_hash}
+
+    processor = VoteOutboxProcessor(
+        onchain_batch_size=3,
+        batch_max_wait_ms=60_000,
+        receipt_poll_seconds=0,
+        submit_batch=submit_batch,
+        fetch_receipt=fetch_receipt,
+        batch_supported=lambda: True,
+    )
+    _queue_async_votes(client, monkeypatch, ["0xaaa001", "0xaaa002"])
+    with client.application.app_context():
+        assert processor.run_once(10) == 0
+
+    _queue_async_votes(client, monkeypatch, ["0xaaa003"])
+    with client.application.app_context():
+        assert processor.run_once(10) == 3
+        assert batches == [[0, 0, 0]]
+        votes = db.session.execute(db.select(Voto).order_by(Voto.id)).scalars().all()
+        assert {vote.batch_tx_hash for vote in votes} == {"0xbatch1"}
+        assert sorted(vote.batch_position for vote in votes) == [0, 1, 2]
+
+        assert processor.run_once(10) == 3
+        assert receipt_checks == ["0xbatch1"]
+        statuses = db.session.execute(db.select(VoteOutbox.status)).scalars().all()
+        assert statuses == ["confirmed"] * 3
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_outbox_flushes_partial_batch_after_max_wait(client, monkeypatch):
+    batches: list[list[int]] = []
+    processor = VoteOutboxProcessor(
+        onchain_batch_size=10,
+        batch_max_wait_ms=0,
+        submit_batch=lambda indices, reference=None: batches.append(indices) or "0xpartial",
+        batch_supported=lambda: True,
+    )
+    tracking_ids = _queue_async_votes(client, monkeypatch, ["0xbbb001", "0xbbb002"])
+    with client.application.app_context():
+        assert processor.run_once(10) == 2
+
+    assert batches == [[0, 0]]
+    status = client.get(f"/api/votos/{tracking_ids[1]}/status").get_json()
+    assert status["status"] == "submitted"
+    assert status["batch_position"] == 1
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_outbox_sends_single_votes_when_contract_lacks_batch_vote(client, monkeypatch):
+    singles: list[int] = []
+    batches: list[list[int]] = []
+    processor = VoteOutboxProcessor(
+        onchain_batch_size=10,
+        batch_max_wait_ms=60_000,
+        submit=lambda index, reference=None: singles.append(index) or f"0xsingle{len(singles)}",
+        submit_batch=lambda indices, reference=None: batches.append(indices) or "0xbatch",
+        batch_supported=lambda: False,
+    )
+    _queue_async_votes(client, monkeypatch, ["0xccc001", "0xccc002"])
+    with client.application.app_context():
+        assert processor.batching is False
+        assert processor.run_once(10) == 2
+
+    assert singles == [0, 0]
+    assert batches == []
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_counters_are_sharded_and_serve_results_without_scanning_votes(client, monkeypatch):
+    monkeypatch.setenv("VOTE_COUNTER_SHARDS", "4")
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+
+    headers = _auth_headers(client, monkeypatch)
+    for index in range(6):
+        response = client.post(
+            f"/api/eleicoes/{election_id}/votar",
+            json={"candidato_id": candidate_id, "hash_blockchain": f"0xshard{index}"},
+            headers=headers,
+        )
+        assert response.status_code == 201
+    assert response.get_json()["total_votos_candidato"] == 6
+
+    with client.application.app_context():
+        shards = db.session.execute(db.select(CandidateVoteCounter)).scalars().all()
+        assert 1 <= len(shards) <= 4
+        assert sum(shard.votes for shard in shards) == 6
+        engine = db.engine
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        results = client.get(f"/api/eleicoes/{election_id}/resultados").get_json()
+        status = client.get(f"/api/eleicoes/{election_id}/status").get_json()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert results["total_votos"] == 6
+    assert status["total_votos"] == 6
+    assert not [statement for statement in statements if "FROM votos" in statement]
+
+
+@pytest.mark.usefixtures("client")
+def test_rebuild_vote_counters_restores_totals_from_votes(client, monkeypatch):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+
+    headers = _auth_headers(client, monkeypatch)
+    for value in ("0xfix001", "0xfix002"):
+        client.post(
+            f"/api/eleicoes/{election_id}/votar",
+            json={"candidato_id": candidate_id, "hash_blockchain": value},
+            headers=headers,
+        )
+
+    with client.application.app_context():
+        db.session.execute(db.update(CandidateVoteCounter).values(votes=99))
+        db.session.commit()
+        assert rebuild_vote_counters(election_id) == 1
+
+    results = client.get(f"/api/eleicoes/{election_id}/resultados").get_json()
+    assert results["results"][0]["votos"] == 2
+
+
+def test_counter_increment_compiles_to_atomic_upsert_on_mysql():
+    stmt = build_counter_increment(1, 1, 3, 1, "mysql")
+    compiled = str(stmt.compile(dialect=mysql.dialect()))
+    assert "ON DUPLICATE KEY UPDATE votes = (candidate_vote_counters.votes + VALUES(votes))" in compiled
+
+
+@pytest.mark.usefixtures("client")
+def test_election_results_are_cached_with_etag_and_updated_by_votes(client, monkeypatch):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+
+    first = client.get(f"/api/eleicoes/{election_id}/resultados")
+    assert first.status_code == 200
+    assert first.headers["X-Cache"] == "MISS"
+    etag = first.headers["ETag"]
+    assert etag
+
+    not_modified = client.get(f"/api/eleicoes/{election_id}/resultados", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["X-Cache"] == "HIT"
+
+    headers = _auth_headers(client, monkeypatch)
+    client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": "0xcache1"},
+        headers=headers,
+    )
+
+    updated = client.get(f"/api/eleicoes/{election_id}/resultados", headers={"If-None-Match": etag})
+    assert updated.status_code == 200
+    assert updated.headers["X-Cache"] == "HIT"
+    assert updated.headers["ETag"] != etag
+    assert updated.get_json()["total_votos"] == 1
+
+    assert client.post(f"/api/eleicoes/{election_id}/end", headers=headers).status_code == 200
+    after_end = client.get(f"/api/eleicoes/{election_id}/resultados")
+    assert after_end.headers["X-Cache"] == "MISS"
+    assert after_end.get_json()["election"]["ativa"] is False
+
+    stats = client.get("/api/eleicoes/resultados/cache").get_json()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["hit_rate"] == 0.5
+    assert stats["incremental_updates"] == 1
+
+
+def test_results_cache_rebuilds_entries_older_than_max_staleness(client):
+    now = [100.0]
+    cache = ElectionResultsCache(max_staleness_seconds=2, clock=lambda: now[0])
+    builds: list[int] = []
+
+    def builder():
+        builds.append(1)
+        return {"total_votos": len(builds), "results": []}
+
+    with client.application.app_context():
+        assert cache.get_or_build(1, builder)[1] is False
+        now[0] += 1
+        assert cache.get_or_build(1, builder)[1] is True
+        assert cache.staleness(1) == 1
+        now[0] += 1.5
+        entry, hit = cache.get_or_build(1, builder)
+
+    assert hit is False
+    assert entry.payload["total_votos"] == 2
+
+
+def test_results_cache_never_counts_a_vote_read_by_an_overlapping_build(client):
+    now = [100.0]
+    cache = ElectionResultsCache(max_staleness_seconds=60, clock=lambda: now[0])
+
+    commit_started: list[float] = []
+
+    def builder_seeing_vote():
+        # O commit do voto comeca durante a leitura, que ja o enxerga.
+        now[0] += 0.5
+        commit_started.append(cache.now())
+        now[0] += 0.5
+        return {"total_votos": 1, "results": [{"id": 7, "votos": 1}]}
+
+    with client.application.app_context():
+        cache.get_or_build(1, builder_seeing_vote)
+        cache.record_vote(1, 7, commit_started[0])
+        assert cache.staleness(1) is None
+
+        cache.get_or_build(2, lambda: {"total_votos": 0, "results": [{"id": 8, "votos": 0}]})
+        now[0] += 1
+        cache.record_vote(2, 8, cache.now())
+        entry, hit = cache.get_or_build(2, lambda: {"total_votos": 0, "results": []})
+
+    assert hit is True
+    assert entry.payload["total_votos"] == 1
+    assert entry.payload["results"] == [{"id": 8, "votos": 1}]
+
+
+def _read_until(chunks, marker: str) -> str:
+    text = ""
+    while marker not in text:
+        text += next(chunks).decode("utf-8")
+    return text
+
+
+@pytest.mark.usefixtures("client")
+def test_results_stream_pushes_snapshot_deltas_and_heartbeats(client, monkeypatch):
+    monkeypatch.setenv("RESULTS_STREAM_HEARTBEAT_SECONDS", "0.01")
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+
+    headers = _auth_headers(client, monkeypatch)
+    client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": "0xsse001"},
+        headers=headers,
+    )
+
+    response = client.get(f"/api/eleicoes/{election_id}/resultados/stream")
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    chunks = response.iter_encoded()
+    snapshot = _read_until(chunks, "event: snapshot")
+    assert "retry: 3000" in snapshot
+    assert "id: 1\n" in snapshot
+
+    client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": "0xsse002"},
+        headers=headers,
+    )
+    with client.application.app_context():
+        assert results_broadcaster.poll_once() == 1
+        # Nenhuma mudanca: o poll agrupado nao publica nada.
+        assert results_broadcaster.poll_once() == 0
+
+    delta = next(chunks).decode("utf-8")
+    assert delta.startswith("id: 2\nevent: delta\n")
+    data = json.loads(delta.split("data: ", 1)[1])
+    assert data["total_votos"] == 2
+    assert data["votos"] == [{"id": candidate_id, "votos": 2, "delta": 1}]
+    assert next(chunks).decode("utf-8") == ": heartbeat\n\n"
+
+    response.close()
+    assert results_broadcaster.connections == 0
+    assert results_broadcaster.watched_elections() == []
+
+
+@pytest.mark.usefixtures("client")
+def test_results_stream_resumes_from_last_event_id(client, monkeypatch):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+
+    headers = _auth_headers(client, monkeypatch)
+    client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": "0xres001"},
+        headers=headers,
+    )
+
+    # Worker sem historico desde o id 0: reenvia os totais em vez de um snapshot completo.
+    first = client.get(f"/api/eleicoes/{election_id}/resultados/stream", headers={"Last-Event-ID": "0"})
+    totals = _read_until(first.iter_encoded(), "event: totals")
+    assert "id: 1\n" in totals
+    assert "event: snapshot" not in totals
+
+    client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": "0xres002"},
+        headers=headers,
+    )
+    with client.application.app_context():
+        results_broadcaster.poll_once()
+
+    resumed = client.get(f"/api/eleicoes/{election_id}/resultados/stream", headers={"Last-Event-ID": "1"})
+    replay = _read_until(resumed.iter_encoded(), "id: 2\n")
+    assert "event: delta" in replay
+    assert "event: totals" not in replay
+    resumed.close()
+    first.close()
+
+
+def test_results_stream_rejects_connections_over_limit(client, monkeypatch):
+    with client.application.app_context():
+        election_id, _ = _seed_election()
+    monkeypatch.setattr(results_broadcaster, "max_connections", 0)
+
+    response = client.get(f"/api/eleicoes/{election_id}/resultados/stream")
+    assert response.status_code == 503
+
+
+@pytest.mark.usefixtures("client")
+def test_bulk_ballot_import_dedups_counts_and_reports_row_errors(client, monkeypatch):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+    headers = _auth_headers(client, monkeypatch)
+    client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": "0xPAPER001"},
+        headers=headers,
+    )
+    assert client.get(f"/api/eleicoes/{election_id}/resultados").get_json()["total_votos"] == 1
+
+    lines = [
+        {"candidato_id": candidate_id, "hash_blockchain": "0xpaper001"},
+        {"candidato_id": candidate_id, "hash_blockchain": "0xpaper002"},
+        {"candidato_id": candidate_id, "hash_blockchain": "0xPAPER002"},
+        {"candidato_id": 999, "hash_blockchain": "0xpaper003"},
+        {"candidato_id": candidate_id, "hash_blockchain": "0x1"},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\n{broken\n"
+    for index in range(4, 9):
+        body += json.dumps({"candidato_id": candidate_id, "hash_blockchain": f"0xpaper00{index}"}) + "\n"
+    response = client.post(
+        f"/api/eleicoes/{election_id}/votos/importar",
+        data=body,
+        content_type="application/x-ndjson",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["importados"] == 6
+    assert report["duplicados"] == 2
+    assert report["invalidos"] == 3
+    assert [error["linha"] for error in report["erros"]] == [4, 5, 6]
+
+    csv_body = f"candidato_id,hash_blockchain\n{candidate_id},0xcsv0001\n{candidate_id},0xpaper004\n"
+    report = client.post(
+        f"/api/eleicoes/{election_id}/votos/importar",
+        data=csv_body,
+        content_type="text/csv",
+        headers=headers,
+    ).get_json()
+    assert (report["importados"], report["duplicados"]) == (1, 1)
+
+    results = client.get(f"/api/eleicoes/{election_id}/resultados").get_json()
+    assert results["total_votos"] == 8
+    with client.application.app_context():
+        assert db.session.query(Voto).count() == 8
+
+
+@pytest.mark.usefixtures("client")
+def test_bulk_ballot_import_writes_in_executemany_chunks(client):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+        statements: list[tuple[str, bool]] = []
+
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO votos"):
+                statements.append((statement, executemany))
+
+        body = "".join(
+            json.dumps({"candidato_id": candidate_id, "hash_blockchain": f"0xchunk{index:04d}"}) + "\n"
+            for index in range(25)
+        )
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        try:
+            report = BallotImporter(chunk_size=10).run(election_id, io.StringIO(body))
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _before_cursor_execute)
+
+        assert report.importados == 25
+        assert len(statements) <= 3
+        assert election_vote_total(election_id) == 25
+
+
+@pytest.mark.usefixtures("client")
+def test_group_commit_writes_concurrent_votes_in_one_transaction(client):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+
+    committer = VoteGroupCommitter(window_ms=5000, max_batch=3)
+    results: list[tuple[str, object]] = []
+    commits: list[int] = []
+
+    def cast(vote_hash: str) -> None:
+        with client.application.app_context():
+            results.append((vote_hash, committer.submit(election_id, candidate_id, vote_hash)))
+
+    def on_commit(conn) -> None:
+        commits.append(1)
+
+    with client.application.app_context():
+        engine = db.engine
+    event.listen(engine, "commit", on_commit)
+    try:
+        threads = [threading.Thread(target=cast, args=(value,)) for value in ("0xgroup01", "0xgroup02", "0xgroup01")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+    finally:
+        event.remove(engine, "commit", on_commit)
+
+    assert len(results) == 3
+    assert sorted(vote_hash for vote_hash, result in results if result is None) == ["0xgroup01"]
+    assert committer.groups == 1
+    assert len(commits) == 1
+    with client.application.app_context():
+        assert election_vote_total(election_id) == 2
+        assert db.session.query(Voto).count() == 2
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_endpoint_uses_group_commit_and_reports_duplicates(client, monkeypatch):
+    monkeypatch.setattr(vote_group_committer, "window_ms", 1.0)
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+    headers = _auth_headers(client, monkeypatch)
+
+    first = client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": "0xgrouped01"},
+        headers=headers,
+    )
+    again = client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={"candidato_id": candidate_id, "hash_blockchain": "0xGROUPED01"},
+        headers=headers,
+    )
+
+    assert first.status_code == 201
+    assert first.get_json()["total_votos_candidato"] == 1
+    assert again.status_code == 409
+
+
+VOTE_STATEMENT_BUDGET = 4
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_endpoint_stays_within_statement_budget(client, monkeypatch):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+        engine = db.engine
+    headers = _auth_headers(client, monkeypatch)
+    # Aquece cache de sessao e lista de revogacoes: o orcamento e so do caminho do voto.
+    for value in ("0xbudget01", "0xbudget02"):
+        client.post(
+            f"/api/eleicoes/{election_id}/votar",
+            json={"candidato_id": candidate_id, "hash_blockchain": value},
+            headers=headers,
+        )
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post(
+            f"/api/eleicoes/{election_id}/votar",
+            json={"candidato_id": candidate_id, "hash_blockchain": "0xbudget03"},
+            headers=headers,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 201
+    assert response.get_json()["total_votos_candidato"] == 3
+    assert len(statements) <= VOTE_STATEMENT_BUDGET, "\n".join(statements)
+
+
+@pytest.mark.usefixtures("client")
+def test_vote_idempotency_key_replays_without_touching_the_write_path(client, monkeypatch):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+        engine = db.engine
+    headers = {**_auth_headers(client, monkeypatch), "Idempotency-Key": "vote-retry-1"}
+    body = {"candidato_id": candidate_id, "hash_blockchain": "0xidem0001"}
+
+    first = client.post(f"/api/eleicoes/{election_id}/votar", json=body, headers=headers)
+    writes: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "votos" in statement or "candidate_vote_counters" in statement:
+            writes.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        retry = client.post(f"/api/eleicoes/{election_id}/votar", json=body, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert writes == []
+
+    other = client.post(
+        f"/api/eleicoes/{election_id}/votar",
+        json={**body, "hash_blockchain": "0xidem0002"},
+        headers=headers,
+    )
+    assert other.status_code == 422
+    with client.application.app_context():
+        assert db.session.query(Voto).count() == 1
+
+
+@pytest.mark.usefixtures("client")
+def test_concurrent_idempotency_key_waits_for_the_first_request(client, monkeypatch):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+    headers = {**_auth_headers(client, monkeypatch), "Idempotency-Key": "vote-busy-1"}
+    body = {"candidato_id": candidate_id, "hash_blockchain": "0xbusy0001"}
+    request_body = json.dumps(body).encode("utf-8")
+
+    with client.application.app_context():
+        store = IdempotencyStore(wait_seconds=0)
+        client.application.extensions["idempotency_store"] = store
+        user_id = db.session.query(Usuario.id).scalar()
+        key_hash = idempotency_key_hash(f"{user_id}:POST:/api/eleicoes/{election_id}/votar", "vote-busy-1")
+        assert store.claim(key_hash, request_fingerprint(request_body)).outcome == "claimed"
+
+    busy = client.post(f"/api/eleicoes/{election_id}/votar", data=request_body, content_type="application/json", headers=headers)
+    assert busy.status_code == 409
+
+    with client.application.app_context():
+        store.complete(key_hash, 201, json.dumps({"id": 99}))
+    done = client.post(f"/api/eleicoes/{election_id}/votar", data=request_body, content_type="application/json", headers=headers)
+    assert done.status_code == 201
+    assert done.get_json() == {"id": 99}
+
+    with client.application.app_context():
+        expired = IdempotencyStore(ttl_seconds=-1)
+        assert expired.claim("0" * 64, "x").outcome == "claimed"
+        assert expired.purge_expired() == 1
+        client.application.extensions.pop("idempotency_store", None)
+
+
+@pytest.mark.usefixtures("client")
+def test_verify_vote_resolves_the_chain_transaction_from_the_votes_table(client, monkeypatch):
+    with client.application.app_context():
+        election_id, candidate_id = _seed_election()
+        queued = Voto(eleicao_id=election_id, candidato_id=candidate_id, hash_blockchain="0xqueued")
+        sent = Voto(eleicao_id=election_id, candidato_id=candidate_id, hash_blockchain="0xsent")
+        enqueue_vote(queued, 0)
+        entry = enqueue_vote(sent, 0)
+        entry.status = "confirmed"
+        entry.tx_hash = "0xownertx"
+        db.session.add_all([queued, sent])
+        db.session.commit()
+
+    calls: list[str] = []
+
+    def fake_fetch(tx_hash):
+        calls.append(tx_hash)
+        return {"status": 1, "blockNumber": 7, "gasUsed": 50000, "transactionHash": tx_hash}
+
+    monkeypatch.setattr("services.receipt_cache.is_blockchain_enabled", lambda: True)
+    monkeypatch.setattr(receipt_cache, "_fetch_receipt", fake_fetch)
+    monkeypatch.setattr(receipt_cache, "_latest_block", lambda: 100)
+
+    pending = client.get("/api/votos/0xqueued/verificar")
+    assert pending.status_code == 404
+    assert pending.get_json()["status"] == "not_found"
+
+    verified = client.get("/api/votos/0xSENT/verificar")
+    assert verified.status_code == 200
+    assert verified.get_json()["transactionHash"] == "0xownertx"
+    assert client.get("/api/votos/0xsent/verificar").status_code == 200
+    assert calls == ["0xownertx"]